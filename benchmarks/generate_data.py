@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Synthetic FEC data generator
+
+Writes records in the format of itcont.txt (21 columns separated by '|'),
+with controllable number of records, number of recipients,
+skew of zip codes and spread of transaction dates.
+
+Run from the root folder:
+    root~$ PYTHONPATH=. python benchmarks/generate_data.py path/to/itcont.txt --size 1000000
+"""
+import argparse
+import bisect
+import datetime
+import random
+
+# Typical donation amounts, most donations are repeated values
+AMOUNTS = [5, 10, 15, 20, 25, 27, 35, 50, 75, 100, 150, 200, 250, 500,
+           1000, 1500, 2000, 2700]
+NAMES = ['PEREZ, JOHN A', 'DEEHAN, WILLIAM N', 'ABBOTT, JOSEPH',
+         'SABOURIN, JAMES', 'JEROME, CHRISTOPHER', 'BAKER, SCOTT']
+CITIES = [('LOS ANGELES', 'CA'), ('ALPHARETTA', 'GA'), ('WOONSOCKET', 'RI'),
+          ('FALMOUTH', 'ME'), ('NEW YORK', 'NY'), ('AUSTIN', 'TX')]
+
+
+class ZipfSampler(object):
+    """
+    Sample ranks in [0, size) with probability proportional to 1 / (rank + 1) ** skew
+    skew = 0 gives a uniform distribution
+
+    :param size: int, number of distinct values
+    :param skew: float, exponent of the distribution
+    :param rng: random.Random
+    """
+
+    def __init__(self, size, skew, rng):
+        self._rng = rng
+        self._cumulative = []
+        total = 0.0
+        for rank in range(size):
+            total += 1.0 / (rank + 1) ** skew
+            self._cumulative.append(total)
+
+    def sample(self):
+        return bisect.bisect(self._cumulative,
+                             self._rng.random() * self._cumulative[-1])
+
+
+def generate_lines(size, committees=1000, zipcodes=10000, zip_skew=1.0,
+                   days=730, invalid=0.05, seed=2017):
+    """
+    Yield synthetic records of itcont.txt
+
+    :param size: int, number of records
+    :param committees: int, number of distinct recipients (CMTE_ID)
+    :param zipcodes: int, number of distinct 5-digit zip codes
+    :param zip_skew: float, Zipf exponent of the zip code distribution
+    :param days: int, number of distinct transaction dates, from 01/01/2017
+    :param invalid: float, fraction of records to be filtered out
+        (contributions from entities, malformed zip codes or dates)
+    :param seed: int, random seed
+    :return: string generator, lines ending with line break
+    """
+    rng = random.Random(seed)
+    zip_sampler = ZipfSampler(zipcodes, zip_skew, rng)
+    # zip codes are shuffled, so that frequent zip codes are not neighbours
+    zip_values = ['%05d' % i for i in rng.sample(range(100000), zipcodes)]
+    first_day = datetime.date(2017, 1, 1)
+    dates = [(first_day + datetime.timedelta(i)).strftime('%m%d%Y')
+             for i in range(days)]
+
+    for i in range(size):
+        cmte_id = 'C%08d' % rng.randrange(committees)
+        zipcode = zip_values[zip_sampler.sample()] + '%04d' % rng.randrange(10000)
+        date = rng.choice(dates)
+        amount = rng.choice(AMOUNTS)
+        if rng.random() < 0.1:
+            amount = '%.2f' % (amount + rng.random())
+        other_id = ''
+
+        if rng.random() < invalid:
+            # one of the filter rules of stream_input
+            rule = rng.randrange(3)
+            if rule == 0:
+                other_id = 'H6CA34245'
+            elif rule == 1:
+                zipcode = zipcode[:5]
+            else:
+                date = date[:4]
+
+        city, state = rng.choice(CITIES)
+        yield '|'.join([
+            cmte_id, 'N', 'M2', 'P', '2017020390424%05d' % (i % 100000), '15',
+            'IND', rng.choice(NAMES), city, state, zipcode, 'EMPLOYER',
+            'OCCUPATION', date, str(amount), other_id, 'SA11AI.%d' % i,
+            '1147350', '', '', '40208201713700%05d' % (i % 100000)]) + '\n'
+
+
+def generate_file(path, size, **kwargs):
+    """
+    Write synthetic records of itcont.txt to path
+
+    :param path: string, path to output file
+    :param size: int, number of records
+    :param kwargs: see generate_lines
+    """
+    with open(path, 'w') as fileout:
+        for line in generate_lines(size, **kwargs):
+            fileout.write(line)
+
+
+def add_generator_arguments(parser):
+    parser.add_argument("--size", type=int, default=100000,
+                        help="number of records")
+    parser.add_argument("--committees", type=int, default=1000,
+                        help="number of distinct recipients")
+    parser.add_argument("--zipcodes", type=int, default=10000,
+                        help="number of distinct 5-digit zip codes")
+    parser.add_argument("--zip-skew", type=float, default=1.0,
+                        help="Zipf exponent of the zip code distribution (0: uniform)")
+    parser.add_argument("--days", type=int, default=730,
+                        help="number of distinct transaction dates")
+    parser.add_argument("--invalid", type=float, default=0.05,
+                        help="fraction of records to be filtered out")
+    parser.add_argument("--seed", type=int, default=2017, help="random seed")
+
+
+def generator_kwargs(args):
+    return {'committees': args.committees, 'zipcodes': args.zipcodes,
+            'zip_skew': args.zip_skew, 'days': args.days,
+            'invalid': args.invalid, 'seed': args.seed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", type=str, help="path to output file")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    generate_file(args.output, args.size, **generator_kwargs(args))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Memory benchmark of donation storage
+
+Stores synthetic donations in InfoIndividual objects and the AVLTreeByID,
+as find_political_donors does, and reports the memory allocated
+per stored donation (measured with tracemalloc).
+
+Run from the root folder:
+    root~$ PYTHONPATH=. python benchmarks/memory_benchmark.py
+"""
+import argparse
+import random
+import tracemalloc
+from src import *
+
+
+def synthetic_records(size, committees, zipcodes, dates, round_amounts=False,
+                      parse=False, seed=2017):
+    """
+    :param round_amounts: boolean, whether the amounts are only the round
+        amounts, heavily repeated as in FEC files
+    :param parse: boolean, whether to return the input lines of the records,
+        to be parsed while they are stored
+    :return: list of records as yielded by stream_input, or of input lines
+    """
+    rng = random.Random(seed)
+    amounts = [10, 25, 50, 100, 250, 500, 1000, 2700]
+    spread = 1 if round_amounts else 100
+    records = [{
+        'CMTE_ID': 'C%08d' % rng.randrange(committees),
+        'TRANSACTION_AMT': 100 * (rng.choice(amounts) + rng.randrange(spread)),
+        'ZIP_CODE': '%05d' % rng.randrange(zipcodes),
+        'TRANSACTION_DT': '01%02d2017' % (rng.randrange(dates) + 1),
+    } for _ in range(size)]
+    if not parse:
+        return records
+
+    def to_line(record):
+        entries = [''] * COLSIZE
+        entries[INPUT_HEADER['CMTE_ID']] = record['CMTE_ID']
+        entries[INPUT_HEADER['TRANSACTION_AMT']] = str(record['TRANSACTION_AMT'] // 100)
+        entries[INPUT_HEADER['ZIP_CODE']] = record['ZIP_CODE'] + '0000'
+        entries[INPUT_HEADER['TRANSACTION_DT']] = record['TRANSACTION_DT']
+        return '|'.join(entries) + '\n'
+
+    return [to_line(record) for record in records]
+
+
+def measure(records, engine, parse=False):
+    """
+    :param parse: boolean, whether the records are input lines, parsed by
+        parse_line while they are stored, as stream_input does
+    :return: int, bytes allocated to store the records
+    """
+    InfoByDomainBase.set_median_engine(engine)
+    DATE_CACHE.clear()
+
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+
+    info_db = dict()
+    tree = AVLTreeByID()
+    if parse:
+        records = (parse_line(line) for line in records)
+    for line in records:
+        if line['CMTE_ID'] in info_db:
+            info_db[line['CMTE_ID']].update_info(line)
+        else:
+            info_db[line['CMTE_ID']] = InfoIndividual(line)
+        info = info_db[line['CMTE_ID']]
+        tree.insert(info.get_id(), line['TRANSACTION_DT'],
+                    info.get_date_dict_entry(line['TRANSACTION_DT']))
+
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return used
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--donations", type=int, default=200000,
+                        help="number of stored donations")
+    parser.add_argument("--committees", type=int, default=100,
+                        help="number of distinct recipients")
+    parser.add_argument("--zipcodes", type=int, default=50,
+                        help="number of distinct zip codes")
+    parser.add_argument("--dates", type=int, default=28,
+                        help="number of distinct transaction dates")
+    parser.add_argument("--round-amounts", action='store_true', default=False,
+                        help="only use round amounts, heavily repeated")
+    parser.add_argument("--parse", action='store_true', default=False,
+                        help="parse the records from input lines, as stream_input does")
+    parser.add_argument("--engines", type=str, nargs='+',
+                        default=sorted(MEDIAN_ENGINES), choices=sorted(MEDIAN_ENGINES),
+                        help="running median backends to measure")
+    args = parser.parse_args()
+
+    records = synthetic_records(args.donations, args.committees,
+                                args.zipcodes, args.dates, args.round_amounts,
+                                args.parse)
+    # Each record is stored twice: grouped by zip code and by date
+    print('%-12s %12s %16s' % ('engine', 'bytes', 'bytes/donation'))
+    for engine in args.engines:
+        used = measure(records, engine, args.parse)
+        print('%-12s %12d %16.1f' % (engine, used, float(used) / len(records)))
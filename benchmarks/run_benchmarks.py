@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Benchmark suite of find_political_donors
+
+Generates a synthetic input file (or uses the given one), then measures:
+    - each stage in-process: stream_input, InfoIndividual/InfoByDomainBase
+      updates, AVLTree insertion and output formatting
+    - the end-to-end run of find_political_donors.py in a child process
+and records throughput, duration and peak RSS to a JSON results file.
+
+Run from the root folder:
+    root~$ PYTHONPATH=. python benchmarks/run_benchmarks.py --size 1000000 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.generate_data import generate_file, add_generator_arguments, \
+    generator_kwargs
+from src import *
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_kb(usage):
+    """
+    :param usage: resource.struct_rusage
+    :return: int, peak resident set size in KB (ru_maxrss is in bytes on macOS)
+    """
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+
+def stage(name, rows, seconds):
+    return {'stage': name, 'rows': rows, 'seconds': seconds,
+            'rows_per_second': rows / seconds if seconds else None}
+
+
+def run_stages(input, engine):
+    """
+    Run the processing stages one after the other, in-process
+
+    :return: list of stage results
+    """
+    InfoByDomainBase.set_median_engine(engine)
+    ProgressBar.set_progress_bar(False)
+    size = os.path.getsize(input)
+    results = []
+
+    start = time.time()
+    records = list(stream_input(input))
+    results.append(stage('stream_input', len(records), time.time() - start))
+    results[-1]['megabytes_per_second'] = \
+        size / 1e6 / results[-1]['seconds'] if results[-1]['seconds'] else None
+
+    start = time.time()
+    infoDB = dict()
+    infos = [update_info_database(line, infoDB) for line in records]
+    results.append(stage('update_info', len(records), time.time() - start))
+
+    dated = [(line, info) for line, info in zip(records, infos)
+             if line['TRANSACTION_DT']]
+    start = time.time()
+    infoAVLTree = AVLTreeByID()
+    for line, info in dated:
+        update_info_tree(line, info, infoAVLTree)
+    results.append(stage('update_tree', len(dated), time.time() - start))
+
+    start = time.time()
+    zip_output = [info.output_by_zip(line['ZIP_CODE'])
+                  for line, info in zip(records, infos) if line['ZIP_CODE']]
+    results.append(stage('output_by_zip', len(zip_output), time.time() - start))
+
+    start = time.time()
+    date_output = list(infoAVLTree.output())
+    results.append(stage('output_by_date', len(date_output), time.time() - start))
+
+    return results
+
+
+def run_end_to_end(input, engine, options):
+    """
+    Run find_political_donors.py in a child process
+
+    :return: dictionary, duration and peak RSS of the child process
+    :raises RuntimeError: if the child process did not exit with status 0
+    """
+    folder = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    command = [sys.executable, os.path.join(ROOT, 'src', 'find_political_donors.py'),
+               input, os.path.join(folder, 'medianvals_by_zip.txt'),
+               os.path.join(folder, 'medianvals_by_date.txt'),
+               '--median-engine', engine] + options
+    try:
+        start = time.time()
+        with open(os.devnull, 'w') as devnull:
+            process = subprocess.Popen(command, env=env, stdout=devnull)
+            _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.time() - start
+        # a crashed run is not a valid timing
+        if os.WIFSIGNALED(status):
+            raise RuntimeError('Benchmark run killed by signal %d: %s'
+                               % (os.WTERMSIG(status), ' '.join(command[1:])))
+        if os.WEXITSTATUS(status) != 0:
+            raise RuntimeError('Benchmark run failed with exit status %d: %s'
+                               % (os.WEXITSTATUS(status), ' '.join(command[1:])))
+        with open(os.path.join(folder, 'medianvals_by_zip.txt')) as filein:
+            rows = sum(1 for _ in filein)
+    finally:
+        shutil.rmtree(folder)
+
+    return {'command': ' '.join(command[1:]), 'status': status, 'seconds': seconds,
+            'zip_rows': rows, 'peak_rss_kb': peak_rss_kb(usage)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default=None, help= \
+                        "path to input file, a synthetic file is generated if missing")
+    parser.add_argument("--output", type=str, default='benchmark_results.json',
+                        help="path to JSON results file")
+    parser.add_argument("--engines", type=str, nargs='+', default=['heap'],
+                        choices=sorted(MEDIAN_ENGINES),
+                        help="running median backends to benchmark")
+    parser.add_argument("--skip-end-to-end", action='store_true',
+                        help="only run the in-process stages")
+    parser.add_argument("--options", type=str, nargs=argparse.REMAINDER, default=[],
+                        help="extra options of find_political_donors.py")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    folder = None
+    input = args.input
+    config = {'input': input}
+    if not input:
+        folder = tempfile.mkdtemp()
+        input = os.path.join(folder, 'itcont.txt')
+        start = time.time()
+        generate_file(input, args.size, **generator_kwargs(args))
+        config = dict(generator_kwargs(args), size=args.size,
+                      generation_seconds=time.time() - start)
+    config['input_bytes'] = os.path.getsize(input)
+
+    results = {'python': platform.python_version(), 'platform': platform.platform(),
+               'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'config': config, 'runs': []}
+    try:
+        for engine in args.engines:
+            run = {'engine': engine, 'stages': run_stages(input, engine)}
+            run['stages_seconds'] = sum(entry['seconds'] for entry in run['stages'])
+            if not args.skip_end_to_end:
+                run['end_to_end'] = run_end_to_end(input, engine, args.options)
+            results['runs'].append(run)
+
+            for entry in run['stages']:
+                print('%-10s %-16s %10d rows %9.3f s %12.0f rows/s' % (
+                    engine, entry['stage'], entry['rows'], entry['seconds'],
+                    entry['rows_per_second'] or 0))
+            if 'end_to_end' in run:
+                print('%-10s %-16s %26.3f s %9d KB peak RSS' % (
+                    engine, 'end_to_end', run['end_to_end']['seconds'],
+                    run['end_to_end']['peak_rss_kb']))
+    finally:
+        if folder:
+            shutil.rmtree(folder)
+
+    # peak RSS of the benchmark process, with all the stages
+    results['stages_peak_rss_kb'] = peak_rss_kb(resource.getrusage(resource.RUSAGE_SELF))
+    with open(args.output, 'w') as fileout:
+        json.dump(results, fileout, indent=2, sort_keys=True)
+    print('Results written to ' + args.output)
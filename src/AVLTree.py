@@ -1,3 +1,11 @@
+from bisect import insort
+from src.DateCache import DATE_CACHE
+
+# key_idx (YYYYMMDD) bounds of all the dates
+MIN_DATE_IDX = 0
+MAX_DATE_IDX = 99991231
+
+
 class NodeBase(object):
     """
     Base class that saves node information of self balanced binary search tree
@@ -8,6 +16,8 @@ class NodeBase(object):
     :param height: int, the height of the node in the tree
     
     """
+    __slots__ = ('left', 'right', 'key', 'key_idx', 'val', 'height')
+
     def __init__(self, left=None, right=None):
         self.left = left
         self.right = right
@@ -42,6 +52,9 @@ class NodeByDate(NodeBase):
         - self.key: string (MMDDYYYY)
         - self.key_idx: int (YYYYMMDD)
         - self.val: object of infoByDate, saves median, count and total information
+        - self.subtree_count: int, count of the donations in the subtree of the node
+        - self.subtree_total: int, total of the donations in the subtree of the node,
+            in cents
 
     :param date: string, transaction date, to construct nested tree
     :param info_by_date: object of InfoByDate, with information of median, count, 
@@ -49,11 +62,15 @@ class NodeByDate(NodeBase):
     :param left: object of NodeBase or derived, left child of the node
     :param right: object of NodeBase or derived, right child of the node
     """
+    __slots__ = ('subtree_count', 'subtree_total')
+
     def __init__(self, date, info_by_date, left=None, right=None):
         NodeBase.__init__(self, left, right)
         self.key = date
-        self.key_idx = int(date[4:]+date[:4]) # Change to YYYYMMDD
+        self.key_idx = DATE_CACHE.get_key_idx(date) # Change to YYYYMMDD
         self.val = info_by_date
+        self.subtree_count = info_by_date.get_count()
+        self.subtree_total = info_by_date.get_total()
 
     def update_node(self, node):
         self.val = node.val
@@ -74,8 +91,12 @@ class NodeByID(NodeBase):
     Structure that saves information of each recipient
         - self.key: string, id Cxxxxxxxxx
         - self.key_idx: int, extracted from self._key to simplify comparison
-        - self.val: self-balanced binary search tree that saves donation
-            information to specific recipient grouped by transaction date
+        - self.val: date index that saves donation information to specific
+            recipient grouped by transaction date
+
+    The date index is chosen by name from DATE_INDEXES with set_date_index()
+    for all the following nodes: a calendar of day slots (CalendarByDate)
+    or a self-balanced binary search tree (AVLTreeByDate).
 
     :param id: string, id of the recipient
     :param date: string, transaction date, to construct nested tree
@@ -84,20 +105,34 @@ class NodeByID(NodeBase):
     :param left: object of NodeBase or derived, left child of the node
     :param right: object of NodeBase or derived, right child of the node
     """
+    __slots__ = ()
+    __date_index__ = 'calendar'
+
+    @classmethod
+    def set_date_index(cls, val):
+        if val not in DATE_INDEXES:
+            raise ValueError('Undefined argument value: date index')
+        cls.__date_index__ = val
+
+    @classmethod
+    def get_date_index(cls):
+        return cls.__date_index__
 
     def __init__(self, id, date, info_by_date, left=None, right=None):
         NodeBase.__init__(self, left, right)
         self.key = id
         self.key_idx = int(self.key[1:])
-        self.val = AVLTreeByDate(NodeByDate(date, info_by_date))
+        self.val = DATE_INDEXES[self.__date_index__]()
+        self.val.insert(date, info_by_date)
 
     def update_node(self, node):
         """
         When a transaction date exists for specific recipient, 
-        update the nested tree constructed from the date
+        update the nested date index with the dates of the node
         :param node: object of NodeID, the donation information to be added 
         """
-        self.val.update_tree(node.val.root)
+        for date, info_by_date in list(node.val.get_range()):
+            self.val.insert(date, info_by_date)
 
     def output_NodeByID(self):
         """
@@ -115,6 +150,8 @@ class AVLTree(object):
     """
     A self-balanced binary search tree for rapid insertion of new donation info
     """
+    __slots__ = ('root',)
+
     def __init__(self, root=None):
         self.root = root
 
@@ -131,13 +168,162 @@ class AVLTree(object):
     def update_tree(self, node):
         """
         Insert a new node to the tree
+        If a node with the same key_idx exists, update it with the new node
         
         :param node: nodeBase or derived type 
         """
-        if self.root:
-            self.root = self._update_tree(self.root, node)
+        found = self.find(node.key_idx)
+        if found:
+            found.update_node(node)
+        else:
+            self._insert_node(node)
+
+    def build(self, nodes):
+        """
+        Replace the tree by a balanced tree of the nodes in O(n),
+        without rotation, e.g. to restore a tree from a checkpoint
+
+        :param nodes: list of nodeBase or derived type, sorted by key_idx,
+            without duplicated key_idx
+        """
+        def build_range(start, end):
+            if start >= end:
+                return None
+            # the middle node is the root of the subtree,
+            # the heights of both halves differ by at most 1
+            mid = (start + end) // 2
+            node = nodes[mid]
+            node.left = build_range(start, mid)
+            node.right = build_range(mid + 1, end)
+            node.height = max(self.height(node.left), self.height(node.right)) + 1
+            self._augment(node)
+            return node
+
+        self.root = build_range(0, len(nodes))
+
+    def find(self, key_idx):
+        """
+        :param key_idx: int, key of the node
+        :return: nodeBase or derived type, None if the key is not in the tree
+        """
+        node = self.root
+        while node:
+            if key_idx < node.key_idx:
+                node = node.left
+            elif key_idx > node.key_idx:
+                node = node.right
+            else:
+                return node
+        return None
+
+    def find_range(self, low, high):
+        """
+        In-order walk restricted to the keys in [low, high]
+        The subtrees out of the range are skipped, so the k nodes
+        in the range are found in O(log n + k)
+
+        :param low: int, smallest key_idx of the range
+        :param high: int, largest key_idx of the range
+        :return: generator of nodeBase or derived type, by ascending key_idx
+        """
+        stack = []
+        node = self.root
+        while node or stack:
+            while node:
+                if node.key_idx < low:
+                    # the left subtree is out of the range too
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if node.key_idx > high:
+                return
+            yield node
+            node = node.right
+
+    def _augment(self, node):
+        """
+        Compute the subtree information of the node from its children,
+        when the children of the node change (rotation, build)
+        Nothing is stored in the nodes of the base tree
+
+        :param node: nodeBase or derived type
+        """
+        pass
+
+    def _augment_insert(self, path, new_node):
+        """
+        Add the new node to the subtree information of its ancestors,
+        before the rebalancing
+        Nothing is stored in the nodes of the base tree
+
+        :param path: list of nodeBase or derived type, from the root 
+            down to the parent of the new node
+        :param new_node: nodeBase or derived type
+        """
+        pass
+
+    def _insert_node(self, new_node):
+        """
+        Iterative implementation of node insertion, for a key not in the tree yet
+        Walk down from the root with an explicit path stack, attach the new node
+        and rebalance the path bottom-up
+
+        :param new_node: nodeBase or derived type, the new node to be added 
+        """
+        key_idx = new_node.key_idx
+        path = []
+        node = self.root
+        while node:
+            path.append(node)
+            node = node.left if key_idx < node.key_idx else node.right
+
+        if not path:
+            self.root = new_node
+            return
+        if key_idx < path[-1].key_idx:
+            path[-1].left = new_node
         else:
-            self.root = node
+            path[-1].right = new_node
+        self._augment_insert(path, new_node)
+
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            left_height = node.left.height if node.left else -1
+            right_height = node.right.height if node.right else -1
+
+            # if the added node results in height in-balance: turn the nodes
+            if left_height - right_height == 2:
+                if key_idx < node.left.key_idx:
+                    subtree = self._single_left_rotate(node)
+                else:
+                    subtree = self._double_left_rotate(node)
+            elif right_height - left_height == 2:
+                if key_idx < node.right.key_idx:
+                    subtree = self._double_right_rotate(node)
+                else:
+                    subtree = self._single_right_rotate(node)
+            else:
+                # update the height of the (parent) node,
+                # stop when the height is unchanged
+                height = max(left_height, right_height) + 1
+                if height == node.height:
+                    return
+                node.height = height
+                continue
+
+            # the rotated subtree has the height from before the insertion:
+            # link it to the parent and stop
+            if i == 0:
+                self.root = subtree
+            elif path[i - 1].left is node:
+                path[i - 1].left = subtree
+            else:
+                path[i - 1].right = subtree
+            return
 
     def _single_left_rotate(self, node):
         """
@@ -151,6 +337,8 @@ class AVLTree(object):
         tmp.right = node
         node.height = max(self.height(node.right),self.height(node.left))+1
         tmp.height = max(self.height(tmp.left),node.height)+1
+        self._augment(node)
+        self._augment(tmp)
         return tmp
 
     def _single_right_rotate(self, node):
@@ -165,6 +353,8 @@ class AVLTree(object):
         tmp.left = node
         node.height = max(self.height(node.right), self.height(node.left)) + 1
         tmp.height = max(self.height(tmp.right), node.height) + 1
+        self._augment(node)
+        self._augment(tmp)
         return tmp
 
     def _double_left_rotate(self, node):
@@ -187,52 +377,181 @@ class AVLTree(object):
         node.right = self._single_left_rotate(node.right)
         return self._single_right_rotate(node)
 
-    def _update_tree(self, node, new_node):
+    def __repr__(self):
+        return str(self.root)
+
+
+class AVLTreeByDate(AVLTree):
+    """
+    Specified self-balanced binary search tree with date as node key 
+    and nodeByDate as value
+
+    Each node also holds the count and total of the donations in its subtree,
+    updated on the path of every insertion and in the rotations, so that
+    the count and total of a date range are found in O(log n)
+    """
+    __slots__ = ()
+
+    def _augment(self, node):
+        count = node.val.get_count()
+        total = node.val.get_total()
+        if node.left:
+            count += node.left.subtree_count
+            total += node.left.subtree_total
+        if node.right:
+            count += node.right.subtree_count
+            total += node.right.subtree_total
+        node.subtree_count = count
+        node.subtree_total = total
+
+    def _augment_insert(self, path, new_node):
+        count = new_node.subtree_count
+        total = new_node.subtree_total
+        for node in path:
+            node.subtree_count += count
+            node.subtree_total += total
+
+    def _augment_update(self, node, path):
         """
-        Implementation of node insertion
+        Update the subtree information after the information of the node
+        changed, from the node up to the root
 
-        :param node: nodeBase or derived type, the parent node
-        :param new_node: nodeBase or derived type, the new node to be added 
+        :param node: object of NodeByDate
+        :param path: list of its ancestors from the root
         """
-        if new_node < node:
-            if node.left:
-                node.left = self._update_tree(node.left, new_node)
-            else:
-                node.left = new_node
-            # if the added node results in height in-balance: turn the nodes
-            if (self.height(node.left) - self.height(node.right)) == 2:
-                if new_node < node.left:
-                    node = self._single_left_rotate(node)
-                else:
-                    node = self._double_left_rotate(node)
-        elif new_node > node:
-            if node.right:
-                node.right = self._update_tree(node.right, new_node)
+        count = node.subtree_count
+        total = node.subtree_total
+        self._augment(node)
+        count = node.subtree_count - count
+        total = node.subtree_total - total
+        for ancestor in path:
+            ancestor.subtree_count += count
+            ancestor.subtree_total += total
+
+    def _find_path(self, key_idx):
+        """
+        :param key_idx: int, key of the node
+        :return: tuple (node, path), object of NodeByDate or None if the key 
+            is not in the tree, and the list of its ancestors from the root
+        """
+        path = []
+        node = self.root
+        while node:
+            if key_idx < node.key_idx:
+                path.append(node)
+                node = node.left
+            elif key_idx > node.key_idx:
+                path.append(node)
+                node = node.right
             else:
-                node.right = new_node
-            # if the added node results in height in-balance: turn the nodes
-            if (self.height(node.right) - self.height(node.left)) == 2:
-                if new_node < node.right:
-                    node = self._double_right_rotate(node)
-                else:
-                    node = self._single_right_rotate(node)
-        # if new_node == node: update median, count, and total information in-place
+                break
+        return node, path
+
+    def update_tree(self, node):
+        found, path = self._find_path(node.key_idx)
+        if found:
+            found.update_node(node)
+            self._augment_update(found, path)
         else:
-            node.update_node(new_node)
+            self._insert_node(node)
 
-        # update the height of the (parent) node
-        node.height = max(self.height(node.right), self.height(node.left)) + 1
+    def insert(self, date, info_by_date):
+        """
+        Insert the donation information on the transaction date,
+        a node is only allocated if the date is not in the tree yet
+        The information may have been updated in place: the subtree 
+        information is updated on the path to the node in both cases
+
+        :param date: string, transaction date
+        :param info_by_date: object of InfoByDate
+        :return: object of NodeByDate, the node holding the information
+        """
+        node, path = self._find_path(DATE_CACHE.get_key_idx(date))
+        if node:
+            node.val = info_by_date
+            self._augment_update(node, path)
+        else:
+            node = NodeByDate(date, info_by_date)
+            self._insert_node(node)
         return node
 
-    def __repr__(self):
-        return str(self.root)
+    def get_count(self):
+        """
+        :return: int, count of the donations on all the dates
+        """
+        return self.root.subtree_count if self.root else 0
 
+    def get_total(self):
+        """
+        :return: int, total of the donations on all the dates in cents
+        """
+        return self.root.subtree_total if self.root else 0
+
+    def aggregate_range(self, low, high):
+        """
+        Count and total of the donations on the dates in [low, high], in O(log n)
+        Below the first node in the range, the walk follows the two bounds 
+        of the range down, and adds up the subtrees between them
+
+        :param low: int, first date of the range (YYYYMMDD)
+        :param high: int, last date of the range (YYYYMMDD)
+        :return: tuple (count, total), total in cents
+        """
+        # the first node in the range, its subtree holds the whole range
+        node = self.root
+        while node and not low <= node.key_idx <= high:
+            node = node.left if high < node.key_idx else node.right
+        if not node:
+            return 0, 0
+
+        count = node.val.get_count()
+        total = node.val.get_total()
+
+        # nodes from low up in the left subtree
+        left = node.left
+        while left:
+            if left.key_idx < low:
+                left = left.right
+                continue
+            count += left.val.get_count()
+            total += left.val.get_total()
+            if left.right:
+                count += left.right.subtree_count
+                total += left.right.subtree_total
+            left = left.left
+
+        # nodes up to high in the right subtree
+        right = node.right
+        while right:
+            if right.key_idx > high:
+                right = right.left
+                continue
+            count += right.val.get_count()
+            total += right.val.get_total()
+            if right.left:
+                count += right.left.subtree_count
+                total += right.left.subtree_total
+            right = right.right
+
+        return count, total
+
+    def get_range(self, low=MIN_DATE_IDX, high=MAX_DATE_IDX):
+        """
+        :param low: int, first date of the range (YYYYMMDD)
+        :param high: int, last date of the range (YYYYMMDD)
+        :return: generator of tuples (date, object InfoByDate), by ascending date
+        """
+        for node in self.find_range(low, high):
+            yield node.key, node.val
+
+    def get(self, key_idx):
+        """
+        :param key_idx: int, date (YYYYMMDD)
+        :return: object InfoByDate, None if the date is not in the tree
+        """
+        node = self.find(key_idx)
+        return node.val if node else None
 
-class AVLTreeByDate(AVLTree):
-    """
-    Specified self-balanced binary search tree with date as node key 
-    and nodeByDate as value
-    """
     def output_TreeByDate(self):
         stack = []
         node = self.root
@@ -245,12 +564,379 @@ class AVLTreeByDate(AVLTree):
             node = node.right
 
 
-class AVLTreeByID(AVLTree):
+class CalendarByDate(object):
+    """
+    Date index of the donations to one recipient, addressed by the day
+    of the transaction date, with the same interface as AVLTreeByDate:
+        - self._start: int, day number of the first slot, None if empty
+        - self._slots: list of objects InfoByDate, one slot per day 
+            from self._start, None for the days without donation
+        - self._fallback: object AVLTreeByDate, the dates out of the window,
+            None until such a date is inserted
+        - self._sums: tuple (counts, totals, count_tree, total_tree), the count
+            and total of each slot and their Fenwick trees, None until the
+            count and total of a date range are requested
+
+    The slots span at most WINDOW_DAYS days, and are grown at either end 
+    as the dates come, the first and the last slots are never empty.
+    The dates of a recipient mostly fall in one election cycle (about 730 days),
+    the dates out of the window are kept in the fallback tree. As the slots 
+    only grow, a date of the fallback tree is never in the slots.
+
+    Insertion and lookup take O(1) for the dates in the window, the dates are
+    output in order by a linear scan of the slots, before and after the dates 
+    of the fallback tree.
+
+    The count and total of a date range are the difference of two prefix sums
+    of the slots, found in O(log n) in Fenwick trees. The Fenwick trees are 
+    built in O(n) by the first range request, then updated in O(log n) by each
+    insertion, and dropped when the slots grow. The records of a run without 
+    range request do not update them.
+
+    """
+    __slots__ = ('_start', '_slots', '_fallback', '_sums')
+
+    WINDOW_DAYS = 1024
+
+    def __init__(self):
+        self._start = None
+        self._slots = []
+        self._fallback = None
+        self._sums = None
+
+    def _slot(self, key_idx, grow=False):
+        """
+        :param key_idx: int, date (YYYYMMDD)
+        :param grow: boolean, whether to grow the slots to the date, 
+            within the window
+        :return: int, index of the slot of the date, None if the date is 
+            out of the slots (out of the window if grow is True)
+        """
+        day = DATE_CACHE.get_day_number(key_idx)
+        if day is None:
+            return None
+        if self._start is None:
+            if not grow:
+                return None
+            self._start = day
+            self._slots.append(None)
+            return 0
+
+        i = day - self._start
+        size = len(self._slots)
+        if 0 <= i < size:
+            return i
+        if not grow:
+            return None
+
+        if i >= size:
+            if i >= self.WINDOW_DAYS:
+                return None
+            self._slots.extend([None] * (i + 1 - size))
+            return i
+        if size - i > self.WINDOW_DAYS:
+            return None
+        self._slots[0:0] = [None] * (-i)
+        self._start = day
+        return 0
+
+    def _scan(self, low, high):
+        """
+        :return: generator of tuples (date, object InfoByDate), 
+            the dates of the slots in [low, high] by ascending date
+        """
+        slots = self._slots
+        start = self._start
+        day = DATE_CACHE.get_day_number(low)
+        first = 0 if day is None else max(day - start, 0)
+        day = DATE_CACHE.get_day_number(high)
+        last = len(slots) if day is None else min(day - start + 1, len(slots))
+        for i in range(first, last):
+            info_by_date = slots[i]
+            if info_by_date is not None:
+                date, key_idx = DATE_CACHE.get_day_date(start + i)
+                if low <= key_idx <= high:
+                    yield date, info_by_date
+
+    def insert(self, date, info_by_date):
+        """
+        Insert the donation information on the transaction date,
+        replacing the information of the date if any
+
+        :param date: string, transaction date
+        :param info_by_date: object of InfoByDate
+        """
+        size = len(self._slots)
+        i = self._slot(DATE_CACHE.get_key_idx(date), True)
+        if i is not None:
+            self._slots[i] = info_by_date
+            if self._sums is not None:
+                if len(self._slots) == size:
+                    self._update_sums(i, info_by_date)
+                else:
+                    # the slots moved, the sums are built again on request
+                    self._sums = None
+            return
+        if self._fallback is None:
+            self._fallback = AVLTreeByDate()
+        self._fallback.insert(date, info_by_date)
+
+    def build(self, nodes):
+        """
+        Replace the index by the dates of the nodes, e.g. to restore 
+        the index from a checkpoint
+        The slots are grown from the middle date, to center the window
+
+        :param nodes: list of NodeByDate, sorted by key_idx,
+            without duplicated key_idx
+        """
+        self.__init__()
+        mid = len(nodes) // 2
+        for node in nodes[mid:] + nodes[:mid][::-1]:
+            self.insert(node.key, node.val)
+
+    def get(self, key_idx):
+        """
+        :param key_idx: int, date (YYYYMMDD)
+        :return: object InfoByDate, None if the date is not in the index
+        """
+        i = self._slot(key_idx)
+        if i is not None:
+            return self._slots[i]
+        return self._fallback.get(key_idx) if self._fallback else None
+
+    def get_range(self, low=MIN_DATE_IDX, high=MAX_DATE_IDX):
+        """
+        :param low: int, first date of the range (YYYYMMDD)
+        :param high: int, last date of the range (YYYYMMDD)
+        :return: generator of tuples (date, object InfoByDate), by ascending date
+        """
+        nodes = self._fallback.find_range(low, high) if self._fallback else iter(())
+        node = next(nodes, None)
+        if self._slots:
+            # fallback dates before the slots
+            first = DATE_CACHE.get_day_date(self._start)[1]
+            while node is not None and node.key_idx < first:
+                yield node.key, node.val
+                node = next(nodes, None)
+            for entry in self._scan(low, high):
+                yield entry
+        while node is not None:
+            yield node.key, node.val
+            node = next(nodes, None)
+
+    def get_count(self):
+        """
+        :return: int, count of the donations on all the dates
+        """
+        return self.aggregate_range(MIN_DATE_IDX, MAX_DATE_IDX)[0]
+
+    def get_total(self):
+        """
+        :return: int, total of the donations on all the dates in cents
+        """
+        return self.aggregate_range(MIN_DATE_IDX, MAX_DATE_IDX)[1]
+
+    def _build_sums(self):
+        """
+        Build the Fenwick trees of the count and total of the slots, in O(n)
+
+        :return: tuple (counts, totals, count_tree, total_tree)
+        """
+        size = len(self._slots)
+        counts = [0] * size
+        totals = [0] * size
+        count_tree = [0] * (size + 1)
+        total_tree = [0] * (size + 1)
+        for i, info_by_date in enumerate(self._slots):
+            if info_by_date is not None:
+                counts[i] = count_tree[i + 1] = info_by_date.get_count()
+                totals[i] = total_tree[i + 1] = info_by_date.get_total()
+
+        # each node of the tree adds its sum to its parent
+        for j in range(1, size + 1):
+            parent = j + (j & -j)
+            if parent <= size:
+                count_tree[parent] += count_tree[j]
+                total_tree[parent] += total_tree[j]
+
+        self._sums = counts, totals, count_tree, total_tree
+        return self._sums
+
+    def _update_sums(self, i, info_by_date):
+        """
+        Update the Fenwick trees after the information of a slot changed
+
+        :param i: int, index of the slot
+        :param info_by_date: object of InfoByDate, the information of the slot
+        """
+        counts, totals, count_tree, total_tree = self._sums
+        count = info_by_date.get_count() - counts[i]
+        total = info_by_date.get_total() - totals[i]
+        counts[i] += count
+        totals[i] += total
+        j = i + 1
+        while j < len(count_tree):
+            count_tree[j] += count
+            total_tree[j] += total
+            j += j & -j
+
+    def _prefix_sums(self, end):
+        """
+        :param end: int, number of slots from the first one
+        :return: tuple (count, total), of the slots before end
+        """
+        _, _, count_tree, total_tree = self._sums or self._build_sums()
+        count = total = 0
+        while end:
+            count += count_tree[end]
+            total += total_tree[end]
+            end &= end - 1
+        return count, total
+
+    def aggregate_range(self, low, high):
+        """
+        Count and total of the donations on the dates in [low, high], in O(log n)
+
+        :param low: int, first date of the range (YYYYMMDD)
+        :param high: int, last date of the range (YYYYMMDD)
+        :return: tuple (count, total), total in cents
+        """
+        count, total = self._fallback.aggregate_range(low, high) \
+            if self._fallback else (0, 0)
+        if self._slots:
+            # slots of the days in [low, high + 1)
+            size = len(self._slots)
+            first = min(max(DATE_CACHE.get_first_day_number(low) - self._start, 0), size)
+            last = min(max(DATE_CACHE.get_first_day_number(high + 1) - self._start, 0), size)
+            if first < last:
+                last_count, last_total = self._prefix_sums(last)
+                first_count, first_total = self._prefix_sums(first)
+                count += last_count - first_count
+                total += last_total - first_total
+        return count, total
+
+    def output_TreeByDate(self):
+        for date, info_by_date in self.get_range():
+            yield date + '|' + info_by_date.output()
+
+    def __repr__(self):
+        return str(list(self.get_range()))
+
+
+class ChangeLogByID(object):
+    """
+    Change tracking of the ordered indexes of the recipients
+
+    When change tracking is enabled, the index keeps the (recipient, date) 
+    entries changed since the last flush_changes(), so that only the changed 
+    entries are output:
+        - self._changes: {(id key_idx, date key_idx): (id, date, object InfoByDate)}, 
+            None when change tracking is disabled
+    The slot is declared by the derived classes.
+
+    """
+    __slots__ = ()
+
+    def set_track_changes(self, val):
+        """
+        Enable or disable change tracking, the tracked changes are dropped
+
+        :param val: boolean
+        """
+        self._changes = dict() if val else None
+
+    def get_track_changes(self):
+        return self._changes is not None
+
+    def has_changes(self):
+        """
+        :return: boolean, whether any entry changed since the last flush
+        """
+        return bool(self._changes)
+
+    def mark_all_changed(self):
+        """
+        Track every entry of the index as changed, e.g. the entries restored
+        from a checkpoint, whose output may be behind
+        """
+        for node in self.nodes():
+            for date, info_by_date in node.val.get_range():
+                self._mark_changed(node.key, date, info_by_date)
+
+    def _mark_changed(self, id, date, info_by_date):
+        self._changes[(int(id[1:]), DATE_CACHE.get_key_idx(date))] = \
+            (id, date, info_by_date)
+
+    def output_changes(self):
+        """
+        Output the entries changed since the last flush, 
+        in the same order as output()
+
+        :return: string generator, with format CMTE_ID|TRANSACTION_DT|MEDIAN|COUNT|TOTAL
+        """
+        for key in sorted(self._changes or ()):
+            id, date, info_by_date = self._changes[key]
+            yield id + '|' + date + '|' + info_by_date.output()
+
+    def flush_changes(self):
+        """
+        Output the entries changed since the last flush, and reset the changes
+        (when the output starts to be consumed)
+
+        :return: string generator, with format CMTE_ID|TRANSACTION_DT|MEDIAN|COUNT|TOTAL
+        """
+        changes = self._changes or dict()
+        if self._changes is not None:
+            self._changes = dict()
+        for key in sorted(changes):
+            id, date, info_by_date = changes[key]
+            yield id + '|' + date + '|' + info_by_date.output()
+
+
+class AVLTreeByID(AVLTree, ChangeLogByID):
     """
     Specified self-balanced binary search tree with ID as node key 
     and AVLTreeByNode as value
+
+    :param root: object of NodeByID, root of the tree
+    :param track_changes: boolean, whether changed entries are tracked
     """
-    def output(self):
+    __slots__ = ('_changes',)
+
+    def __init__(self, root=None, track_changes=False):
+        AVLTree.__init__(self, root)
+        self._changes = None
+        self.set_track_changes(track_changes)
+
+    def update_tree(self, node):
+        entries = list(node.val.get_range()) if self._changes is not None else ()
+        AVLTree.update_tree(self, node)
+        for date, info_by_date in entries:
+            self._mark_changed(node.key, date, info_by_date)
+
+    def insert(self, id, date, info_by_date):
+        """
+        Insert the donation information to the recipient on the transaction date,
+        nodes are only allocated if the recipient or the date is not in the tree yet
+
+        :param id: string, id of the recipient
+        :param date: string, transaction date
+        :param info_by_date: object of InfoByDate
+        """
+        node = self.find(int(id[1:]))
+        if node:
+            node.val.insert(date, info_by_date)
+        else:
+            self._insert_node(NodeByID(id, date, info_by_date))
+
+        if self._changes is not None:
+            self._mark_changed(id, date, info_by_date)
+
+    def nodes(self):
+        """
+        :return: generator of NodeByID, via in-order traversal
+        """
         stack = []
         node = self.root
         while node or stack:
@@ -258,6 +944,125 @@ class AVLTreeByID(AVLTree):
                 stack.append(node)
                 node = node.left
             node = stack.pop()
+            yield node
+            node = node.right
+
+    def output(self):
+        for node in self.nodes():
             for a in node.output_NodeByID():
                 yield a
-            node = node.right
+
+
+class SortedIndexByID(ChangeLogByID):
+    """
+    Ordered index of the recipients, with the same interface as AVLTreeByID:
+        - self._nodes: {key_idx: object NodeByID}, lookup of a recipient in O(1)
+        - self._keys: list of the key_idx in ascending order, maintained with
+            bisect, for the output in order
+
+    The recipients number in the tens of thousands and most of the records
+    go to a recipient already in the index: the lookup is a dictionary access
+    instead of a walk down the tree. A new recipient is inserted in the key
+    list in O(n) (array insertion), appended in O(1) if its key is the largest.
+
+    :param track_changes: boolean, whether changed entries are tracked
+    """
+    __slots__ = ('_nodes', '_keys', '_changes')
+
+    def __init__(self, track_changes=False):
+        self._nodes = dict()
+        self._keys = []
+        self._changes = None
+        self.set_track_changes(track_changes)
+
+    def _add_node(self, node):
+        """
+        :param node: object of NodeByID, for a key not in the index yet
+        """
+        self._nodes[node.key_idx] = node
+        if self._keys and node.key_idx < self._keys[-1]:
+            insort(self._keys, node.key_idx)
+        else:
+            self._keys.append(node.key_idx)
+
+    def find(self, key_idx):
+        """
+        :param key_idx: int, key of the recipient
+        :return: object of NodeByID, None if the key is not in the index
+        """
+        return self._nodes.get(key_idx)
+
+    def build(self, nodes):
+        """
+        Replace the index by the nodes, e.g. to restore the index from a checkpoint
+
+        :param nodes: list of NodeByID, sorted by key_idx, without duplicated key_idx
+        """
+        self._keys = [node.key_idx for node in nodes]
+        self._nodes = dict(zip(self._keys, nodes))
+
+    def update_tree(self, node):
+        """
+        Insert a new node to the index
+        If a node with the same key_idx exists, update it with the new node
+
+        :param node: object of NodeByID
+        """
+        entries = list(node.val.get_range()) if self._changes is not None else ()
+        found = self._nodes.get(node.key_idx)
+        if found:
+            found.update_node(node)
+        else:
+            self._add_node(node)
+        for date, info_by_date in entries:
+            self._mark_changed(node.key, date, info_by_date)
+
+    def insert(self, id, date, info_by_date):
+        """
+        Insert the donation information to the recipient on the transaction date,
+        nodes are only allocated if the recipient or the date is not in the index yet
+
+        :param id: string, id of the recipient
+        :param date: string, transaction date
+        :param info_by_date: object of InfoByDate
+        """
+        node = self._nodes.get(int(id[1:]))
+        if node:
+            node.val.insert(date, info_by_date)
+        else:
+            self._add_node(NodeByID(id, date, info_by_date))
+
+        if self._changes is not None:
+            self._mark_changed(id, date, info_by_date)
+
+    def nodes(self):
+        """
+        :return: generator of NodeByID, by ascending key_idx
+        """
+        nodes = self._nodes
+        for key_idx in self._keys:
+            yield nodes[key_idx]
+
+    def output(self):
+        for node in self.nodes():
+            for a in node.output_NodeByID():
+                yield a
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return str([self._nodes[key_idx] for key_idx in self._keys])
+
+
+# Date indexes of the recipients selectable by name
+DATE_INDEXES = {
+    'calendar': CalendarByDate,
+    'tree': AVLTreeByDate,
+}
+
+# Ordered indexes of the recipients selectable by name
+ID_INDEXES = {
+    'tree': AVLTreeByID,
+    'sorted': SortedIndexByID,
+}
@@ -0,0 +1,187 @@
+import datetime
+
+
+class DateCache(object):
+    """
+    Bounded cache of FEC style date strings (MMDDYYYY)
+    FEC files contain few distinct dates, so each date string is only
+    validated and encoded once, and shared by the input validation
+    and the date tree nodes.
+
+    Each entry maps the date string to:
+        - valid: boolean, whether the string is a real date
+        - key_idx: int (YYYYMMDD) used for date ordering,
+            None if the string is not 8 digits
+
+    Real dates are also numbered by day (proleptic Gregorian ordinal)
+    for the calendar date indexes, in a second map of at most
+    maxsize entries, in both directions:
+        - {key_idx: day number}
+        - {day number: (date string MMDDYYYY, key_idx)}
+    A missed day is recomputed, so the maps can be emptied at any time.
+
+    The cache is emptied when it reaches maxsize entries.
+
+    :param maxsize: int, maximal number of cached date strings
+
+    """
+
+    def __init__(self, maxsize=100000):
+        self._maxsize = maxsize
+        self._cache = dict()
+        self._day_numbers = dict()
+        self._day_dates = dict()
+        self._hits = 0
+        self._misses = 0
+
+    def lookup(self, date):
+        """
+        :param date: string, FEC style date
+        :return: tuple, (valid, key_idx) of the date string
+        """
+        try:
+            entry = self._cache[date]
+            self._hits += 1
+            return entry
+        except KeyError:
+            pass
+
+        self._misses += 1
+        entry = self._encode(date)
+        if len(self._cache) >= self._maxsize:
+            self._cache.clear()
+        self._cache[date] = entry
+        return entry
+
+    def is_valid(self, date):
+        """
+        :param date: string, FEC style date
+        :return: boolean, True if the date string can be converted to a real date
+        """
+        return self.lookup(date)[0]
+
+    def get_key_idx(self, date):
+        """
+        :param date: string, FEC style date
+        :return: int, YYYYMMDD
+        """
+        key_idx = self.lookup(date)[1]
+        if key_idx is None:
+            raise ValueError('Invalid date: ' + str(date))
+        return key_idx
+
+    def get_day_number(self, key_idx):
+        """
+        :param key_idx: int, date (YYYYMMDD)
+        :return: int, day number of the date (proleptic Gregorian ordinal),
+            None if the key is not a real date
+        """
+        try:
+            return self._day_numbers[key_idx]
+        except KeyError:
+            pass
+
+        year, month, day = key_idx // 10000, key_idx // 100 % 100, key_idx % 100
+        try:
+            number = datetime.date(year, month, day).toordinal()
+        except ValueError:
+            return None
+        self._add_day(number, '%02d%02d%04d' % (month, day, year), key_idx)
+        return number
+
+    def get_first_day_number(self, key_idx):
+        """
+        :param key_idx: int, date (YYYYMMDD), not necessarily a real date
+        :return: int, day number of the first real date from key_idx on
+        """
+        number = self.get_day_number(key_idx)
+        if number is not None:
+            return number
+
+        year, month, day = key_idx // 10000, key_idx // 100 % 100, key_idx % 100
+        if year < datetime.MINYEAR:
+            return datetime.date.min.toordinal()
+        if month < 1:
+            month, day = 1, 1
+        elif month > 12:
+            year, month, day = year + 1, 1, 1
+        elif day < 1:
+            day = 1
+        elif month == 12:
+            # past the end of the month
+            year, month, day = year + 1, 1, 1
+        else:
+            month, day = month + 1, 1
+        if year > datetime.MAXYEAR:
+            return datetime.date.max.toordinal() + 1
+        return datetime.date(year, month, day).toordinal()
+
+    def get_day_date(self, number):
+        """
+        :param number: int, day number (proleptic Gregorian ordinal)
+        :return: tuple, (date string MMDDYYYY, key_idx) of the day
+        """
+        try:
+            return self._day_dates[number]
+        except KeyError:
+            pass
+
+        day = datetime.date.fromordinal(number)
+        key_idx = day.year * 10000 + day.month * 100 + day.day
+        date = '%02d%02d%04d' % (day.month, day.day, day.year)
+        self._add_day(number, date, key_idx)
+        return date, key_idx
+
+    def _add_day(self, number, date, key_idx):
+        if len(self._day_numbers) >= self._maxsize:
+            self._day_numbers.clear()
+            self._day_dates.clear()
+        self._day_numbers[key_idx] = number
+        self._day_dates[number] = (date, key_idx)
+
+    def get_hits(self):
+        return self._hits
+
+    def get_misses(self):
+        return self._misses
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        """
+        Empty the cache and reset the hit/miss counters
+        """
+        self._cache.clear()
+        self._day_numbers.clear()
+        self._day_dates.clear()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _encode(date):
+        """
+        Validate the date string via built-in datetime.date type
+        and convert it to YYYYMMDD
+        """
+        if len(date) != 8 or (not date.isdigit()):
+            return False, None
+
+        try:
+            key_idx = int(date[4:] + date[:4])  # Change to YYYYMMDD
+        except ValueError:
+            return False, None
+
+        try:
+            datetime.date(key_idx // 10000, key_idx // 100 % 100, key_idx % 100)
+        except ValueError:
+            return False, key_idx
+        return True, key_idx
+
+    def __repr__(self):
+        return "DateCache: " + ','.join(map(str, [
+            len(self._cache), self._hits, self._misses]))
+
+
+# Cache shared by input validation and date tree nodes
+DATE_CACHE = DateCache()
@@ -0,0 +1,215 @@
+"""
+Queries over the aggregated donor state, e.g. saved by --state or --checkpoint
+
+Run from the root folder:
+    root~$ PYTHONPATH=. python src/DonorQuery.py path/to/state C00384818 --zip 02895
+    root~$ PYTHONPATH=. python src/DonorQuery.py path/to/state C00384818 --date 01122017
+    root~$ PYTHONPATH=. python src/DonorQuery.py state.ckpt C00384818 --from 01012017 --to 01312017 --summary
+    root~$ PYTHONPATH=. python src/DonorQuery.py state.ckpt C00384818 --from 01012017 --to 01312017 --totals
+"""
+import argparse
+import heapq
+import os
+import sys
+from src.AVLTree import MIN_DATE_IDX, MAX_DATE_IDX
+from src.DateCache import DATE_CACHE
+from src.InfoTable import InfoByDate, round_half_even_cents
+from src.checkpoint import load_checkpoint, load_state
+from src.stream_input import validate_date
+
+
+class DonorQuery(object):
+    """
+    Read-only queries over the information database and the tree:
+        - point lookups of a recipient by zip code or by transaction date,
+            from the information database
+        - transaction date ranges of a recipient, from the date index
+            of the recipient: with the tree index, the k dates in the range
+            are found in O(log n + k) among the n dates of the recipient,
+            the calendar index scans the days of the range, both indexes
+            find the count and total of the range in O(log n)
+
+    :param infoDB: dict, information database {id: object infoIndividual}
+    :param infoAVLTree: object AVLTreeByID
+
+    """
+    def __init__(self, infoDB, infoAVLTree):
+        self._infoDB = infoDB
+        self._infoAVLTree = infoAVLTree
+
+    @classmethod
+    def from_checkpoint(cls, path, engine=None):
+        """
+        :param path: string, path to the checkpoint file or to the state folder
+        :param engine: string, name of the running median backend,
+            None for InfoByDomainBase.get_median_engine()
+        :return: object DonorQuery
+        """
+        if os.path.isdir(path):
+            infoDB, infoAVLTree = load_state(path, engine=engine)
+        else:
+            infoDB, infoAVLTree, _, _ = load_checkpoint(path, engine)
+        return cls(infoDB, infoAVLTree)
+
+    def _key_range(self, start, end):
+        """
+        :return: tuple (low, high), key_idx bounds of the date range
+        """
+        low = MIN_DATE_IDX if start is None else DATE_CACHE.get_key_idx(start)
+        high = MAX_DATE_IDX if end is None else DATE_CACHE.get_key_idx(end)
+        return low, high
+
+    def get_by_zip(self, id, zipcode):
+        """
+        :param id: string, id of the recipient
+        :param zipcode: string, 5 digit zip code
+        :return: object InfoByZip, None if the recipient has no donation
+            from the zip code
+        """
+        info = self._infoDB.get(id)
+        return info.get_zip_dict_entry(zipcode) if info else None
+
+    def get_by_date(self, id, date):
+        """
+        :param id: string, id of the recipient
+        :param date: string, transaction date (MMDDYYYY)
+        :return: object InfoByDate, None if the recipient has no donation
+            on the date
+        """
+        info = self._infoDB.get(id)
+        return info.get_date_dict_entry(date) if info else None
+
+    def get_date_range(self, id, start=None, end=None):
+        """
+        :param id: string, id of the recipient
+        :param start: string, first transaction date (MMDDYYYY) of the range,
+            None for no lower bound
+        :param end: string, last transaction date (MMDDYYYY) of the range,
+            None for no upper bound
+        :return: generator of tuples (date, object InfoByDate),
+            by ascending date
+        """
+        low, high = self._key_range(start, end)
+        node = self._infoAVLTree.find(int(id[1:]))
+        if not node:
+            return
+        for entry in node.val.get_range(low, high):
+            yield entry
+
+    def get_date_range_totals(self, id, start=None, end=None):
+        """
+        Count and total of the donations to the recipient in the date range,
+        from the date index of the recipient
+
+        :param id: string, id of the recipient
+        :param start: string, first transaction date (MMDDYYYY) of the range,
+            None for no lower bound
+        :param end: string, last transaction date (MMDDYYYY) of the range,
+            None for no upper bound
+        :return: tuple (count, total), total in cents
+        """
+        low, high = self._key_range(start, end)
+        node = self._infoAVLTree.find(int(id[1:]))
+        if not node:
+            return 0, 0
+        return node.val.aggregate_range(low, high)
+
+    def get_date_range_summary(self, id, start=None, end=None):
+        """
+        Aggregate all the donations to the recipient in the date range
+
+        :param id: string, id of the recipient
+        :param start: string, first transaction date (MMDDYYYY) of the range,
+            None for no lower bound
+        :param end: string, last transaction date (MMDDYYYY) of the range,
+            None for no upper bound
+        :return: object InfoByDate, median, count and total of the range,
+            None if the recipient has no donation in the range
+        """
+        groups = [info for _, info in self.get_date_range(id, start, end)]
+        if not groups:
+            return None
+        values = list(heapq.merge(*[info.get_values() for info in groups]))
+        return InfoByDate.restore(values, sum(info.get_total() for info in groups))
+
+    def output_by_zip(self, id, zipcode):
+        """
+        :return: string with format CMTE_ID|ZIP_CODE|MEDIAN|COUNT|TOTAL,
+            empty string if the entry is missing
+        """
+        info = self._infoDB.get(id)
+        return info.output_by_zip(zipcode) if info else ''
+
+    def output_by_date(self, id, date):
+        """
+        :return: string with format CMTE_ID|TRANSACTION_DT|MEDIAN|COUNT|TOTAL,
+            empty string if the entry is missing
+        """
+        info = self._infoDB.get(id)
+        return info.output_by_date(date) if info else ''
+
+    def output_date_range(self, id, start=None, end=None):
+        """
+        :return: string generator, with format CMTE_ID|TRANSACTION_DT|MEDIAN|COUNT|TOTAL
+        """
+        for date, info in self.get_date_range(id, start, end):
+            yield id + '|' + date + '|' + info.output()
+
+    def output_date_range_totals(self, id, start=None, end=None):
+        """
+        :return: string with format CMTE_ID|START|END|COUNT|TOTAL,
+            empty bounds for an open range
+        """
+        count, total = self.get_date_range_totals(id, start, end)
+        return '%s|%s|%s|%d|%d\n' % (id, start or '', end or '', count,
+                                      round_half_even_cents(total))
+
+    def output_date_range_summary(self, id, start=None, end=None):
+        """
+        :return: string with format CMTE_ID|START|END|MEDIAN|COUNT|TOTAL,
+            empty bounds for an open range,
+            empty string if the recipient has no donation in the range
+        """
+        summary = self.get_date_range_summary(id, start, end)
+        if summary is None:
+            return ''
+        return '|'.join([id, start or '', end or '', summary.output()])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("state", type=str, help= \
+                        "path to a state folder or a checkpoint file")
+    parser.add_argument("id", type=str, help="CMTE_ID of the recipient")
+    parser.add_argument("--zip", type=str, default=None, help= \
+                        "5 digit zip code to look up")
+    parser.add_argument("--date", type=str, default=None, help= \
+                        "transaction date (MMDDYYYY) to look up")
+    parser.add_argument("--from", dest="start", type=str, default=None, help= \
+                        "first transaction date (MMDDYYYY) of the date range")
+    parser.add_argument("--to", dest="end", type=str, default=None, help= \
+                        "last transaction date (MMDDYYYY) of the date range")
+    parser.add_argument("--summary", action='store_true', default=False, help= \
+                        "aggregate the date range to one entry")
+    parser.add_argument("--totals", action='store_true', default=False, help= \
+                        "only the count and total of the date range")
+    args = parser.parse_args(argv)
+    for option, date in [('--from', args.start), ('--to', args.end)]:
+        if date is not None and not validate_date(date):
+            parser.error("%s must be a transaction date (MMDDYYYY): %s" % (option, date))
+
+    query = DonorQuery.from_checkpoint(args.state)
+    if args.zip:
+        sys.stdout.write(query.output_by_zip(args.id, args.zip))
+    elif args.date:
+        sys.stdout.write(query.output_by_date(args.id, args.date))
+    elif args.totals:
+        sys.stdout.write(query.output_date_range_totals(args.id, args.start, args.end))
+    elif args.summary:
+        sys.stdout.write(query.output_date_range_summary(args.id, args.start, args.end))
+    else:
+        sys.stdout.writelines(query.output_date_range(args.id, args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,33 @@
-from src.LinkedListNode import *
-from decimal import Decimal, ROUND_HALF_UP # For Py2 and Py3 compatibility
+from src.MedianEngine import *
+
+
+def round_half_up_mean(left, right):
+    """
+    Round the mean of two amounts in cents to whole dollars, half away from zero,
+    the same as (Decimal(left + right) / 200).quantize(0, ROUND_HALF_UP)
+
+    :param left: int, lower median in cents
+    :param right: int, upper median in cents
+    :return: int, rounded median in dollars
+    """
+    twice = left + right
+    if twice < 0:
+        return -((100 - twice) // 200)
+    return (twice + 100) // 200
+
+
+def round_half_even_cents(amount):
+    """
+    Round an amount in cents to whole dollars, half to even,
+    as round() of the amount in dollars
+
+    :param amount: int, amount in cents
+    :return: int, rounded amount in dollars
+    """
+    dollars, cents = divmod(amount, 100)
+    if cents > 50 or (cents == 50 and dollars % 2):
+        dollars += 1
+    return dollars
 
 
 class InfoByDomainBase(object):
@@ -10,115 +38,168 @@ class InfoByDomainBase(object):
         - self._count: the count of donation to specific recipient
             with specific grouping rules ,
         - self._median: round median of donation to specific recipient 
-            with specific grouping rules,
+            with specific grouping rules, None until the median is requested
+            after an update,
         - self._total : total donations to to specific recipient 
-            with specific grouping rules,
-        - self._median_left, self._median_right: objects of the doubly 
-            linked list, as indexes for median position
+            with specific grouping rules, in cents,
+        - self._engine: running median backend (MedianEngine) that stores 
+            every donation amount and indexes the median position
+
+    The running median backend is chosen by name from MEDIAN_ENGINES, 
+    either with the engine argument or with set_median_engine() 
+    for all the following instances of the class.
+
+    The median is only rounded when it is requested by get_median()/output(),
+    so consecutive updates without output skip the rounding.
 
-    :param amount: float, the amount of current transaction
+    The amounts and the total are integers in cents, so the total is exact,
+    the median and the total are rounded to dollars on output.
+
+    :param amount: int, the amount of current transaction in cents
+    :param engine: string, name of the running median backend
 
     """
+    __slots__ = ('_median', '_count', '_total', '_engine')
+    __median_engine__ = 'linkedlist'
+
+    @classmethod
+    def set_median_engine(cls, val):
+        if val not in MEDIAN_ENGINES:
+            raise ValueError('Undefined argument value: engine')
+        cls.__median_engine__ = val
+
+    @classmethod
+    def get_median_engine(cls):
+        return cls.__median_engine__
+
+    def __init__(self, amount, engine=None):
+        if engine is None:
+            engine = self.get_median_engine()
+        elif engine not in MEDIAN_ENGINES:
+            raise ValueError('Undefined argument value: engine')
+        self._engine = MEDIAN_ENGINES[engine]()
 
-    def __init__(self, amount):
         if not amount:
             self._median = 0
             self._count = 0
             self._total = 0
-            self._median_left = None
-            self._median_right = None
         else:
-            self._median = int(Decimal(amount).quantize(0, ROUND_HALF_UP))
+            self._median = None
             self._count = 1
             self._total = amount
-            self._median_left = LinkedListNode(amount)
-            self._median_right = self._median_left
+            self._engine.insert(amount)
+
+    @classmethod
+    def restore(cls, values, total, engine=None):
+        """
+        Build the group from its amounts, e.g. restored from a checkpoint,
+        without inserting the amounts one by one
+
+        :param values: sequence of ints, amounts in cents in ascending order
+        :param total: int, total of the amounts in cents
+        :param engine: string, name of the running median backend
+        :return: object of the class
+        """
+        return cls._restore(cls._engine_class(engine).from_sorted(values),
+                            len(values), total)
+
+    @classmethod
+    def restore_counted(cls, amounts, counts, total, engine=None):
+        """
+        Build the group from its distinct amounts and their numbers of
+        occurrences, e.g. restored from a checkpoint
+
+        :param amounts: sequence of ints, distinct amounts in cents in ascending order
+        :param counts: sequence of ints, number of occurrences of each amount
+        :param total: int, total of the amounts in cents
+        :param engine: string, name of the running median backend
+        :return: object of the class
+        """
+        return cls._restore(cls._engine_class(engine).from_counted(amounts, counts),
+                            sum(counts), total)
+
+    @classmethod
+    def _engine_class(cls, engine):
+        if engine is None:
+            engine = cls.get_median_engine()
+        elif engine not in MEDIAN_ENGINES:
+            raise ValueError('Undefined argument value: engine')
+        return MEDIAN_ENGINES[engine]
+
+    @classmethod
+    def _restore(cls, backend, count, total):
+        info = cls.__new__(cls)
+        info._engine = backend
+        info._median = None if count else 0
+        info._count = count
+        info._total = total if count else 0
+        return info
+
+    def get_values(self):
+        """
+        :return: list of ints, all the amounts in cents in ascending order
+        """
+        return self._engine.get_values()
+
+    def get_counted_values(self):
+        """
+        :return: tuple of sequences of ints (amounts, counts), the distinct
+            amounts in cents in ascending order and their numbers of occurrences
+        """
+        return self._engine.get_counted_values()
 
     def get_median(self):
+        if self._median is None:
+            self._median = round_half_up_mean(*self._engine.get_median_values())
         return self._median
 
     def get_count(self):
         return self._count
 
     def get_total(self):
+        """
+        :return: int, total of the amounts in cents
+        """
         return self._total
 
     def get_median_left(self):
-        return self._median_left
+        return self._engine.get_median_left()
 
     def get_median_right(self):
-        return self._median_right
+        return self._engine.get_median_right()
 
     def update(self, amount):
         """
         Update member variables based on new amount coming in
 
-        :param new_amountLLN: float, the amount of current transaction
+        :param amount: int, the amount of current transaction in cents
 
         """
-        new_amountLLN = LinkedListNode(amount)
+        self._engine.insert(amount)
+        # the median is rounded again on the next request
+        self._median = None
 
         # Corner case: initiated empty InfoByDomain class
-        if (not self._median_left) or (not self._median_right):
-            self._median = int(Decimal(amount).quantize(0, ROUND_HALF_UP))
+        if not self._count:
             self._count = 1
-            self._total = new_amountLLN.get_value()
-            self._median_left = LinkedListNode(new_amountLLN.get_value())
-            self._median_right = self._median_left
+            self._total = amount
             return
 
-        # insert new donation amount to the doubly linked list
-        # update median position information
-        if new_amountLLN.get_value() > self._median:
-            LinkedListNode.insert_linkedlist_node(self._median_right, new_amountLLN, 'r')
-            if new_amountLLN.get_value() > self._median_right.get_value():
-                # if odd numbers of donation present in the linked list before new node joining:
-                # Shift the median set by 1
-                if self._median_left is self._median_right:
-                    self._median_left, self._median_right = \
-                        self._median_right, self._median_right.right
-                # if even number of donation present in the linked list before new node joining:
-                # Overlap self._median_left and self._median_right
-                else:
-                    self._median_left, self._median_right = self._median_right, self._median_right
-            else:
-                # Must be even number of donation present in the linked list before new node joining
-                self._median_left, self._median_right = new_amountLLN, new_amountLLN
-
-        else:
-            LinkedListNode.insert_linkedlist_node(self._median_left, new_amountLLN, 'l')
-            if new_amountLLN.get_value() <= self._median_left.get_value():
-                # if odd numbers of donation present in the linked list before new node joining:
-                # Shift the median set by 1
-                if self._median_left is self._median_right:
-                    self._median_left, self._median_right = \
-                        self._median_left.left, self._median_left
-                # if even number of donation present in the linked list before new node joining:
-                # Overlap self._median_left and self._median_right
-                else:
-                    self._median_left, self._median_right = self._median_left, self._median_left
-            else:
-                self._median_left, self._median_right = new_amountLLN, new_amountLLN
-
-        # update count, median and total information
+        # update count and total information
         self._count += 1
-        self._median = (Decimal(self._median_left.get_value() + \
-                                self._median_right.get_value()) / 2).\
-            quantize(0, ROUND_HALF_UP)
-        self._total += new_amountLLN.get_value()
+        self._total += amount
 
     def output(self):
         """
-        Only convert the total to int during output
+        Only convert the total to dollars during output
         :return: median|count|total
         """
-        return '|'.join(map(str, [self._median, self._count,
-                                  int(round(self._total))])) + '\n'
+        return '%d|%d|%d\n' % (self.get_median(), self._count,
+                                round_half_even_cents(self._total))
 
     def __repr__(self):
         return "InfoByDomainBase: " + ','.join(map(str, [
-            self._median, self._count, self._total,
-            self._median_left, self._median_right]))
+            self.get_median(), self._count, self._total, self._engine]))
 
 
 class InfoByZip(InfoByDomainBase):
@@ -127,11 +208,11 @@ class InfoByZip(InfoByDomainBase):
     Saves the donation information to specific recipient
     which is grouped by zip code
     """
+    __slots__ = ()
 
     def __repr__(self):
         return "Group by zips: " + ','.join(map(str, [
-            self._median, self._count, self._total,
-            self._median_left, self._median_right]))
+            self.get_median(), self._count, self._total, self._engine]))
 
 
 class InfoByDate(InfoByDomainBase):
@@ -140,11 +221,11 @@ class InfoByDate(InfoByDomainBase):
     Saves the donation information to specific recipient
     which is grouped by transaction date
     """
+    __slots__ = ()
 
     def __repr__(self):
         return "Group by dates: " + ','.join(map(str, [
-            self._median, self._count, self._total,
-            self._median_left, self._median_right]))
+            self.get_median(), self._count, self._total, self._engine]))
 
 
 class InfoIndividual(object):
@@ -157,9 +238,11 @@ class InfoIndividual(object):
         - self._zip_dict: {zip code: object infoByZip}
         - self._date_dict: {transaction date: object infoByDate}
 
-    :param line: dictionary of CMTE_ID, TRANSACTION_AMT, ZIP_CODE and TRANSACTION_DT
+    :param line: dictionary of CMTE_ID, TRANSACTION_AMT (int, in cents), 
+        ZIP_CODE and TRANSACTION_DT
 
     """
+    __slots__ = ('_id', '_zip_dict', '_date_dict')
 
     def __init__(self, line):
         self._id = line['CMTE_ID']
@@ -200,6 +283,18 @@ class InfoIndividual(object):
         """
         return self._id
 
+    def get_zip_dict(self):
+        """
+        :return: dictionary, {zip code: object infoByZip}
+        """
+        return self._zip_dict
+
+    def get_date_dict(self):
+        """
+        :return: dictionary, {transaction date: object infoByDate}
+        """
+        return self._date_dict
+
     def get_zip_dict_entry(self, key):
         """
         return median, total and count information to specific recipient at specific area
@@ -289,7 +384,7 @@ class InfoIndividual(object):
         """
         if self.has_date(date):
             return self._id + '|' + date + '|' + \
-                   self._date_dict[date].output_NodeByDate()
+                   self._date_dict[date].output()
         else:
             return ''
 
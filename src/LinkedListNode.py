@@ -1,3 +1,6 @@
+from src.Metrics import METRICS
+
+
 class LinkedListNode(object):
     """
     Node of doubly linked list
@@ -5,11 +8,13 @@ class LinkedListNode(object):
     and the smaller and larger donation 
     to one recipient in one area (with the same zip code)
     
-    :param val: float, donation amount
+    :param val: int, donation amount in cents
     :param left: LinkedListNode object, with the donation smaller than self._val
     :param right: LinkedListNode object, with the donation larger than self._val
     
     """
+    __slots__ = ('left', 'right', '_val')
+
     def __init__(self, val, left=None, right=None):
         self.left = left
         self.right = right
@@ -47,6 +52,7 @@ class LinkedListNode(object):
         if not new_node.get_value():
             raise TypeError("One or more nodes are invalid")
 
+        steps = 1  # number of nodes visited, for the metrics
         while True:
             if old_node.get_value() < new_node.get_value():
                 # reaches the rightmost and
@@ -65,6 +71,7 @@ class LinkedListNode(object):
                 # keep search by moving to right
                 else:
                     old_node = old_node.right
+                    steps += 1
             else:
                 # if reaches the leftmost and
                 # new_node._val is the smallest of the linked list
@@ -82,4 +89,7 @@ class LinkedListNode(object):
                 # keep searching my moving to left
                 else:
                     old_node = old_node.left
+                    steps += 1
 
+        if METRICS.get_enabled():
+            METRICS.observe_walk(steps)
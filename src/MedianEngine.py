@@ -0,0 +1,465 @@
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from src.LinkedListNode import *
+
+# Typed array code of the amounts in cents, signed 64 bit integers
+try:
+    array('q')
+    AMOUNT_TYPECODE = 'q'
+except ValueError:  # Python 2, long is 64 bit on most platforms
+    AMOUNT_TYPECODE = 'l'
+
+
+class MedianEngineBase(object):
+    """
+    Base class of running median backends
+
+    A backend stores every donation amount of one group and gives access to
+    the two middle amounts (lower and upper median) of the sorted amounts.
+    For odd numbers of donations, lower and upper median are the same.
+    The amounts are integers, in cents.
+
+    """
+    __slots__ = ()
+
+    def insert(self, amount):
+        """
+        Add a new donation amount
+
+        :param amount: int, the amount of current transaction in cents
+        """
+        raise NotImplementedError
+
+    def get_median_values(self):
+        """
+        :return: tuple of ints, (lower median, upper median),
+            None if the backend is empty
+        """
+        raise NotImplementedError
+
+    def get_values(self):
+        """
+        :return: list of ints, all the amounts in ascending order
+        """
+        raise NotImplementedError
+
+    def get_counted_values(self):
+        """
+        :return: tuple of sequences of ints (amounts, counts),
+            the distinct amounts in ascending order and their numbers of occurrences
+        """
+        values = self.get_values()
+        if len(set(values)) == len(values):
+            # no repeated amount, as in most small groups
+            return values, [1] * len(values)
+        amounts, counts = [], []
+        for amount in values:
+            if amounts and amounts[-1] == amount:
+                counts[-1] += 1
+            else:
+                amounts.append(amount)
+                counts.append(1)
+        return amounts, counts
+
+    @classmethod
+    def from_sorted(cls, values):
+        """
+        Build a backend from amounts already in ascending order,
+        e.g. restored from a checkpoint
+
+        :param values: sequence of ints, amounts in ascending order
+        :return: object of the backend
+        """
+        engine = cls()
+        for amount in values:
+            engine.insert(amount)
+        return engine
+
+    @classmethod
+    def from_counted(cls, amounts, counts):
+        """
+        Build a backend from distinct amounts in ascending order
+        and their numbers of occurrences, e.g. restored from a checkpoint
+
+        :param amounts: sequence of ints, distinct amounts in ascending order
+        :param counts: sequence of ints, number of occurrences of each amount
+        :return: object of the backend
+        """
+        values = []
+        for amount, count in zip(amounts, counts):
+            values.extend([amount] * count)
+        return cls.from_sorted(values)
+
+    def get_median_left(self):
+        """
+        :return: handle of the lower median, only available in
+            the linked list backend
+        """
+        return None
+
+    def get_median_right(self):
+        """
+        :return: handle of the upper median, only available in
+            the linked list backend
+        """
+        return None
+
+
+class LinkedListMedian(MedianEngineBase):
+    """
+    Running median with a sorted doubly linked list of LinkedListNode,
+    with two indexes for median position:
+        - self._median_left, self._median_right: objects of the doubly
+            linked list, lower and upper median
+
+    Insertion walks the list from the median, O(n) per insert.
+
+    """
+    __slots__ = ('_median_left', '_median_right')
+
+    def __init__(self):
+        self._median_left = None
+        self._median_right = None
+
+    def get_median_left(self):
+        return self._median_left
+
+    def get_median_right(self):
+        return self._median_right
+
+    def get_median_values(self):
+        if not self._median_left:
+            return None
+        return self._median_left.get_value(), self._median_right.get_value()
+
+    def get_values(self):
+        node = self._median_left
+        if not node:
+            return []
+        while node.left:
+            node = node.left
+        values = []
+        while node:
+            values.append(node.get_value())
+            node = node.right
+        return values
+
+    @classmethod
+    def from_sorted(cls, values):
+        engine = cls()
+        if not values:
+            return engine
+
+        # link the nodes in order, keep the nodes of the median set
+        nodes = [LinkedListNode(amount) for amount in values]
+        for left, right in zip(nodes, nodes[1:]):
+            left.right, right.left = right, left
+        engine._median_left = nodes[(len(nodes) - 1) // 2]
+        engine._median_right = nodes[len(nodes) // 2]
+        return engine
+
+    def insert(self, amount):
+        new_amountLLN = LinkedListNode(amount)
+
+        # Corner case: empty linked list
+        if (not self._median_left) or (not self._median_right):
+            self._median_left = new_amountLLN
+            self._median_right = self._median_left
+            return
+
+        # insert new donation amount to the doubly linked list
+        # update median position information
+        # (compare twice the amount to the sum of the median set,
+        # to find the side of the exact median the amount falls on)
+        if new_amountLLN.get_value() * 2 > \
+                self._median_left.get_value() + self._median_right.get_value():
+            LinkedListNode.insert_linkedlist_node(self._median_right, new_amountLLN, 'r')
+            if new_amountLLN.get_value() > self._median_right.get_value():
+                # if odd numbers of donation present in the linked list before new node joining:
+                # Shift the median set by 1
+                if self._median_left is self._median_right:
+                    self._median_left, self._median_right = \
+                        self._median_right, self._median_right.right
+                # if even number of donation present in the linked list before new node joining:
+                # Overlap self._median_left and self._median_right
+                else:
+                    self._median_left, self._median_right = self._median_right, self._median_right
+            else:
+                # Must be even number of donation present in the linked list before new node joining
+                self._median_left, self._median_right = new_amountLLN, new_amountLLN
+
+        else:
+            LinkedListNode.insert_linkedlist_node(self._median_left, new_amountLLN, 'l')
+            if new_amountLLN.get_value() <= self._median_left.get_value():
+                # if odd numbers of donation present in the linked list before new node joining:
+                # Shift the median set by 1
+                if self._median_left is self._median_right:
+                    self._median_left, self._median_right = \
+                        self._median_left.left, self._median_left
+                # if even number of donation present in the linked list before new node joining:
+                # Overlap self._median_left and self._median_right
+                else:
+                    self._median_left, self._median_right = self._median_left, self._median_left
+            else:
+                self._median_left, self._median_right = new_amountLLN, new_amountLLN
+
+    def __repr__(self):
+        return ','.join(map(str, [self._median_left, self._median_right]))
+
+
+class HeapMedian(MedianEngineBase):
+    """
+    Running median with two heaps, O(log n) per insert:
+        - self._low: max-heap (stored negated) of the smaller half of amounts
+        - self._high: min-heap of the larger half of amounts
+
+    self._low holds one more amount than self._high for odd numbers of donations.
+
+    """
+    __slots__ = ('_low', '_high')
+
+    def __init__(self):
+        self._low = []
+        self._high = []
+
+    def get_median_values(self):
+        if not self._low:
+            return None
+        if len(self._low) > len(self._high):
+            return -self._low[0], -self._low[0]
+        return -self._low[0], self._high[0]
+
+    def get_values(self):
+        return sorted(-amount for amount in self._low) + sorted(self._high)
+
+    @classmethod
+    def from_sorted(cls, values):
+        # lists in ascending order are valid heaps:
+        # the smaller half is negated in reverse order
+        engine = cls()
+        half = (len(values) + 1) // 2
+        engine._low = [-amount for amount in reversed(values[:half])]
+        engine._high = list(values[half:])
+        return engine
+
+    def insert(self, amount):
+        if self._low and amount > -self._low[0]:
+            heapq.heappush(self._high, amount)
+        else:
+            heapq.heappush(self._low, -amount)
+
+        # rebalance: len(self._low) - len(self._high) in [0, 1]
+        if len(self._low) > len(self._high) + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+        elif len(self._high) > len(self._low):
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+
+    def __repr__(self):
+        return ','.join(map(str, self.get_median_values() or [None, None]))
+
+
+class SortedArrayMedian(MedianEngineBase):
+    """
+    Running median with the amounts stored in a list of sorted blocks
+    of typed arrays (AMOUNT_TYPECODE, 8 bytes per donation):
+        - self._blocks: list of sorted arrays, all the amounts of
+            a block are not larger than the amounts of the next block
+        - self._maxes: largest amount of each block, to find the block
+            a new amount is inserted to
+        - self._count: number of amounts
+        - self._median_block: index of the block holding the lower median
+        - self._before: number of amounts in the blocks before self._median_block
+
+    Blocks are split in half when they grow over 2 * BLOCK_SIZE amounts.
+    The median is found by index arithmetic from the cached median block,
+    which moves by at most one block per insertion.
+
+    """
+    __slots__ = ('_blocks', '_maxes', '_count', '_median_block', '_before')
+
+    BLOCK_SIZE = 512
+
+    def __init__(self):
+        self._blocks = []
+        self._maxes = []
+        self._count = 0
+        self._median_block = 0
+        self._before = 0
+
+    def get_median_values(self):
+        if not self._count:
+            return None
+
+        block = self._blocks[self._median_block]
+        idx = (self._count - 1) // 2 - self._before
+        lower = block[idx]
+        if self._count % 2:
+            return lower, lower
+        if idx + 1 < len(block):
+            return lower, block[idx + 1]
+        return lower, self._blocks[self._median_block + 1][0]
+
+    def get_values(self):
+        values = []
+        for block in self._blocks:
+            values.extend(block)
+        return values
+
+    @classmethod
+    def from_sorted(cls, values):
+        engine = cls()
+        engine._blocks = [array(AMOUNT_TYPECODE, values[i:i + cls.BLOCK_SIZE])
+                          for i in range(0, len(values), cls.BLOCK_SIZE)]
+        engine._maxes = [block[-1] for block in engine._blocks]
+        engine._count = len(values)
+
+        # all the blocks before the lower median are full
+        engine._median_block = max(engine._count - 1, 0) // 2 // cls.BLOCK_SIZE
+        engine._before = engine._median_block * cls.BLOCK_SIZE
+        return engine
+
+    def insert(self, amount):
+        if not self._blocks:
+            self._blocks.append(array(AMOUNT_TYPECODE, [amount]))
+            self._maxes.append(self._blocks[0][0])
+            self._count = 1
+            return
+
+        # find the block: first block with largest amount >= amount
+        i = bisect_left(self._maxes, amount)
+        if i == len(self._blocks):
+            i -= 1
+        block = self._blocks[i]
+        insort(block, amount)
+        self._maxes[i] = block[-1]
+        self._count += 1
+        if i < self._median_block:
+            self._before += 1
+
+        # split the block in half if it grows too large
+        if len(block) > 2 * self.BLOCK_SIZE:
+            self._blocks[i:i + 1] = [block[:self.BLOCK_SIZE], block[self.BLOCK_SIZE:]]
+            self._maxes[i:i + 1] = [block[self.BLOCK_SIZE - 1], block[-1]]
+            if i < self._median_block:
+                self._median_block += 1
+
+        # move the median block to the block of the lower median
+        rank = (self._count - 1) // 2
+        while rank < self._before:
+            self._median_block -= 1
+            self._before -= len(self._blocks[self._median_block])
+        while rank >= self._before + len(self._blocks[self._median_block]):
+            self._before += len(self._blocks[self._median_block])
+            self._median_block += 1
+
+    def __repr__(self):
+        return ','.join(map(str, self.get_median_values() or [None, None]))
+
+
+class CountedMultisetMedian(MedianEngineBase):
+    """
+    Running median with the distinct amounts and their numbers of occurrences,
+    donation amounts being heavily repeated (25, 50, 100, 250, 2700...):
+        - self._amounts: sorted array (AMOUNT_TYPECODE) of the distinct amounts
+        - self._counts: array('l'), number of occurrences of each distinct amount
+        - self._count: number of amounts
+        - self._median_idx: index of the distinct amount holding the lower median
+        - self._before: number of amounts before self._median_idx
+
+    An amount already stored is inserted in O(log d) for d distinct amounts,
+    a new distinct amount in O(d) (array insertion). The median is found by
+    walking the cumulative counts from the cached median position, which
+    moves by at most one distinct amount per insertion.
+
+    """
+    __slots__ = ('_amounts', '_counts', '_count', '_median_idx', '_before')
+
+    def __init__(self):
+        self._amounts = array(AMOUNT_TYPECODE)
+        self._counts = array('l')
+        self._count = 0
+        self._median_idx = 0
+        self._before = 0
+
+    def get_median_values(self):
+        if not self._count:
+            return None
+
+        lower = self._amounts[self._median_idx]
+        if self._count // 2 < self._before + self._counts[self._median_idx]:
+            return lower, lower
+        return lower, self._amounts[self._median_idx + 1]
+
+    def get_values(self):
+        values = []
+        for amount, count in zip(self._amounts, self._counts):
+            values.extend([amount] * count)
+        return values
+
+    def get_counted_values(self):
+        # the stored arrays, without expanding the repeated amounts
+        return self._amounts, self._counts
+
+    @classmethod
+    def from_sorted(cls, values):
+        engine = cls()
+        for amount in values:
+            if engine._amounts and engine._amounts[-1] == amount:
+                engine._counts[-1] += 1
+            else:
+                engine._amounts.append(amount)
+                engine._counts.append(1)
+        engine._count = len(values)
+        if engine._count:
+            engine._move_median()
+        return engine
+
+    @classmethod
+    def from_counted(cls, amounts, counts):
+        engine = cls()
+        engine._amounts = array(AMOUNT_TYPECODE, amounts)
+        engine._counts = array('l', counts)
+        engine._count = sum(engine._counts)
+        if engine._count:
+            engine._move_median()
+        return engine
+
+    def insert(self, amount):
+        i = bisect_left(self._amounts, amount)
+        if i < len(self._amounts) and self._amounts[i] == amount:
+            self._counts[i] += 1
+        else:
+            self._amounts.insert(i, amount)
+            self._counts.insert(i, 1)
+            if i <= self._median_idx and self._count:
+                # the median amount moved right by one
+                self._median_idx += 1
+        self._count += 1
+        if i < self._median_idx:
+            self._before += 1
+        self._move_median()
+
+    def _move_median(self):
+        """
+        Move the median position to the distinct amount of the lower median
+        """
+        rank = (self._count - 1) // 2
+        while rank < self._before:
+            self._median_idx -= 1
+            self._before -= self._counts[self._median_idx]
+        while rank >= self._before + self._counts[self._median_idx]:
+            self._before += self._counts[self._median_idx]
+            self._median_idx += 1
+
+    def __repr__(self):
+        return ','.join(map(str, self.get_median_values() or [None, None]))
+
+
+# Running median backends selectable by name
+MEDIAN_ENGINES = {
+    'linkedlist': LinkedListMedian,
+    'heap': HeapMedian,
+    'array': SortedArrayMedian,
+    'multiset': CountedMultisetMedian,
+}
@@ -0,0 +1,167 @@
+import contextlib
+import json
+import sys
+import time
+
+
+class Metrics(object):
+    """
+    Opt-in counters and timers of the processing, to find where a run
+    is losing time. Nothing is recorded while the metrics are disabled.
+
+    The metrics are:
+        - counters: valid rows, rows rejected per filter rule
+            (see REJECT_RULES), and rows kept without zip code or
+            without transaction date
+        - seconds: time spent in each stage (see STAGES)
+        - linked list walks: number of nodes visited by
+            LinkedListNode.insert_linkedlist_node, as count, total,
+            maximum and a histogram by powers of 2
+
+    :param report_interval: float, seconds between two reports to stderr
+        while processing, 0 for none
+
+    """
+    REJECT_RULES = ('columns', 'cmte_id', 'other_id', 'amount', 'zip_and_date')
+    STAGES = ('parse', 'update_info', 'update_tree', 'output')
+
+    def __init__(self, report_interval=10.0):
+        self._enabled = False
+        self._report_interval = report_interval
+        self.reset()
+
+    def set_enabled(self, val):
+        self._enabled = val
+
+    def get_enabled(self):
+        return self._enabled
+
+    def set_report_interval(self, val):
+        self._report_interval = val
+
+    def get_report_interval(self):
+        """
+        :return: float, seconds between two reports to stderr
+            while processing, 0 for none
+        """
+        return self._report_interval
+
+    def reset(self):
+        self._counters = dict()
+        for rule in self.REJECT_RULES:
+            self._counters['reject_' + rule] = 0
+        for name in ['rows_valid', 'invalid_zip', 'invalid_date']:
+            self._counters[name] = 0
+        self._seconds = dict.fromkeys(self.STAGES, 0.0)
+        self._walks = dict()  # {bucket upper bound: count}
+        self._walk_count = 0
+        self._walk_total = 0
+        self._walk_max = 0
+        self._start = time.time()
+
+    def count(self, name, n=1):
+        """
+        :param name: string, name of the counter
+        :param n: int, increment
+        """
+        self._counters[name] += n
+
+    def add_time(self, stage, seconds):
+        """
+        :param stage: string, one of STAGES
+        :param seconds: float, time spent in the stage
+        """
+        self._seconds[stage] += seconds
+
+    @contextlib.contextmanager
+    def timed(self, stage):
+        """
+        Time the code block in the stage, if the metrics are enabled
+
+        :param stage: string, one of STAGES
+        """
+        if not self._enabled:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._seconds[stage] += time.time() - start
+
+    def observe_walk(self, steps):
+        """
+        :param steps: int, number of nodes visited to insert one node
+        """
+        self._walk_count += 1
+        self._walk_total += steps
+        if steps > self._walk_max:
+            self._walk_max = steps
+        bucket = 1
+        while bucket < steps:
+            bucket <<= 1
+        self._walks[bucket] = self._walks.get(bucket, 0) + 1
+
+    def get_counter(self, name):
+        return self._counters[name]
+
+    def get_seconds(self, stage):
+        return self._seconds[stage]
+
+    def get_rows_read(self):
+        """
+        :return: int, valid and rejected rows
+        """
+        return self._counters['rows_valid'] + sum(
+            self._counters['reject_' + rule] for rule in self.REJECT_RULES)
+
+    def to_dict(self):
+        return {
+            'elapsed_seconds': time.time() - self._start,
+            'rows_read': self.get_rows_read(),
+            'counters': dict(self._counters),
+            'seconds': dict(self._seconds),
+            'linkedlist_walks': {
+                'count': self._walk_count,
+                'total': self._walk_total,
+                'max': self._walk_max,
+                'mean': float(self._walk_total) / self._walk_count
+                if self._walk_count else 0.0,
+                # keys of JSON objects are strings
+                'histogram': dict((str(bucket), count)
+                                  for bucket, count in self._walks.items()),
+            },
+        }
+
+    def report(self):
+        """
+        :return: string, one line summary of the metrics
+        """
+        return 'METRICS: %d rows read, %d valid, rejected %s; seconds %s; ' \
+               'linked list walks %d (mean %.1f, max %d)' % (
+                   self.get_rows_read(), self._counters['rows_valid'],
+                   ' '.join('%s=%d' % (rule, self._counters['reject_' + rule])
+                            for rule in self.REJECT_RULES),
+                   ' '.join('%s=%.3f' % (stage, self._seconds[stage])
+                            for stage in self.STAGES),
+                   self._walk_count,
+                   float(self._walk_total) / self._walk_count if self._walk_count else 0.0,
+                   self._walk_max)
+
+    def print_report(self, file=None):
+        file = file or sys.stderr
+        file.write(self.report() + '\n')
+        file.flush()
+
+    def dump(self, path):
+        """
+        Write the metrics to a JSON file
+
+        :param path: string, path to the JSON file
+        """
+        with open(path, 'w') as fileout:
+            json.dump(self.to_dict(), fileout, indent=2, sort_keys=True)
+
+
+# Metrics shared by the input readers, the data structures and the main loop
+METRICS = Metrics()
@@ -0,0 +1,327 @@
+import os
+import signal
+import tempfile
+import stat
+import time
+from src.DateCache import DATE_CACHE
+
+
+def _file_mode(path):
+    """
+    :param path: string, path to a file
+    :return: int, permission bits of the file if it exists,
+        else the default permissions of a new file (0666 minus the umask)
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(path, lines, mode='w'):
+    """
+    Write lines to a temporary file in the same folder as path,
+    then rename it over path, so readers never see a half-written file
+    The file gets the permissions of the file it replaces, or of a new file
+    (the temporary file is only readable by its owner)
+
+    :param path: string, path to the output file
+    :param lines: iterable of strings, entries to be written
+    :param mode: string, 'w' for text or 'wb' for bytes
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder,
+                                    prefix='.' + os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, mode) as fileout:
+            for line in lines:
+                fileout.write(line)
+        os.chmod(tmp_path, _file_mode(path))
+        # os.replace is not available in Python 2,
+        # where os.rename already overwrites on POSIX
+        getattr(os, 'replace', os.rename)(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def date_entry_key(entry):
+    """
+    :param entry: string, medianvals_by_date entry
+        with format CMTE_ID|TRANSACTION_DT|MEDIAN|COUNT|TOTAL
+    :return: tuple, (id key_idx, date key_idx), order of the entries in the output
+    """
+    id, date, _ = entry.split('|', 2)
+    return int(id[1:]), DATE_CACHE.get_key_idx(date)
+
+
+def merge_date_entries(entries, changes):
+    """
+    Patch sorted medianvals_by_date entries with sorted changed entries:
+    a changed entry replaces the entry with the same recipient and date,
+    or is inserted in order
+
+    :param entries: iterable of strings, previously written entries
+    :param changes: iterable of strings, changed entries
+    :return: string generator, patched entries in order
+    """
+    changes = iter(changes)
+    change = next(changes, None)
+    change_key = change and date_entry_key(change)
+    for entry in entries:
+        key = date_entry_key(entry)
+        while change is not None and change_key <= key:
+            yield change
+            if change_key == key:
+                entry = None
+            change = next(changes, None)
+            change_key = change and date_entry_key(change)
+        if entry is not None:
+            yield entry
+
+    while change is not None:
+        yield change
+        change = next(changes, None)
+
+
+def patch_sorted_file(path, changes):
+    """
+    Patch a previously written medianvals_by_date file with changed entries,
+    atomically, the file is created if missing
+
+    :param path: string, path to output: medianvals_by_date
+    :param changes: iterable of strings, changed entries in order
+    """
+    def read_entries():
+        if not os.path.exists(path):
+            return
+        with open(path) as filein:
+            for entry in filein:
+                yield entry
+
+    atomic_write(path, merge_date_entries(read_entries(), changes))
+
+
+class DateOutputWriter(object):
+    """
+    Write snapshots of the ordered medianvals_by_date entries
+    based on the selected output policy:
+        - 'record': rewrite the file after every dated record
+        - 'end': write the file once at the end of the stream
+        - 'every': rewrite the file every `every` dated records
+        - 'interval': rewrite the file at most every `interval` seconds
+        - 'signal': rewrite the file when the process receives SIGUSR1
+
+    All policies write a final snapshot on close().
+
+    Each snapshot is written based on the selected output mode:
+        - 'snapshot': rewrite the file with all the entries from source
+        - 'changes': append the entries from source to the file, as a log of 
+            the changed entries (the file is started over by the first snapshot,
+            unless the run continues the log of an interrupted run)
+        - 'patch': merge the entries from source into the existing sorted file
+            (the file is started over by the first snapshot, unless the run
+            continues the output of a previous run)
+
+    :param path: string, path to output: medianvals_by_date
+    :param source: callable, returns the ordered entries to be written,
+        only the entries changed since the last snapshot for 'changes' and 'patch'
+    :param policy: string, one of DateOutputWriter.POLICIES
+    :param every: int, number of dated records between two snapshots
+    :param interval: float, seconds between two snapshots
+    :param mode: string, one of DateOutputWriter.MODES
+    :param patch_existing: boolean, whether the first snapshot of 'patch' mode
+        merges into the existing file, written by the previous run
+    :param append_existing: boolean, whether the first snapshot of 'changes' mode
+        appends to the existing log, written by the interrupted run
+
+    """
+    POLICIES = ('record', 'end', 'every', 'interval', 'signal')
+    MODES = ('snapshot', 'changes', 'patch')
+
+    def __init__(self, path, source, policy='end', every=10000, interval=60.0,
+                 mode='snapshot', patch_existing=False, append_existing=False):
+        if policy not in self.POLICIES:
+            raise ValueError('Undefined argument value: policy')
+        if policy == 'every' and every < 1:
+            raise ValueError('Undefined argument value: every')
+        if mode not in self.MODES:
+            raise ValueError('Undefined argument value: mode')
+
+        self._path = path
+        self._source = source
+        self._policy = policy
+        self._every = every
+        self._interval = interval
+        self._mode = mode
+        self._patch_existing = patch_existing
+        self._append_existing = append_existing
+        self._started = False  # whether a snapshot has been written (the change log started)
+
+        self._pending = 0  # dated records received since last snapshot
+        self._last_write = time.time()
+        self._requested = False  # set by the signal handler
+
+        if policy == 'signal':
+            signal.signal(signal.SIGUSR1, self._request_snapshot)
+
+    def _request_snapshot(self, signum, frame):
+        self._requested = True
+
+    def get_policy(self):
+        return self._policy
+
+    def get_mode(self):
+        return self._mode
+
+    def notify(self):
+        """
+        Register that the tree has been updated by a dated record,
+        write a snapshot if required by the policy
+
+        :return: boolean, True if a snapshot has been written
+        """
+        self._pending += 1
+
+        if self._policy == 'record':
+            pass
+        elif self._policy == 'end':
+            return False
+        elif self._policy == 'every':
+            if self._pending < self._every:
+                return False
+        elif self._policy == 'interval':
+            if time.time() - self._last_write < self._interval:
+                return False
+        elif not self._requested:
+            return False
+
+        self.write()
+        return True
+
+    def write(self):
+        """
+        Write the current snapshot to output,
+        atomically except for the appended change log
+        """
+        if self._mode == 'snapshot':
+            atomic_write(self._path, self._source())
+        elif self._mode == 'patch':
+            if self._started or self._patch_existing:
+                patch_sorted_file(self._path, self._source())
+            else:
+                # the entries of an unrelated previous output are dropped
+                atomic_write(self._path, self._source())
+        else:
+            append = self._started or self._append_existing
+            with open(self._path, 'a' if append else 'w') as fileout:
+                for entry in self._source():
+                    fileout.write(entry)
+        self._started = True
+        self._pending = 0
+        self._requested = False
+        self._last_write = time.time()
+
+    def close(self, always=False):
+        """
+        Write the final snapshot if anything changed since the last one
+
+        :param always: boolean, also write the snapshot if nothing has been 
+            written yet, e.g. an empty set of changes, which must replace 
+            the output of a previous run
+        """
+        if self._pending or (always and not self._started):
+            self.write()
+        if self._policy == 'signal':
+            signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+
+
+class ZipOutputWriter(object):
+    """
+    Buffered writer of medianvals_by_zip entries
+
+    Entries are appended to a reusable buffer, which is written to the file
+    when it holds buffer_size characters or flush_every entries.
+    The 'CMTE_ID|ZIP_CODE|' prefix of each group is built once and cached.
+
+    :param path: string, path to output: medianvals_by_zip
+    :param buffer_size: int, number of characters buffered before writing
+    :param flush_every: int, number of entries buffered before writing,
+        0 to only write when the buffer is full
+    :param resume_size: int, size of an existing output to continue from,
+        the file is truncated to resume_size and entries are appended,
+        None to start a new file
+
+    """
+
+    def __init__(self, path, buffer_size=1 << 20, flush_every=0, resume_size=None):
+        if buffer_size < 0 or flush_every < 0:
+            raise ValueError('Undefined argument value: buffer_size/flush_every')
+
+        if resume_size is None:
+            self._file = open(path, 'w')
+        else:
+            # drop the entries written after the checkpoint
+            self._file = open(path, 'r+')
+            self._file.seek(resume_size)
+            self._file.truncate()
+        self._buffer_size = buffer_size
+        self._flush_every = flush_every
+        self._buffer = []
+        self._size = 0
+        self._prefixes = dict()  # {id: {zip code: prefix}}
+
+    def write_entry(self, info, zipcode):
+        """
+        Add the entry of the recipient from the zip code to the output
+
+        :param info: object infoIndividual
+        :param zipcode: string, zip code
+        """
+        try:
+            prefix = self._prefixes[info.get_id()][zipcode]
+        except KeyError:
+            prefix = info.get_id() + '|' + zipcode + '|'
+            self._prefixes.setdefault(info.get_id(), dict())[zipcode] = prefix
+
+        entry = info.get_zip_dict_entry(zipcode)
+        if entry is None:
+            return
+        self.write(prefix + entry.output())
+
+    def write(self, line):
+        """
+        Add one preformatted line to the output
+
+        :param line: string, line ending with line break
+        """
+        self._buffer.append(line)
+        self._size += len(line)
+        if self._size >= self._buffer_size or \
+                (self._flush_every and len(self._buffer) >= self._flush_every):
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered entries to the file
+        """
+        if self._buffer:
+            self._file.write(''.join(self._buffer))
+            del self._buffer[:]
+            self._size = 0
+        self._file.flush()
+
+    def tell(self):
+        """
+        Write the buffered entries
+        :return: int, size of the output written so far
+        """
+        self.flush()
+        return self._file.tell()
+
+    def close(self):
+        self.flush()
+        self._file.close()
@@ -0,0 +1,88 @@
+import sys
+import time
+
+
+class ProgressReporter(object):
+    """
+    Report the progress of reading an input file: rows read, rows/s, MB/s,
+    percent of the file done and estimated time left
+
+    The clock is only read every check_every rows, and a report is written
+    when interval seconds have passed since the previous one. On a terminal
+    the report line is overwritten, otherwise one line is written per report.
+
+    :param total_bytes: int, size of the input file
+    :param interval: float, seconds between two reports
+    :param check_every: int, rows between two reads of the clock
+    :param file: file object the reports are written to, stderr by default
+
+    """
+
+    def __init__(self, total_bytes, interval=2.0, check_every=8192, file=None):
+        self._total_bytes = total_bytes
+        self._interval = interval
+        self._check_every = check_every
+        self._file = file or sys.stderr
+        self._rows = 0
+        self._offset = 0
+        self._start = time.time()
+        self._last_report = self._start
+
+    def get_rows(self):
+        return self._rows
+
+    def track(self, lines, tell):
+        """
+        Pass the lines read from the input file through, and report the
+        progress periodically and at the end
+
+        :param lines: iterable of lines read from the input file
+        :param tell: callable, returns the byte offset reached in the file
+        :return: generator of the lines
+        """
+        countdown = self._check_every
+        try:
+            for line in lines:
+                yield line
+                countdown -= 1
+                if not countdown:
+                    self._rows += self._check_every
+                    countdown = self._check_every
+                    now = time.time()
+                    if now - self._last_report >= self._interval:
+                        self._offset = tell()
+                        self.report(now)
+        finally:
+            self._rows += self._check_every - countdown
+            self._offset = tell()
+            self.report(time.time(), final=True)
+
+    def format(self, now):
+        """
+        :param now: float, current time
+        :return: string, progress report
+        """
+        elapsed = max(now - self._start, 1e-9)
+        bytes_rate = self._offset / elapsed
+        percent = 100.0 * self._offset / self._total_bytes if self._total_bytes else 100.0
+        if bytes_rate:
+            eta = int(max(self._total_bytes - self._offset, 0) / bytes_rate)
+            eta = '%d:%02d:%02d' % (eta // 3600, eta // 60 % 60, eta % 60)
+        else:
+            eta = '-'
+        return 'PROGRESS: %5.1f%% %d rows %.0f rows/s %.1f MB/s ETA %s' % (
+            percent, self._rows, self._rows / elapsed, bytes_rate / 1e6, eta)
+
+    def report(self, now, final=False):
+        """
+        Write the progress report
+
+        :param now: float, current time
+        :param final: boolean, whether this is the last report
+        """
+        self._last_report = now
+        if self._file.isatty():
+            self._file.write('\r' + self.format(now) + ('\n' if final else ''))
+        else:
+            self._file.write(self.format(now) + '\n')
+        self._file.flush()
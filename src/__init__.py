@@ -12,8 +12,21 @@ class ProgressBar(object):
     def get_progress_bar(cls):
         return cls.__progress_bar__
 
-from src.find_political_donors import *
+from src.Metrics import *
+from src.ProgressReporter import *
+from src.DateCache import *
 from src.stream_input import *
 from src.AVLTree import *
 from src.InfoTable import *
 from src.LinkedListNode import *
+from src.MedianEngine import *
+from src.OutputWriter import *
+from src.checkpoint import *
+from src.DonorQuery import *
+from src.find_political_donors import *
+from src.parallel_ingest import *
+
+# The service mode requires asyncio (Python 3.5+)
+import sys as _sys
+if _sys.version_info >= (3, 5):
+    from src.service import *
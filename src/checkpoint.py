@@ -0,0 +1,239 @@
+import os
+import struct
+import sys
+import zlib
+from array import array
+from src.AVLTree import ID_INDEXES, NodeByID, NodeByDate
+from src.InfoTable import InfoIndividual, InfoByZip, InfoByDate
+from src.MedianEngine import AMOUNT_TYPECODE
+from src.OutputWriter import atomic_write
+
+# Binary checkpoint of the donor state, all integers little-endian:
+#   header: magic, version, input offset, medianvals_by_zip size, recipients
+#   recipient: CMTE_ID, number of zip code groups, groups,
+#              number of transaction date groups, groups
+#   group: key (zip code or date), total in cents (int64), number of distinct
+#          amounts (uint32, high bit set if an amount is repeated), distinct
+#          amounts in cents in ascending order (int64), and only if an amount
+#          is repeated, number of occurrences of each amount (uint32)
+# strings are stored as length (uint16) followed by utf-8 bytes
+CHECKPOINT_MAGIC = b'FPDC'
+CHECKPOINT_VERSION = 3
+
+# A state folder holds one checkpoint per shard of recipients
+STATE_SHARDS = 64
+
+_HEADER = struct.Struct('<4sHQQI')
+_STRING = struct.Struct('<H')
+_COUNT = struct.Struct('<I')
+_GROUP = struct.Struct('<qI')
+_REPEATED = 1 << 31
+_COUNT_TYPECODE = 'I'  # uint32
+
+
+def _pack_string(value):
+    value = value.encode('utf-8')
+    return _STRING.pack(len(value)) + value
+
+
+def _pack_array(values, typecode=AMOUNT_TYPECODE):
+    values = array(typecode, values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    # tostring in Python 2
+    return getattr(values, 'tobytes', getattr(values, 'tostring', None))()
+
+
+def _pack_groups(groups):
+    yield _COUNT.pack(len(groups))
+    for key, info in groups.items():
+        amounts, counts = info.get_counted_values()
+        repeated = len(amounts) < info.get_count()
+        yield _pack_string(key)
+        yield _GROUP.pack(info.get_total(), len(amounts) | (_REPEATED if repeated else 0))
+        yield _pack_array(amounts)
+        if repeated:
+            yield _pack_array(counts, _COUNT_TYPECODE)
+
+
+def _pack_checkpoint(infoDB, offset, zip_size):
+    yield _HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, offset,
+                       zip_size, len(infoDB))
+    for id, info in infoDB.items():
+        yield _pack_string(id)
+        for chunk in _pack_groups(info.get_zip_dict()):
+            yield chunk
+        for chunk in _pack_groups(info.get_date_dict()):
+            yield chunk
+
+
+def save_checkpoint(path, infoDB, offset, zip_size=0):
+    """
+    Write the donor state to a binary checkpoint, atomically
+
+    Each group is saved with its distinct amounts in ascending order and
+    their numbers of occurrences, so the medians stay exact after restore.
+
+    :param path: string, path to the checkpoint file
+    :param infoDB: dict, information database {id: object infoIndividual}
+    :param offset: int, byte offset of the input to continue streaming from
+    :param zip_size: int, size of medianvals_by_zip written so far
+    """
+    atomic_write(path, _pack_checkpoint(infoDB, offset, zip_size), 'wb')
+
+
+def _read_checkpoint(path, engine):
+    """
+    :return: tuple (infoDB, id_nodes, offset, zip_size),
+        id_nodes: list of NodeByID with the date index of each recipient
+    """
+    with open(path, 'rb') as filein:
+        data = filein.read()
+
+    magic, version, offset, zip_size, recipients = _HEADER.unpack_from(data, 0)
+    if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+        raise ValueError('Invalid checkpoint file: ' + path)
+    pos = _HEADER.size
+
+    def read_string(pos):
+        size, = _STRING.unpack_from(data, pos)
+        pos += _STRING.size
+        return data[pos:pos + size].decode('utf-8'), pos + size
+
+    def read_array(pos, size, typecode=AMOUNT_TYPECODE):
+        values = array(typecode)
+        end = pos + values.itemsize * size
+        # fromstring in Python 2
+        getattr(values, 'frombytes', getattr(values, 'fromstring', None))(data[pos:end])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values, end
+
+    def read_groups(pos, cls):
+        groups = dict()
+        count, = _COUNT.unpack_from(data, pos)
+        pos += _COUNT.size
+        for _ in range(count):
+            key, pos = read_string(pos)
+            total, size = _GROUP.unpack_from(data, pos)
+            pos += _GROUP.size
+            amounts, pos = read_array(pos, size & ~_REPEATED)
+            if size & _REPEATED:
+                counts, pos = read_array(pos, size & ~_REPEATED, _COUNT_TYPECODE)
+                groups[key] = cls.restore_counted(amounts, counts, total, engine)
+            else:
+                groups[key] = cls.restore(amounts, total, engine)
+        return groups, pos
+
+    infoDB = dict()
+    id_nodes = []
+    for _ in range(recipients):
+        id, pos = read_string(pos)
+        info = InfoIndividual({'CMTE_ID': id, 'TRANSACTION_AMT': None,
+                               'ZIP_CODE': None, 'TRANSACTION_DT': None})
+        zip_dict, pos = read_groups(pos, InfoByZip)
+        date_dict, pos = read_groups(pos, InfoByDate)
+        info.get_zip_dict().update(zip_dict)
+        info.get_date_dict().update(date_dict)
+        infoDB[id] = info
+
+        if date_dict:
+            date_nodes = sorted(NodeByDate(date, info_by_date)
+                                for date, info_by_date in date_dict.items())
+            node = NodeByID(id, date_nodes[0].key, date_nodes[0].val)
+            node.val.build(date_nodes)
+            id_nodes.append(node)
+    return infoDB, id_nodes, offset, zip_size
+
+
+def load_checkpoint(path, engine=None, id_index='tree'):
+    """
+    Restore the donor state from a binary checkpoint
+
+    The groups are rebuilt from their sorted amounts by the running median
+    backend, the tree is built balanced without rotations, and the date index
+    of each recipient is built from its transaction date groups.
+
+    :param path: string, path to the checkpoint file
+    :param engine: string, name of the running median backend,
+        None for InfoByDomainBase.get_median_engine()
+    :param id_index: string, name of the ordered index of the recipients
+    :return: tuple (infoDB, infoAVLTree, offset, zip_size)
+    """
+    infoDB, id_nodes, offset, zip_size = _read_checkpoint(path, engine)
+    infoAVLTree = ID_INDEXES[id_index]()
+    infoAVLTree.build(sorted(id_nodes))
+    return infoDB, infoAVLTree, offset, zip_size
+
+
+def get_state_shard(id):
+    """
+    Shard of the recipient in a state folder, part of the state format:
+    unlike the shards of the worker processes, it must not change between runs
+
+    :param id: string, id of the recipient (CMTE_ID)
+    :return: int, index of the shard in [0, STATE_SHARDS)
+    """
+    return (zlib.crc32(id.encode('utf-8')) & 0xffffffff) % STATE_SHARDS
+
+
+def state_shard_path(path, shard):
+    """
+    :param path: string, path to the state folder
+    :param shard: int, index of the shard
+    :return: string, path to the checkpoint of the shard
+    """
+    return os.path.join(path, 'shard-%02d.ckpt' % shard)
+
+
+def save_state(path, infoDB, ids=None):
+    """
+    Write the donor state to a state folder, one checkpoint per shard
+    of recipients, each shard atomically
+
+    Only the shards of the given recipients are rewritten, infoDB must hold
+    all the recipients of these shards, e.g. restored by load_state(path, ids).
+
+    :param path: string, path to the state folder, created if missing
+    :param infoDB: dict, information database {id: object infoIndividual}
+    :param ids: iterable of strings, recipients whose shards are rewritten,
+        None for the shards of all the recipients of infoDB
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    shards = dict()
+    for id, info in infoDB.items():
+        shards.setdefault(get_state_shard(id), dict())[id] = info
+    touched = shards if ids is None else set(get_state_shard(id) for id in ids)
+    for shard in sorted(touched):
+        save_checkpoint(state_shard_path(path, shard), shards.get(shard, dict()), 0)
+
+
+def load_state(path, ids=None, engine=None, id_index='tree'):
+    """
+    Restore the donor state from a state folder, saved by save_state
+
+    :param path: string, path to the state folder, a missing folder or shard
+        holds no recipient
+    :param ids: iterable of strings, recipients restored with all the recipients
+        of their shards, None for all the shards
+    :param engine: string, name of the running median backend,
+        None for InfoByDomainBase.get_median_engine()
+    :param id_index: string, name of the ordered index of the recipients
+    :return: tuple (infoDB, infoAVLTree)
+    """
+    shards = range(STATE_SHARDS) if ids is None else \
+        sorted(set(get_state_shard(id) for id in ids))
+    infoDB = dict()
+    id_nodes = []
+    for shard in shards:
+        shard_path = state_shard_path(path, shard)
+        if os.path.exists(shard_path):
+            shard_infoDB, shard_nodes, _, _ = _read_checkpoint(shard_path, engine)
+            infoDB.update(shard_infoDB)
+            id_nodes.extend(shard_nodes)
+
+    infoAVLTree = ID_INDEXES[id_index]()
+    infoAVLTree.build(sorted(id_nodes))
+    return infoDB, infoAVLTree
@@ -1,8 +1,10 @@
 import argparse
+import atexit
+import time
 from src import *
 
 
-def update_info_database(line):
+def update_info_database(line, infoDB):
     """
     Take the line streamed in, update information database with key: 
     id of the recipient of current donation
@@ -12,6 +14,7 @@ def update_info_database(line):
 
     :param line: dict, input line with fields: 
         CMTE_ID, TRANSACTION_AMT, ZIP_CODE and TRANSACTION_DT
+    :param infoDB: dict, information database {id: object infoIndividual}
 
     :return: object infoIndividual, contains the summary of the donation 
         the recipient has received so far.
@@ -26,7 +29,134 @@ def update_info_database(line):
     return infoDB[id]
 
 
-if __name__ == "__main__":
+def update_info_tree(line, info, infoAVLTree):
+    """
+    Insert the donation information of the recipient on the transaction date
+    of the line streamed in to the tree
+
+    :param line: dict, input line with a valid TRANSACTION_DT
+    :param info: object infoIndividual, updated with the line
+    :param infoAVLTree: object AVLTreeByID
+    """
+    infoAVLTree.insert(info.get_id(), line['TRANSACTION_DT'],
+                       info.get_date_dict_entry(line['TRANSACTION_DT']))
+
+
+def process_records(records, infoDB, infoAVLTree, zip_writer, date_writer=None):
+    """
+    Update the information database and the tree with each line streamed in,
+    stream out the medianvals_by_zip entries
+
+    :param records: iterable of dict, valid input lines
+    :param infoDB: dict, information database {id: object infoIndividual}
+    :param infoAVLTree: object AVLTreeByID
+    :param zip_writer: object ZipOutputWriter, output: medianvals_by_zip
+    :param date_writer: object DateOutputWriter, notified of each tree update
+    """
+    # the stages are only timed when the metrics are enabled
+    if METRICS.get_enabled():
+        return _process_records_timed(records, infoDB, infoAVLTree, zip_writer,
+                                      date_writer)
+
+    # iterate through each line of input files
+    for line in records:
+
+        # update information database from the line streamed in
+        # obtain the recipient information
+        info = update_info_database(line, infoDB)
+
+        # If the info contains zip code information:
+        # add the updated entry (donation to recipient id from area zip_code)
+        # to medianvals_by_zip file
+        if line['ZIP_CODE']:
+            # Currently, the output method only checks whether
+            # the zip code is already in the database
+            # TODO: check whether the [id][zip_code] entry is just updated (by flag?)
+            zip_writer.write_entry(info, line['ZIP_CODE'])
+
+        # if the info contains transaction date information:
+        # add to transaction date output file
+        if line['TRANSACTION_DT']:
+            update_info_tree(line, info, infoAVLTree)
+
+            # Write the updated tree to output via in-order traversal
+            # if required by the output policy
+            if date_writer:
+                date_writer.notify()
+
+
+def _process_records_timed(records, infoDB, infoAVLTree, zip_writer,
+                           date_writer=None):
+    """
+    Same as process_records, timing each stage in METRICS,
+    and reporting the metrics to stderr periodically
+    """
+    report_interval = METRICS.get_report_interval()
+    clock = time.time
+    records = iter(records)
+    last_report = clock()
+
+    while True:
+        start = clock()
+        line = next(records, None)
+        parsed = clock()
+        METRICS.add_time('parse', parsed - start)
+        if line is None:
+            break
+        METRICS.count('rows_valid')
+
+        info = update_info_database(line, infoDB)
+        updated = clock()
+        METRICS.add_time('update_info', updated - parsed)
+
+        if line['ZIP_CODE']:
+            zip_writer.write_entry(info, line['ZIP_CODE'])
+
+        if line['TRANSACTION_DT']:
+            start = clock()
+            update_info_tree(line, info, infoAVLTree)
+            end = clock()
+            METRICS.add_time('update_tree', end - start)
+            if date_writer:
+                date_writer.notify()
+            METRICS.add_time('output', clock() - end + start - updated)
+        else:
+            end = clock()
+            METRICS.add_time('output', end - updated)
+
+        if report_interval and end - last_report >= report_interval:
+            METRICS.print_report()
+            last_report = end
+
+
+def checkpoint_records(records, every, save):
+    """
+    Pass the lines streamed in with their byte offset through,
+    and save a checkpoint every N lines, once the previous lines
+    have been processed
+
+    :param records: iterable of (offset, dict), from stream_input_range
+    :param every: int, number of lines between two checkpoints
+    :param save: callable, save(offset) saves the state to continue
+        streaming from the input byte offset
+    :return: dictionary generator, valid input lines
+    """
+    count = 0
+    for offset, line in records:
+        # the empty line ending the stream
+        if line is None:
+            break
+        yield line
+
+        # the line has been processed when the next one is requested:
+        # streaming from any position inside the line continues with the next line
+        count += 1
+        if count == every:
+            save(offset + 1)
+            count = 0
+
+
+def main(argv=None):
     # Argument parser
     # TODO: allow default input and output path
     parser = argparse.ArgumentParser()
@@ -35,7 +165,92 @@ if __name__ == "__main__":
                         "path to output: medianvals_by_zip")
     parser.add_argument("output_by_date", type=str, help= \
                         "path to output: medianvals_by_date")
-    args = parser.parse_args()
+    parser.add_argument("--date-output", type=str, default='end',
+                        choices=DateOutputWriter.POLICIES, help= \
+                        "when to write medianvals_by_date: after every dated "
+                        "record, at the end of the stream, every N dated "
+                        "records, every T seconds or on SIGUSR1")
+    parser.add_argument("--date-every", type=int, default=10000, help= \
+                        "N, dated records between two snapshots (--date-output every)")
+    parser.add_argument("--date-interval", type=float, default=60.0, help= \
+                        "T, seconds between two snapshots (--date-output interval)")
+    parser.add_argument("--date-mode", type=str, default='snapshot',
+                        choices=DateOutputWriter.MODES, help= \
+                        "what a medianvals_by_date snapshot writes: the whole "
+                        "file, the entries changed since the previous snapshot "
+                        "appended as a log, or the changed entries merged into "
+                        "the existing file")
+    parser.add_argument("--median-engine", type=str, default='heap',
+                        choices=sorted(MEDIAN_ENGINES), help= \
+                        "running median backend of each zip code/date group")
+    parser.add_argument("--date-index", type=str, default='calendar',
+                        choices=sorted(DATE_INDEXES), help= \
+                        "date index of each recipient: day slots of a 1024 day "
+                        "window (out of window dates in a tree), or a tree")
+    parser.add_argument("--id-index", type=str, default='sorted',
+                        choices=sorted(ID_INDEXES), help= \
+                        "ordered index of the recipients: hash map and sorted "
+                        "key list, or a tree")
+    parser.add_argument("--zip-buffer-size", type=int, default=1 << 20, help= \
+                        "characters of medianvals_by_zip entries buffered before writing")
+    parser.add_argument("--zip-flush-every", type=int, default=0, help= \
+                        "write medianvals_by_zip every N entries (0: when the buffer is full)")
+    parser.add_argument("--mmap", action='store_true', help= \
+                        "read the input through a memory map, "
+                        "decoding only the required columns")
+    parser.add_argument("--workers", type=int, default=1, help= \
+                        "number of worker processes, recipients are sharded "
+                        "among workers (medianvals_by_date is written at the end)")
+    parser.add_argument("--checkpoint", type=str, default=None, help= \
+                        "path to a binary checkpoint of the donor state, "
+                        "saved periodically while streaming")
+    parser.add_argument("--checkpoint-every", type=int, default=1000000, help= \
+                        "valid lines between two checkpoints")
+    parser.add_argument("--resume", action='store_true', help= \
+                        "reload the checkpoint and continue streaming from its "
+                        "input offset, medianvals_by_zip is continued")
+    parser.add_argument("--metrics", type=str, default=None, help= \
+                        "count rejected rows per rule, time each stage, "
+                        "and dump the metrics to this JSON file at exit")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help= \
+                        "seconds between two reports of the metrics to stderr "
+                        "(0: no report)")
+    parser.add_argument("--state", type=str, default=None, help= \
+                        "path to the state folder of the previous runs: the input "
+                        "only holds the new records, medianvals_by_date only holds "
+                        "the changed entries, and the state is updated (only the "
+                        "shards of the recipients of the input are read and rewritten)")
+    args = parser.parse_args(argv)
+
+    if args.checkpoint and (args.workers > 1 or args.mmap):
+        parser.error("--checkpoint streams the input line by line, "
+                     "without --workers or --mmap")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    if args.state and (args.workers > 1 or args.checkpoint):
+        parser.error("--state can not be used with --workers or --checkpoint")
+    if args.metrics and args.workers > 1:
+        parser.error("--metrics can not be used with --workers")
+    if args.workers > 1:
+        # the workers stream their shard line by line, and
+        # medianvals_by_date is merged at the end
+        ignored = ['--' + dest.replace('_', '-') for dest in
+                   ['date_output', 'date_every', 'date_interval', 'date_mode',
+                    'mmap', 'zip_buffer_size', 'zip_flush_every']
+                   if getattr(args, dest) != parser.get_default(dest)]
+        if ignored:
+            parser.error(', '.join(ignored) + " can not be used with --workers")
+    if args.checkpoint_every < 1:
+        parser.error("--checkpoint-every must be positive")
+
+    InfoByDomainBase.set_median_engine(args.median_engine)
+    NodeByID.set_date_index(args.date_index)
+
+    if args.metrics:
+        METRICS.set_enabled(True)
+        METRICS.set_report_interval(args.metrics_interval)
+        # dumped even if the run is interrupted
+        atexit.register(METRICS.dump, args.metrics)
 
     # information database that saves all the donation data
     # structure:
@@ -44,44 +259,96 @@ if __name__ == "__main__":
 
     # self-balancing binary search tree that saves
     # the recipient and transaction date in order
-    infoAVLTree = AVLTreeByID()
+    infoAVLTree = ID_INDEXES[args.id_index]()
 
     try:
-        # open medianvals_by_zip file since it requires streaming
-        fileout_zip = open(args.output_by_zip, 'w')
-
-        # iterate through each line of input files
-        for line in stream_input(args.input):
-
-            # update information database from the line streamed in
-            # obtain the recipient information
-            info = update_info_database(line)
-
-            # If the info contains zip code information:
-            # add the updated entry (donation to recipient id from area zip_code)
-            # to medianvals_by_zip file
-            if line['ZIP_CODE']:
-                # Currently, the output method only checks whether
-                # the zip code is already in the database
-                # TODO: check whether the [id][zip_code] entry is just updated (by flag?)
-                fileout_zip.write(info.output_by_zip(line['ZIP_CODE']))
-
-            # if the info contains transaction date information:
-            # add to transaction date output file
-            if line['TRANSACTION_DT']:
-                # construct new infoAVLTree node from information in infoDB
-                new_node = NodeByID(info.get_id(), line['TRANSACTION_DT'],
-                                    info.get_date_dict_entry(line['TRANSACTION_DT']))
-                infoAVLTree.update_tree(new_node)
-
-                # Write the updated tree to output via in-order traversal
-                fileout_date = open(args.output_by_date, 'w')
-                for entry in infoAVLTree.output():
-                    fileout_date.write(entry)
-                fileout_date.close()
-
-        # close medianvals_by_zip file
-        fileout_zip.close()
+        if args.workers > 1:
+            # parallel_ingest imports this module
+            from src.parallel_ingest import run_parallel
+
+            # shard the recipients among worker processes
+            run_parallel(args.input, args.output_by_zip, args.output_by_date,
+                         args.workers, args.median_engine, args.date_index,
+                         args.id_index)
+        else:
+            # restore the state saved by an interrupted run
+            offset, zip_size = 0, None
+            if args.resume:
+                infoDB, infoAVLTree, offset, zip_size = \
+                    load_checkpoint(args.checkpoint, id_index=args.id_index)
+
+            # fold the new records into the state of the previous runs,
+            # only the recipients sharing a shard with the input are restored
+            if args.state:
+                state_ids = set(stream_ids(args.input))
+                infoDB, infoAVLTree = load_state(args.state, state_ids,
+                                                 id_index=args.id_index)
+
+            # track the changed entries to only output these entries
+            infoAVLTree.set_track_changes(bool(args.state) or args.date_mode != 'snapshot')
+            if args.resume and args.date_mode != 'snapshot':
+                # the interrupted run may not have written the changes
+                # before its checkpoint: the first snapshot writes every entry
+                infoAVLTree.mark_all_changed()
+
+            # open medianvals_by_zip file since it requires streaming,
+            # entries are buffered and written by large blocks
+            zip_writer = ZipOutputWriter(args.output_by_zip, args.zip_buffer_size,
+                                         args.zip_flush_every, zip_size)
+
+            # medianvals_by_date is written as snapshots of the whole tree,
+            # of the entries changed by the run with a state,
+            # or of the entries changed since the previous snapshot,
+            # the policy decides how often the snapshot is refreshed
+            if args.date_mode != 'snapshot':
+                date_source = infoAVLTree.flush_changes
+            elif args.state:
+                date_source = infoAVLTree.output_changes
+            else:
+                date_source = infoAVLTree.output
+            # patched medianvals_by_date only continues the file
+            # of a previous run with a state, or of an interrupted run,
+            # the change log only continues the log of an interrupted run
+            date_writer = DateOutputWriter(args.output_by_date, date_source,
+                                           args.date_output, args.date_every,
+                                           args.date_interval, args.date_mode,
+                                           bool(args.state or args.resume),
+                                           args.resume)
+
+            # stream valid lines from the input file,
+            # validated line by line
+            if args.checkpoint:
+                # the byte offset of each line is kept to continue streaming
+                records = checkpoint_records(
+                    stream_input_range(args.input, offset), args.checkpoint_every,
+                    lambda offset: save_checkpoint(args.checkpoint, infoDB, offset,
+                                                   zip_writer.tell()))
+            elif args.mmap:
+                records = stream_input_mmap(args.input)
+            else:
+                records = stream_input(args.input)
+
+            process_records(records, infoDB, infoAVLTree, zip_writer, date_writer)
+
+            with METRICS.timed('output'):
+                # close medianvals_by_zip file
+                zip_writer.close()
+
+                # write the final snapshot of medianvals_by_date,
+                # the changes of a run with a state are written even if empty,
+                # a resumed run writes the restored entries even without new ones
+                date_writer.close(always=bool(args.state or args.resume))
+
+            if args.metrics:
+                METRICS.print_report()
+
+            # save the state for the next run
+            if args.state:
+                save_state(args.state, infoDB, state_ids)
 
     except IOError:
         print("Invalid file or file path.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import heapq
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zlib
+from src.AVLTree import ID_INDEXES, NodeByID
+from src.InfoTable import InfoByDomainBase
+from src.OutputWriter import atomic_write, ZipOutputWriter
+from src.stream_input import stream_input_range
+from src.find_political_donors import update_info_database, update_info_tree
+
+
+def split_ranges(filename, count):
+    """
+    Split the input file into byte ranges of similar size
+    The ranges are aligned to line boundaries by stream_input_range
+
+    :param filename: string, path to the file
+    :param count: int, number of ranges
+    :return: list of tuples (start, end)
+    """
+    size = os.path.getsize(filename)
+    step = size // count + 1
+    return [(i * step, min((i + 1) * step, size)) for i in range(count)]
+
+
+def get_shard(id, shards):
+    """
+    :param id: string, id of the recipient (CMTE_ID)
+    :param shards: int, number of shards
+    :return: int, index of the shard owning the recipient
+    """
+    return (zlib.crc32(id.encode('utf-8')) & 0xffffffff) % shards
+
+
+def run_parallel(input, output_by_zip, output_by_date, workers, engine=None,
+                 date_index=None, id_index='tree'):
+    """
+    Process the input file with worker processes in three steps:
+        1. each worker parses one byte range of the input file, and spools
+            the valid lines to one file per shard of recipients
+        2. each worker owns one shard of recipients, with its own information
+            database and tree, and processes the spooled lines in input order
+        3. the medianvals_by_zip entries of the shards are merged in input order
+            (by byte offset of the line), the medianvals_by_date entries of
+            the shards are merged by recipient order
+
+    :param input: string, path to input file
+    :param output_by_zip: string, path to output: medianvals_by_zip
+    :param output_by_date: string, path to output: medianvals_by_date
+    :param workers: int, number of worker processes (and shards)
+    :param engine: string, name of the running median backend
+    :param date_index: string, name of the date index of the recipients
+    :param id_index: string, name of the ordered index of the recipients
+    """
+    folder = tempfile.mkdtemp(prefix='find_political_donors_')
+    pool = multiprocessing.Pool(workers)
+    try:
+        ranges = split_ranges(input, workers)
+        stops = pool.map(_parse_range, [
+            (input, start, end, workers, folder, i)
+            for i, (start, end) in enumerate(ranges)])
+
+        # The stream ends at the first empty line of the file
+        stops = [stop for stop in stops if stop is not None]
+        stop = min(stops) if stops else None
+
+        results = pool.map(_aggregate_shard, [
+            (folder, len(ranges), shard, stop, engine, date_index, id_index)
+            for shard in range(workers)])
+
+        # Merge medianvals_by_zip entries in input order
+        zip_writer = ZipOutputWriter(output_by_zip)
+        for _, entry in heapq.merge(*[_read_zip_entries(zip_path)
+                                      for zip_path, _ in results]):
+            zip_writer.write(entry)
+        zip_writer.close()
+
+        # Merge medianvals_by_date entries in recipient order
+        if any(dated for _, dated in results):
+            atomic_write(output_by_date, (entry[-1] for entry in heapq.merge(
+                *[_read_date_entries(folder, shard) for shard in range(workers)])))
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(folder)
+
+
+def _spool_path(folder, index, shard):
+    return os.path.join(folder, 'range%d_shard%d.txt' % (index, shard))
+
+
+def _parse_range(task):
+    """
+    Parse one byte range of the input file and spool valid lines by shard,
+    as offset|CMTE_ID|TRANSACTION_AMT|ZIP_CODE|TRANSACTION_DT
+
+    :return: int, byte offset of the empty line ending the stream, None if not found
+    """
+    filename, start, end, shards, folder, index = task
+    spools = [io.open(_spool_path(folder, index, shard), 'w', encoding='utf-8')
+              for shard in range(shards)]
+    stop = None
+    try:
+        for offset, line in stream_input_range(filename, start, end):
+            if line is None:
+                stop = offset
+                break
+            spools[get_shard(line['CMTE_ID'], shards)].write(u'%d|%s|%d|%s|%s\n' % (
+                offset, line['CMTE_ID'], line['TRANSACTION_AMT'],
+                line['ZIP_CODE'] or '', line['TRANSACTION_DT'] or ''))
+    finally:
+        for spool in spools:
+            spool.close()
+    return stop
+
+
+def _read_spool(folder, ranges, shard, stop):
+    """
+    Yield the spooled lines of one shard in input order
+    """
+    for index in range(ranges):
+        with io.open(_spool_path(folder, index, shard), encoding='utf-8') as spool:
+            for entry in spool:
+                offset, id, amount, zipcode, date = entry.rstrip('\n').split('|')
+                offset = int(offset)
+                if stop is not None and offset >= stop:
+                    return
+                yield offset, {'CMTE_ID': id, 'TRANSACTION_AMT': int(amount),
+                               'ZIP_CODE': zipcode or None,
+                               'TRANSACTION_DT': date or None}
+
+
+def _aggregate_shard(task):
+    """
+    Process the spooled lines of one shard of recipients
+
+    :return: tuple, path to the medianvals_by_zip entries (prefixed by
+        the byte offset of the line) and whether any line was dated
+    """
+    folder, ranges, shard, stop, engine, date_index, id_index = task
+    if engine:
+        InfoByDomainBase.set_median_engine(engine)
+    if date_index:
+        NodeByID.set_date_index(date_index)
+
+    infoDB = dict()
+    infoAVLTree = ID_INDEXES[id_index]()
+    dated = False
+
+    zip_path = os.path.join(folder, 'zip_shard%d.txt' % shard)
+    with io.open(zip_path, 'w', encoding='utf-8') as fileout_zip:
+        for offset, line in _read_spool(folder, ranges, shard, stop):
+            info = update_info_database(line, infoDB)
+            if line['ZIP_CODE']:
+                fileout_zip.write(u'%d|%s' % (offset, info.output_by_zip(line['ZIP_CODE'])))
+            if line['TRANSACTION_DT']:
+                update_info_tree(line, info, infoAVLTree)
+                dated = True
+
+    with io.open(os.path.join(folder, 'date_shard%d.txt' % shard), 'w',
+                 encoding='utf-8') as fileout_date:
+        for entry in infoAVLTree.output():
+            fileout_date.write(entry)
+
+    return zip_path, dated
+
+
+def _read_zip_entries(zip_path):
+    with io.open(zip_path, encoding='utf-8') as filein:
+        for entry in filein:
+            offset, entry = entry.split('|', 1)
+            yield int(offset), entry
+
+
+def _read_date_entries(folder, shard):
+    # Recipients are sharded: the entries of a recipient come from one shard,
+    # and are kept in order by the sequence number
+    with io.open(os.path.join(folder, 'date_shard%d.txt' % shard),
+                 encoding='utf-8') as filein:
+        for seq, entry in enumerate(filein):
+            yield int(entry[1:entry.index('|')]), shard, seq, entry
@@ -0,0 +1,347 @@
+"""
+Long-running service mode (Python 3.5+, asyncio)
+
+The service accepts records in the format of itcont.txt over a local TCP
+socket, a Unix socket or the stdin pipe, updates the information database
+and the tree as the records arrive, and streams the medianvals_by_zip
+entries back to the sender of each record. medianvals_by_date is written
+based on the output policy, and at shutdown.
+
+Run from the root folder:
+    root~$ PYTHONPATH=. python src/service.py serve --tcp 127.0.0.1:8765 --output-by-date medianvals_by_date.txt
+    root~$ PYTHONPATH=. python src/service.py feed path/to/itcont.txt --tcp 127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import os
+import signal
+import stat
+import sys
+from src.AVLTree import AVLTreeByID, NodeByID, DATE_INDEXES, ID_INDEXES
+from src.InfoTable import InfoByDomainBase
+from src.MedianEngine import MEDIAN_ENGINES
+from src.OutputWriter import DateOutputWriter
+from src.stream_input import parse_line
+from src.find_political_donors import update_info_database, update_info_tree
+
+# Lines ending the feed of a connection, as the empty line ends an input file
+END_OF_FEED = (b'', b'\n', b'\r\n', b' ')
+
+
+class DonorService(object):
+    """
+    Shared state of the service: the information database and the tree
+    are updated by the records of all the connections, one record at a time
+
+    :param date_writer: object DateOutputWriter, notified of each tree update,
+        None to not write medianvals_by_date
+    :param infoDB: dict, information database {id: object infoIndividual}
+    :param infoAVLTree: object AVLTreeByID
+
+    """
+
+    def __init__(self, date_writer=None, infoDB=None, infoAVLTree=None):
+        self._date_writer = date_writer
+        self._infoDB = dict() if infoDB is None else infoDB
+        self._infoAVLTree = AVLTreeByID() if infoAVLTree is None else infoAVLTree
+
+    def get_info_database(self):
+        return self._infoDB
+
+    def get_tree(self):
+        return self._infoAVLTree
+
+    def process_line(self, line):
+        """
+        Update the information database and the tree with one record
+
+        :param line: string, one record of itcont.txt
+        :return: string, medianvals_by_zip entry of the record,
+            None if the record is invalid or has no valid zip code
+        """
+        record = parse_line(line)
+        if not record:
+            return None
+
+        info = update_info_database(record, self._infoDB)
+        if record['TRANSACTION_DT']:
+            update_info_tree(record, info, self._infoAVLTree)
+            if self._date_writer:
+                self._date_writer.notify()
+
+        if record['ZIP_CODE']:
+            return info.output_by_zip(record['ZIP_CODE'])
+        return None
+
+    async def handle(self, reader, writer):
+        """
+        Process the records of one connection until the end of its feed,
+        and stream the medianvals_by_zip entries back
+
+        Each entry is written as soon as its record is processed. The next
+        record is only read once the entry is accepted by the transport
+        (drain), so a peer that does not read the entries stops being read.
+
+        :param reader: asyncio.StreamReader, records
+        :param writer: asyncio.StreamWriter, medianvals_by_zip entries
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if line in END_OF_FEED:
+                    break
+
+                entry = self.process_line(line.decode('utf-8', 'replace'))
+                if entry:
+                    writer.write(entry.encode('utf-8'))
+                    await writer.drain()
+        finally:
+            writer.close()
+
+
+class FileReader(object):
+    """
+    Reader of a regular file with the interface of asyncio.StreamReader
+    used by DonorService.handle, as the pipe transports do not accept
+    regular files (stdin redirected from a file)
+
+    The file is read without waiting: control is given back to the event loop
+    every YIELD_EVERY lines, so that the stop signals are handled.
+
+    :param filein: binary file object
+
+    """
+    YIELD_EVERY = 1024
+
+    def __init__(self, filein):
+        self._filein = filein
+        self._lines = 0
+
+    async def readline(self):
+        self._lines += 1
+        if self._lines % self.YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+        return self._filein.readline()
+
+
+class FileWriter(object):
+    """
+    Writer to a regular file with the interface of asyncio.StreamWriter
+    used by DonorService.handle (stdout redirected to a file)
+
+    :param fileout: binary file object
+
+    """
+
+    def __init__(self, fileout):
+        self._fileout = fileout
+
+    def write(self, data):
+        self._fileout.write(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self._fileout.flush()
+
+
+def is_regular_file(fileobj):
+    return stat.S_ISREG(os.fstat(fileobj.fileno()).st_mode)
+
+
+async def open_stdio():
+    """
+    :return: tuple (reader, writer, transport), asyncio.StreamReader and
+        asyncio.StreamWriter on the stdin and stdout pipes,
+        FileReader and FileWriter on regular files,
+        and the transport of the stdin pipe to close, None for a regular file
+    """
+    loop = asyncio.get_event_loop()
+    if is_regular_file(sys.stdin):
+        reader, transport = FileReader(sys.stdin.buffer), None
+    else:
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    if is_regular_file(sys.stdout):
+        writer = FileWriter(sys.stdout.buffer)
+    else:
+        write_transport, protocol = await loop.connect_write_pipe(
+            asyncio.streams.FlowControlMixin, sys.stdout)
+        writer = asyncio.StreamWriter(write_transport, protocol, None, loop)
+    return reader, writer, transport
+
+
+def parse_address(address):
+    """
+    :param address: string, HOST:PORT
+    :return: tuple (host, port)
+    """
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+async def serve(service, tcp=None, unix=None, stop=None):
+    """
+    Run the service on a TCP socket, a Unix socket or the stdin pipe,
+    until the stop event is set (or the end of stdin)
+
+    The records of stdin are processed until the end of the feed or the stop
+    event, whichever comes first, the records already processed are kept.
+
+    :param service: object DonorService
+    :param tcp: string, HOST:PORT to listen to
+    :param unix: string, path to the Unix socket to listen to
+    :param stop: asyncio.Event, set to stop the service, None for no stop
+    """
+    if stop is None:
+        stop = asyncio.Event()
+
+    if not tcp and not unix:
+        reader, writer, transport = await open_stdio()
+        handling = asyncio.ensure_future(service.handle(reader, writer))
+        stopping = asyncio.ensure_future(stop.wait())
+        try:
+            await asyncio.wait([handling, stopping],
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopping.cancel()
+            if not handling.done():
+                handling.cancel()
+                await asyncio.wait([handling])
+            if transport is not None:
+                transport.close()
+        if not handling.cancelled():
+            # raise the errors of the connection
+            handling.result()
+        return
+
+    if tcp:
+        host, port = parse_address(tcp)
+        server = await asyncio.start_server(service.handle, host, port)
+    else:
+        server = await asyncio.start_unix_server(service.handle, unix)
+
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+async def feed(lines, tcp=None, unix=None):
+    """
+    Test client: send records to the service and collect the
+    medianvals_by_zip entries streamed back
+
+    :param lines: iterable of strings, records ending with line break
+    :param tcp: string, HOST:PORT of the service
+    :param unix: string, path to the Unix socket of the service
+    :return: list of strings, medianvals_by_zip entries
+    """
+    if tcp:
+        reader, writer = await asyncio.open_connection(*parse_address(tcp))
+    else:
+        reader, writer = await asyncio.open_unix_connection(unix)
+
+    async def send():
+        for line in lines:
+            writer.write(line.encode('utf-8'))
+            await writer.drain()
+        writer.write_eof()
+
+    # send and receive at the same time, the service applies backpressure
+    sending = asyncio.ensure_future(send())
+    entries = []
+    try:
+        while True:
+            entry = await reader.readline()
+            if not entry:
+                break
+            entries.append(entry.decode('utf-8'))
+        await sending
+    finally:
+        writer.close()
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command')
+
+    server = commands.add_parser('serve', help="run the service")
+    server.add_argument("--tcp", type=str, default=None,
+                        help="HOST:PORT to listen to")
+    server.add_argument("--unix", type=str, default=None,
+                        help="path to the Unix socket to listen to")
+    server.add_argument("--output-by-date", type=str, default=None, help= \
+                        "path to output: medianvals_by_date")
+    server.add_argument("--date-output", type=str, default='interval',
+                        choices=DateOutputWriter.POLICIES, help= \
+                        "when to write medianvals_by_date")
+    server.add_argument("--date-every", type=int, default=10000, help= \
+                        "N, dated records between two snapshots (--date-output every)")
+    server.add_argument("--date-interval", type=float, default=60.0, help= \
+                        "T, seconds between two snapshots (--date-output interval)")
+    server.add_argument("--median-engine", type=str, default='heap',
+                        choices=sorted(MEDIAN_ENGINES), help= \
+                        "running median backend of each zip code/date group")
+    server.add_argument("--date-index", type=str, default='calendar',
+                        choices=sorted(DATE_INDEXES), help= \
+                        "date index of each recipient: day slots of a 1024 day "
+                        "window (out of window dates in a tree), or a tree")
+    server.add_argument("--id-index", type=str, default='sorted',
+                        choices=sorted(ID_INDEXES), help= \
+                        "ordered index of the recipients: hash map and sorted "
+                        "key list, or a tree")
+
+    client = commands.add_parser('feed', help="send an input file to the service")
+    client.add_argument("input", type=str, help="path to input file")
+    client.add_argument("--tcp", type=str, default=None,
+                        help="HOST:PORT of the service")
+    client.add_argument("--unix", type=str, default=None,
+                        help="path to the Unix socket of the service")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error("a command is required: serve or feed")
+    if args.tcp and args.unix:
+        parser.error("--tcp and --unix can not be used together")
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if args.command == 'feed':
+        if not args.tcp and not args.unix:
+            parser.error("feed requires --tcp or --unix")
+        with open(args.input) as filein:
+            entries = loop.run_until_complete(feed(filein, args.tcp, args.unix))
+        sys.stdout.writelines(entries)
+        loop.close()
+        return
+
+    InfoByDomainBase.set_median_engine(args.median_engine)
+    NodeByID.set_date_index(args.date_index)
+    infoAVLTree = ID_INDEXES[args.id_index]()
+    date_writer = None
+    if args.output_by_date:
+        date_writer = DateOutputWriter(args.output_by_date, infoAVLTree.output,
+                                       args.date_output, args.date_every,
+                                       args.date_interval)
+    service = DonorService(date_writer, dict(), infoAVLTree)
+
+    # stop on SIGINT/SIGTERM, write the final snapshot of medianvals_by_date
+    stop = asyncio.Event()
+    for signum in [signal.SIGINT, signal.SIGTERM]:
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        loop.run_until_complete(serve(service, args.tcp, args.unix, stop))
+    finally:
+        if date_writer:
+            date_writer.close()
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
-import datetime
+import locale
+import mmap
+import os
 import sys
 from src import ProgressBar
+from src.ProgressReporter import ProgressReporter
+from src.DateCache import DATE_CACHE
+from src.Metrics import METRICS
 
 INPUT_HEADER = {
     'CMTE_ID':0,
@@ -14,12 +19,17 @@ INFO_HEADER = ['CMTE_ID', 'TRANSACTION_AMT', 'ZIP_CODE', 'TRANSACTION_DT']
 
 COLSIZE = 21 # Total fields of records downloaded from FEC website
 
+# sys.intern in Python 3, built-in intern in Python 2
+_intern = getattr(sys, 'intern', None) or intern
+
 
 def stream_input(filename):
     """
     Stream input file line by line
     Yield valid data lines
 
+    The progress is reported to stderr if ProgressBar is enabled
+
     :param filename: string, path to the file
 
     :return: extracted_info: dictionary generator,
@@ -28,101 +38,285 @@ def stream_input(filename):
     """
     file = open(filename, 'r')
 
+    # Iterate the file till the end of the file,
+    # lines only go through the progress reporter when it is enabled
+    lines = iter(file.readline, '')
     if ProgressBar.get_progress_bar():
-        # for progress bar
-        counter = 0
-        sys.stdout.write('PROGRESS(every 1000 reads): \n')
-        sys.stdout.write('.')
-        sys.stdout.flush()
-
-    # Iterate the file till the end of the file
-    while True:
-        if ProgressBar.get_progress_bar():
-            counter += 1
-            if counter == 1000:
-                sys.stdout.write('.')
-                sys.stdout.flush()
-                counter = 0
-
-        line = file.readline()
-        if line in ['\n', '', ' ']:
-            break
-
-        entries = line.split('|')
-
-        # Integrity check
-        if len(entries) != COLSIZE:
-            continue
-        # Input file considerations rule 5:
-        # Remove entries with empty CMTE_ID or TRANSACTION_AMT
-        elif (not entries[INPUT_HEADER['CMTE_ID']]) or \
-                (not entries[INPUT_HEADER['TRANSACTION_AMT']]):
-            continue
-        # Input file consideration rule 1:
-        # Remove entries with contributors from entities
-        elif entries[INPUT_HEADER['OTHER_ID']]:
-            continue
-
-        # Extract CMTE_ID, TRANSACTION_AMT, ZIP_CODE and TRANSACTION_DT
-        extracted_info = dict( \
-            zip(INFO_HEADER, \
-                [entries[j] for j in [INPUT_HEADER[i] for i in INFO_HEADER]]))
-
-        # Validate extracted information
-        # Validate the format of CMTE_ID
-        if not extracted_info['CMTE_ID'][0] is 'C' or \
-            not extracted_info['CMTE_ID'][1:].isdigit() or \
-                len(extracted_info['CMTE_ID']) != 9:
-            continue
-
-        # Validate that the transaction amount
-        try:
-            extracted_info['TRANSACTION_AMT'] = \
-                float(extracted_info['TRANSACTION_AMT'])
-            # corner case: transaction amount = 0.0
-            if not extracted_info['TRANSACTION_AMT']:
-                continue
-        except ValueError:
-            continue
-
-        # Validate zip code
-        # Input file consideration rule 3, 4
-        # Based on FEC rules, zip code has to be 9 digits
-        if not extracted_info['ZIP_CODE'].isdigit() or \
-                len(extracted_info['ZIP_CODE']) != 9:
-            extracted_info['ZIP_CODE'] = None
-        else:
-            extracted_info['ZIP_CODE'] = extracted_info['ZIP_CODE'][0:5]
-
-        # Validate transaction date
-        if not validate_date(extracted_info['TRANSACTION_DT']):
-            extracted_info['TRANSACTION_DT'] = None
-
-        # If both zip code and transaction date information are missing:
-        # Skip the entry
-        if (not extracted_info['TRANSACTION_DT']) and \
-                (not extracted_info['ZIP_CODE']):
-            continue
-
-        yield extracted_info
-        # TODO: According to FEC Metadata Description:
-        # Col21 is required, Col7 specifies entity type (IND, etc.)
-        # These two criteria can also be taken into consideration
+        lines = ProgressReporter(os.fstat(file.fileno()).st_size).track(lines, file.tell)
+
+    try:
+        for line in lines:
+            if line in ['\n', ' ']:
+                break
+
+            extracted_info = parse_line(line)
+            if extracted_info:
+                yield extracted_info
+    finally:
+        # the progress reporter writes the final report
+        # before the file is closed
+        if hasattr(lines, 'close'):
+            lines.close()
+        file.close()
+
+
+def stream_input_range(filename, start=0, end=None):
+    """
+    Stream the lines starting in the byte range [start, end) of the input file
+    Yield valid data lines with the byte offset of the line
+
+    A range starting inside a line skips to the beginning of the next line,
+    so that ranges split anywhere cover each line exactly once.
+    As stream_input, the stream ends at the first empty line.
+
+    :param filename: string, path to the file
+    :param start: int, byte offset of the beginning of the range
+    :param end: int, byte offset of the end of the range, None for end of file
+
+    :return: (offset, extracted_info): tuple generator,
+        byte offset of the line and extracted information, 
+        extracted_info is None for the empty line ending the stream
+    """
+    encoding = locale.getpreferredencoding(False)
+    file = open(filename, 'rb')
+
+    try:
+        # Align the beginning of the range to the beginning of a line
+        if start > 0:
+            file.seek(start - 1)
+            file.readline()
+        offset = file.tell()
+
+        while end is None or offset < end:
+            line = file.readline()
+            if not line:
+                break
+
+            # bytes in Python 3, str in Python 2
+            if not isinstance(line, str):
+                line = line.decode(encoding)
+            line = line.replace('\r\n', '\n')
+            if line in ['\n', ' ']:
+                yield offset, None
+                break
+
+            extracted_info = parse_line(line)
+            if extracted_info:
+                yield offset, extracted_info
+            offset = file.tell()
+    finally:
+        # the stream may be left before the end of the range
+        file.close()
+
+
+def stream_input_mmap(filename):
+    """
+    Stream input file through a read-only memory map
+    Yield valid data lines
+
+    The lines are split on bytes, and only the five columns in INPUT_HEADER
+    are decoded, the other columns are never decoded.
+    The filter rules and the progress report are the same as stream_input.
 
+    :param filename: string, path to the file
+
+    :return: extracted_info: dictionary generator,
+        extracted information required for further processing
+    """
+    encoding = locale.getpreferredencoding(False)
+    file = open(filename, 'rb')
+    if not os.fstat(file.fileno()).st_size:
+        file.close()
+        return
+    mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
     file.close()
 
+    lines = iter(mm.readline, b'')
+    if ProgressBar.get_progress_bar():
+        lines = ProgressReporter(len(mm)).track(lines, mm.tell)
+
+    cmte_idx = INPUT_HEADER['CMTE_ID']
+    amount_idx = INPUT_HEADER['TRANSACTION_AMT']
+    zip_idx = INPUT_HEADER['ZIP_CODE']
+    date_idx = INPUT_HEADER['TRANSACTION_DT']
+    other_idx = INPUT_HEADER['OTHER_ID']
+
+    try:
+        for line in lines:
+            # As stream_input, the stream ends at the first empty line
+            if line in [b'\n', b'\r\n', b' ']:
+                break
+
+            entries = line.split(b'|')
+
+            # Integrity check
+            # Rules on empty columns are checked before decoding:
+            # Input file considerations rule 5, rule 1
+            if len(entries) != COLSIZE or entries[other_idx] or \
+                    (not entries[cmte_idx]) or (not entries[amount_idx]):
+                # the rejected line is parsed again to count the rule
+                if METRICS.get_enabled():
+                    parse_line(line.decode(encoding))
+                continue
+
+            extracted_info = extract_info(entries[cmte_idx].decode(encoding),
+                                          entries[amount_idx].decode(encoding),
+                                          entries[zip_idx].decode(encoding),
+                                          entries[date_idx].decode(encoding),
+                                          entries[other_idx].decode(encoding))
+            if extracted_info:
+                yield extracted_info
+    finally:
+        if hasattr(lines, 'close'):
+            lines.close()
+        mm.close()
+
+
+def stream_ids(filename):
+    """
+    Stream the CMTE_ID column of the input file, without validating the lines,
+    e.g. to find the recipients of the input before processing it
+
+    :param filename: string, path to the file
+    :return: string generator, CMTE_ID of each line
+    """
+    encoding = locale.getpreferredencoding(False)
+    with open(filename, 'rb') as file:
+        for line in file:
+            yield line.split(b'|', 1)[0].decode(encoding)
+
+
+def parse_line(line):
+    """
+    Extract and validate the information of one line of the input file
+
+    :param line: string, one record of the input file
+
+    :return: extracted_info: dictionary of CMTE_ID, TRANSACTION_AMT, 
+        ZIP_CODE and TRANSACTION_DT, None if the record is invalid
+    """
+    entries = line.split('|')
+
+    # Integrity check
+    if len(entries) != COLSIZE:
+        return _reject('columns')
+
+    return extract_info(entries[INPUT_HEADER['CMTE_ID']],
+                        entries[INPUT_HEADER['TRANSACTION_AMT']],
+                        entries[INPUT_HEADER['ZIP_CODE']],
+                        entries[INPUT_HEADER['TRANSACTION_DT']],
+                        entries[INPUT_HEADER['OTHER_ID']])
+
+
+def extract_info(cmte_id, amount, zipcode, date, other_id):
+    """
+    Validate the important fields of one record of the input file
+
+    :param cmte_id: string, CMTE_ID column
+    :param amount: string, TRANSACTION_AMT column
+    :param zipcode: string, ZIP_CODE column
+    :param date: string, TRANSACTION_DT column
+    :param other_id: string, OTHER_ID column
+
+    :return: extracted_info: dictionary of CMTE_ID, TRANSACTION_AMT (int, in cents), 
+        ZIP_CODE and TRANSACTION_DT, None if the record is invalid
+    """
+    # Input file considerations rule 5:
+    # Remove entries with empty CMTE_ID or TRANSACTION_AMT
+    if not cmte_id:
+        return _reject('cmte_id')
+    elif not amount:
+        return _reject('amount')
+    # Input file consideration rule 1:
+    # Remove entries with contributors from entities
+    elif other_id:
+        return _reject('other_id')
+
+    # Validate extracted information
+    # Validate the format of CMTE_ID
+    if cmte_id[0] != 'C' or not cmte_id[1:].isdigit() or len(cmte_id) != 9:
+        return _reject('cmte_id')
+
+    # Validate that the transaction amount
+    try:
+        amount = parse_cents(amount)
+        # corner case: transaction amount = 0.0
+        if not amount:
+            return _reject('amount')
+    except (ValueError, OverflowError):
+        return _reject('amount')
+
+    # Validate zip code
+    # Input file consideration rule 3, 4
+    # Based on FEC rules, zip code has to be 9 digits
+    if not zipcode.isdigit() or len(zipcode) != 9:
+        zipcode = None
+        if METRICS.get_enabled():
+            METRICS.count('invalid_zip')
+    else:
+        # few distinct zip codes and dates: the group keys of all the
+        # recipients share one string each
+        zipcode = _intern(zipcode[0:5])
+
+    # Validate transaction date
+    if not validate_date(date):
+        date = None
+        if METRICS.get_enabled():
+            METRICS.count('invalid_date')
+    else:
+        date = _intern(date)
+
+    # If both zip code and transaction date information are missing:
+    # Skip the entry
+    if (not date) and (not zipcode):
+        return _reject('zip_and_date')
+
+    # TODO: According to FEC Metadata Description:
+    # Col21 is required, Col7 specifies entity type (IND, etc.)
+    # These two criteria can also be taken into consideration
+
+    # Extract CMTE_ID, TRANSACTION_AMT, ZIP_CODE and TRANSACTION_DT
+    return {'CMTE_ID': cmte_id, 'TRANSACTION_AMT': amount,
+            'ZIP_CODE': zipcode, 'TRANSACTION_DT': date}
+
+
+def _reject(rule):
+    """
+    Count the rejected record if the metrics are enabled
+
+    :param rule: string, one of Metrics.REJECT_RULES
+    :return: None
+    """
+    if METRICS.get_enabled():
+        METRICS.count('reject_' + rule)
+    return None
+
+
+def parse_cents(amount):
+    """
+    Convert the transaction amount to integer cents, e.g. '250.5' to 25050
+    Whole dollar amounts, most of the FEC records, are converted without float,
+    other amounts are rounded to the cent
+
+    :param amount: string, TRANSACTION_AMT column
+    :return: int, amount in cents
+    :raise ValueError: if the string is not a number
+    """
+    try:
+        return int(amount) * 100
+    except ValueError:
+        return int(round(float(amount) * 100))
+
 
 def validate_date(date):
     """
     Validate if the date strain is a real date via built-in datetime.date type
+    Results are memoized in the shared DATE_CACHE
+
     :param date: string, FEC style date
     :return: boolean, return True if the date string can be converted to a real date
     """
-    if not isinstance(date, str) or len(date) != 8 or (not date.isdigit()):
+    if not isinstance(date, str):
         return False
 
-    try:
-        if datetime.date(*map(int, [date[-4:], date[0:2], date[2:4]])):
-            return True
-    except ValueError:
-        return
+    return DATE_CACHE.is_valid(date)
@@ -2,3 +2,16 @@ from .unittest_stream_input import *
 from .unittest_LinkedListNode import *
 from .unittest_InfoTable import *
 from .unittest_AVLTree import *
+from .unittest_OutputWriter import *
+from .unittest_MedianEngine import *
+from .unittest_DateCache import *
+from .unittest_parallel_ingest import *
+from .unittest_checkpoint import *
+from .unittest_Metrics import *
+from .unittest_ProgressReporter import *
+from .unittest_DonorQuery import *
+
+# The service mode requires asyncio (Python 3.5+)
+import sys as _sys
+if _sys.version_info >= (3, 5):
+    from .unittest_service import *
@@ -0,0 +1,84 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from src import *
+from src.find_political_donors import main
+
+
+def write_random_input(path, size, seed=2017, empty_line_at=None):
+    rng = random.Random(seed)
+    ids = ['C%08d' % i for i in range(7)] + ['C0038481']
+    zips = ['900170235', '300047357', '028956146', '90017', '']
+    dates = ['01032017', '01312017', '01122017', '02302017', '']
+    amounts = ['40', '384', '250.5', '0', '1000', '-20']
+    with open(path, 'w') as fileout:
+        for i in range(size):
+            if i == empty_line_at:
+                fileout.write('\n')
+            entries = [''] * 21
+            entries[0] = rng.choice(ids)
+            entries[10] = rng.choice(zips)
+            entries[13] = rng.choice(dates)
+            entries[14] = rng.choice(amounts)
+            entries[15] = rng.choice(['', '', '', 'H6CA34245'])
+            fileout.write('|'.join(entries) + '\n')
+
+
+class FolderTestCase(unittest.TestCase):
+    """
+    Test case with a temporary folder for the input file (self.input)
+    and the output files
+    """
+    ProgressBar.set_progress_bar(False)
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.input = self.path('itcont.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def read(self, name):
+        with open(self.path(name)) as filein:
+            return filein.read()
+
+    def run_sequential(self, input=None, name='ref.txt'):
+        """
+        Reference run on a single process, writes zip_<name> and date_<name>
+
+        :param input: string, path to the input file, None for self.input
+        :param name: string, suffix of the output files
+        :return: tuple (infoDB, infoAVLTree)
+        """
+        infoDB = dict()
+        infoAVLTree = AVLTreeByID()
+        zip_writer = ZipOutputWriter(self.path('zip_' + name))
+        process_records(stream_input(input or self.input), infoDB, infoAVLTree,
+                        zip_writer)
+        zip_writer.close()
+        atomic_write(self.path('date_' + name), infoAVLTree.output())
+        return infoDB, infoAVLTree
+
+    def run_main(self, options=(), input=None, name='main.txt'):
+        """
+        Run find_political_donors from its command line,
+        writes zip_<name> and date_<name>
+
+        :param options: list of strings, command line options
+        :param input: string, path to the input file, None for self.input
+        :param name: string, suffix of the output files
+        """
+        # the command line selects the backends of the whole process
+        engine = InfoByDomainBase.get_median_engine()
+        date_index = NodeByID.get_date_index()
+        try:
+            main([input or self.input, self.path('zip_' + name),
+                  self.path('date_' + name)] + list(options))
+        finally:
+            InfoByDomainBase.set_median_engine(engine)
+            NodeByID.set_date_index(date_index)
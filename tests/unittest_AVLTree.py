@@ -1,14 +1,23 @@
+import random
 import unittest
 from src.AVLTree import *
 from src import InfoByDate
 
 
 class TestAVLTree(unittest.TestCase):
+    def setUp(self):
+        # the tests check the nodes of the date trees
+        self.date_index = NodeByID.get_date_index()
+        NodeByID.set_date_index('tree')
+
+    def tearDown(self):
+        NodeByID.set_date_index(self.date_index)
+
     def test_nodeByDate_comparison(self):
         date1 = '01022017'
         date2 = '10312000'
         date3 = '02292016'
-        info = InfoByDate(40.0)
+        info = InfoByDate(4000)
         node1 = NodeByDate(date1, info)
         node2 = NodeByDate(date2, info)
         node3 = NodeByDate(date3, info)
@@ -21,7 +30,7 @@ class TestAVLTree(unittest.TestCase):
         id2 = 'C10629618'
         id3 = 'C00629618'
         date = '01022017'
-        info = InfoByDate(40.0)
+        info = InfoByDate(4000)
         node1 = NodeByID(id1, date, info)
         node2 = NodeByID(id2, date, info)
         node3 = NodeByID(id3, date, info)
@@ -31,18 +40,18 @@ class TestAVLTree(unittest.TestCase):
     def test_nodeByID_update_on_same_date(self):
         id = 'C00629618'
         date = '01022017'
-        amt = 40.0
-        info1 = InfoByDate(amt)  # 40, 1, 40.0
+        amt = 4000
+        info1 = InfoByDate(amt)  # 40, 1, 4000
         node1 = NodeByID(id, date, info1)
 
         res = node1.val.root.val
         self.assertIsInstance(res, InfoByDate)
         self.assertEqual(res.get_median(), 40)
         self.assertEqual(res.get_count(), 1)
-        self.assertAlmostEqual(res.get_total(), 40)
+        self.assertEqual(res.get_total(), 4000)
 
-        info2 = InfoByDate(60.5)  # 61, 1, 60.5
-        info2.update(amt)  # 50, 2, 100.5
+        info2 = InfoByDate(6050)  # 61, 1, 6050
+        info2.update(amt)  # 50, 2, 10050
         node2 = NodeByID(id, date, info2)
         node1.update_node(node2)
 
@@ -50,15 +59,15 @@ class TestAVLTree(unittest.TestCase):
         self.assertIsInstance(res, InfoByDate)
         self.assertEqual(res.get_median(), 50)
         self.assertEqual(res.get_count(), 2)
-        self.assertAlmostEqual(res.get_total(), 100.5)
+        self.assertEqual(res.get_total(), 10050)
 
     def test_nodeByID_update_on_different_date(self):
         id = 'C00629618'
         date1 = '01022017'
         date2 = '10312000'
-        info1 = InfoByDate(40.0)  # 40, 1, 40.0
+        info1 = InfoByDate(4000)  # 40, 1, 4000
         node1 = NodeByID(id, date1, info1)
-        info2 = InfoByDate(60.5)  # 61, 1, 60.5
+        info2 = InfoByDate(6050)  # 61, 1, 6050
         node2 = NodeByID(id, date2, info2)
         node1.update_node(node2)
 
@@ -66,16 +75,423 @@ class TestAVLTree(unittest.TestCase):
         self.assertIsInstance(res, NodeByDate)
         self.assertEqual(res.val.get_median(), 40)
         self.assertEqual(res.val.get_count(), 1)
-        self.assertAlmostEqual(res.val.get_total(), 40)
+        self.assertEqual(res.val.get_total(), 4000)
 
         # node2 - append as left child of node2
         self.assertIsInstance(res.left, NodeByDate)
         self.assertEqual(res.left.val.get_median(), 61)
         self.assertEqual(res.left.val.get_count(), 1)
-        self.assertAlmostEqual(res.left.val.get_total(), 60.5)
+        self.assertEqual(res.left.val.get_total(), 6050)
 
         self.assertIsNone(res.right)
 
-    # TODO: Test AVL tree implementation.
-    # The construct of tree has been tested with simple date type
-    # for eg. AVL tree with int as key and value
+    def test_compact_nodes(self):
+        info = InfoByDate(4000)
+        node = NodeByID('C00629618', '01022017', info)
+        for obj in [node, node.val, node.val.root, AVLTreeByID(node)]:
+            self.assertFalse(hasattr(obj, '__dict__'))
+
+    def check_balanced(self, node):
+        """
+        :return: height of the subtree, checking AVL invariant and heights
+        """
+        if not node:
+            return -1
+        left = self.check_balanced(node.left)
+        right = self.check_balanced(node.right)
+        self.assertLessEqual(abs(left - right), 1)
+        self.assertEqual(node.height, max(left, right) + 1)
+        return node.height
+
+    def test_tree_by_date_insertion(self):
+        rng = random.Random(2017)
+        dates = ['%02d%02d%d' % (m, d, y) for y in [2016, 2017]
+                 for m in range(1, 13) for d in range(1, 29)]
+        rng.shuffle(dates)
+        tree = AVLTreeByDate()
+        for date in dates + dates[:100]:
+            tree.insert(date, InfoByDate(4000))
+            self.check_balanced(tree.root)
+
+        keys = [entry[:8] for entry in tree.output_TreeByDate()]
+        self.assertEqual(len(dates), len(keys))
+        self.assertEqual(sorted(dates, key=lambda d: d[4:] + d[:4]), keys)
+
+    def test_tree_insertion_in_order(self):
+        # ascending and descending insertions trigger all the rotations
+        for ids in [range(1, 200), range(200, 1, -1), [5, 3, 4, 9, 7, 8]]:
+            tree = AVLTreeByID()
+            for i in ids:
+                tree.insert('C%08d' % i, '01022017', InfoByDate(4000))
+                self.check_balanced(tree.root)
+            keys = [int(entry[1:9]) for entry in tree.output()]
+            self.assertEqual(sorted(ids), keys)
+
+    def test_build(self):
+        for size in [0, 1, 2, 7, 100]:
+            tree = AVLTreeByID()
+            tree.build([NodeByID('C%08d' % i, '01022017', InfoByDate(4000))
+                        for i in range(size)])
+            self.check_balanced(tree.root)
+            self.assertEqual([int(entry[1:9]) for entry in tree.output()],
+                             list(range(size)))
+
+            # insertion after the build keeps the tree balanced
+            for i in range(size, 2 * size):
+                tree.insert('C%08d' % i, '01022017', InfoByDate(4000))
+                self.check_balanced(tree.root)
+
+    def test_find_range(self):
+        rng = random.Random(2017)
+        dates = ['%02d%02d2017' % (m, d) for m in range(1, 13) for d in range(1, 29, 3)]
+        rng.shuffle(dates)
+        tree = AVLTreeByDate()
+        for date in dates:
+            tree.insert(date, InfoByDate(4000))
+        keys = sorted(int(date[4:] + date[:4]) for date in dates)
+
+        for low, high in [(0, 99999999), (20170101, 20171231), (20170104, 20170104),
+                          (20170105, 20170105), (20170215, 20170610),
+                          (20170610, 20170215), (20171228, 20180101)]:
+            self.assertEqual([node.key_idx for node in tree.find_range(low, high)],
+                             [key for key in keys if low <= key <= high])
+        self.assertEqual(list(AVLTreeByDate().find_range(0, 99999999)), [])
+
+    def check_aggregates(self, node):
+        """
+        :return: tuple (count, total) of the subtree, checking the subtree information
+        """
+        if not node:
+            return 0, 0
+        left_count, left_total = self.check_aggregates(node.left)
+        right_count, right_total = self.check_aggregates(node.right)
+        count = left_count + right_count + node.val.get_count()
+        total = left_total + right_total + node.val.get_total()
+        self.assertEqual(node.subtree_count, count)
+        self.assertEqual(node.subtree_total, total)
+        return count, total
+
+    def test_aggregates(self):
+        rng = random.Random(2017)
+        dates = ['%02d%02d2017' % (m, d) for m in range(1, 13) for d in range(1, 29)]
+        infos = dict()
+        tree = AVLTreeByDate()
+        for _ in range(1000):
+            date = rng.choice(dates)
+            amount = rng.randrange(1, 50000)
+            if date in infos:
+                infos[date].update(amount)  # updated in place, as by InfoIndividual
+            else:
+                infos[date] = InfoByDate(amount)
+            tree.insert(date, infos[date])
+        self.check_balanced(tree.root)
+        self.check_aggregates(tree.root)
+        self.assertEqual(tree.get_count(), 1000)
+
+        keys = dict((int(date[4:] + date[:4]), info) for date, info in infos.items())
+        for _ in range(200):
+            low = int('2017%02d%02d' % (rng.randrange(1, 13), rng.randrange(0, 32)))
+            high = int('2017%02d%02d' % (rng.randrange(1, 13), rng.randrange(0, 32)))
+            count, total = tree.aggregate_range(low, high)
+            self.assertEqual(count, sum(info.get_count() for key, info in keys.items()
+                                        if low <= key <= high))
+            self.assertEqual(total, sum(info.get_total() for key, info in keys.items()
+                                        if low <= key <= high))
+        self.assertEqual(tree.aggregate_range(20180101, 20181231), (0, 0))
+        self.assertEqual(AVLTreeByDate().aggregate_range(0, 99999999), (0, 0))
+
+        # build and update_tree keep the subtree information
+        built = AVLTreeByDate()
+        built.build(sorted(NodeByDate(date, info) for date, info in infos.items()))
+        self.check_aggregates(built.root)
+        built.update_tree(NodeByDate('01012017', InfoByDate(4000)))
+        built.update_tree(NodeByDate('12312017', InfoByDate(6000)))
+        self.check_aggregates(built.root)
+
+    def test_insert_existing_keys(self):
+        tree = AVLTreeByID()
+        info1 = InfoByDate(4000)
+        info2 = InfoByDate(6050)
+        tree.insert('C00629618', '01022017', info1)
+        root = tree.root
+        date_root = root.val.root
+
+        # Same recipient and date: no new node
+        tree.insert('C00629618', '01022017', info2)
+        self.assertIs(tree.root, root)
+        self.assertIs(root.val.root, date_root)
+        self.assertIs(date_root.val, info2)
+
+        # Same recipient, new date
+        tree.insert('C00629618', '10312000', info1)
+        self.assertIs(tree.root, root)
+        self.assertIs(tree.find(629618), root)
+        self.assertIsNone(tree.find(1))
+        self.assertEqual(list(tree.output()), [
+            'C00629618|10312000|40|1|40\n', 'C00629618|01022017|61|1|60\n'])
+
+    def test_track_changes(self):
+        tree = AVLTreeByID()
+        self.assertFalse(tree.get_track_changes())
+        tree.insert('C00629618', '01022017', InfoByDate(4000))
+        self.assertEqual(list(tree.flush_changes()), [])
+
+        tree.set_track_changes(True)
+        info = InfoByDate(6050)
+        tree.insert('C00629618', '10312000', info)
+        tree.insert('C00177436', '01022017', InfoByDate(1000))
+        tree.insert('C00629618', '10312000', info)
+        self.assertTrue(tree.has_changes())
+        self.assertEqual(list(tree.output_changes()), [
+            'C00177436|01022017|10|1|10\n',
+            'C00629618|10312000|61|1|60\n'])
+
+        # the output reflects the latest information of the entries
+        info.update(10050)
+        self.assertEqual(list(tree.flush_changes()), [
+            'C00177436|01022017|10|1|10\n',
+            'C00629618|10312000|81|2|161\n'])
+        self.assertFalse(tree.has_changes())
+
+        tree.update_tree(NodeByID('C00629618', '01022017', InfoByDate(2000)))
+        self.assertEqual(list(tree.flush_changes()), ['C00629618|01022017|20|1|20\n'])
+
+        # e.g. the entries restored from a checkpoint
+        for index in [tree, SortedIndexByID(track_changes=True)]:
+            if index is not tree:
+                index.build(list(tree.nodes()))
+            index.mark_all_changed()
+            self.assertEqual(list(index.flush_changes()), list(tree.output()))
+
+    def test_update_tree(self):
+        tree = AVLTreeByID()
+        tree.update_tree(NodeByID('C00629618', '01022017', InfoByDate(4000)))
+        tree.update_tree(NodeByID('C00629618', '10312000', InfoByDate(6050)))
+        tree.update_tree(NodeByID('C00177436', '01022017', InfoByDate(1000)))
+        self.assertEqual(list(tree.output()), [
+            'C00177436|01022017|10|1|10\n',
+            'C00629618|10312000|61|1|60\n',
+            'C00629618|01022017|40|1|40\n'])
+
+
+class TestCalendarByDate(unittest.TestCase):
+    def random_dates(self, rng):
+        # two election cycles of dates, and dates out of the window
+        dates = ['%02d%02d%d' % (m, d, y) for y in [2016, 2017]
+                 for m in range(1, 13) for d in range(1, 29, 3)]
+        dates += ['10312000', '01012030', '06152019']
+        rng.shuffle(dates)
+        return dates
+
+    def fill(self, indexes, dates, rng):
+        infos = dict()
+        for _ in range(1000):
+            date = rng.choice(dates)
+            if date in infos:
+                infos[date].update(rng.randrange(1, 50000))
+            else:
+                infos[date] = InfoByDate(rng.randrange(1, 50000))
+            for index in indexes:
+                index.insert(date, infos[date])
+        return infos
+
+    def test_same_as_tree(self):
+        dates = self.random_dates(random.Random(2017))
+        calendar = CalendarByDate()
+        tree = AVLTreeByDate()
+        self.fill([calendar, tree], dates, random.Random(1))
+
+        self.assertEqual(list(calendar.output_TreeByDate()), list(tree.output_TreeByDate()))
+        self.assertEqual(calendar.get_count(), 1000)
+        self.assertEqual(calendar.get_total(), tree.get_total())
+        self.assertLessEqual(len(calendar._slots), CalendarByDate.WINDOW_DAYS)
+        # the dates out of the window are in the fallback tree
+        self.assertTrue(calendar._fallback.get_count())
+
+        rng = random.Random(7)
+        for _ in range(200):
+            # including bounds which are not real dates
+            low = int('%d%02d%02d' % (rng.choice([2000, 2016, 2017, 2019]),
+                                      rng.randrange(1, 13), rng.randrange(0, 32)))
+            high = int('%d%02d%02d' % (rng.choice([2016, 2017, 2030]),
+                                       rng.randrange(1, 13), rng.randrange(0, 32)))
+            self.assertEqual(list(calendar.get_range(low, high)),
+                             list(tree.get_range(low, high)))
+            self.assertEqual(calendar.aggregate_range(low, high),
+                             tree.aggregate_range(low, high))
+
+        for date in dates + ['02292017', '01022017']:
+            key_idx = int(date[4:] + date[:4])
+            self.assertIs(calendar.get(key_idx), tree.get(key_idx))
+
+    def test_aggregates_between_insertions(self):
+        # the range sums are updated by the insertions after the first request,
+        # and built again when the slots grow
+        dates = self.random_dates(random.Random(5))
+        calendar = CalendarByDate()
+        tree = AVLTreeByDate()
+        rng = random.Random(11)
+        infos = dict()
+        for i in range(600):
+            date = rng.choice(dates)
+            if date in infos:
+                infos[date].update(rng.randrange(1, 50000))
+            else:
+                infos[date] = InfoByDate(rng.randrange(1, 50000))
+            calendar.insert(date, infos[date])
+            tree.insert(date, infos[date])
+
+            if i % 7 == 0:
+                low = int('%d%02d%02d' % (rng.choice([2015, 2016, 2017]),
+                                          rng.randrange(1, 13), rng.randrange(0, 32)))
+                high = int('%d%02d%02d' % (rng.choice([2016, 2017, 2018]),
+                                           rng.randrange(1, 13), rng.randrange(0, 32)))
+                self.assertEqual(calendar.aggregate_range(low, high),
+                                 tree.aggregate_range(low, high))
+                self.assertEqual((calendar.get_count(), calendar.get_total()),
+                                 (tree.get_count(), tree.get_total()))
+
+    def test_window(self):
+        small = type('SmallCalendar', (CalendarByDate,), {
+            '__slots__': (), 'WINDOW_DAYS': 10})
+        calendar = small()
+        for date in ['01102017', '01152017', '01062017', '01192017', '01012017',
+                     '01052017', '01202017', '01102017']:
+            calendar.insert(date, InfoByDate(4000))
+        # 01062017 to 01152017 in the slots
+        self.assertEqual(len(calendar._slots), 10)
+        self.assertEqual([date for date, _ in calendar._fallback.get_range()],
+                         ['01012017', '01052017', '01192017', '01202017'])
+        self.assertEqual([date for date, _ in calendar.get_range()],
+                         ['01012017', '01052017', '01062017', '01102017',
+                          '01152017', '01192017', '01202017'])
+        self.assertEqual(calendar.aggregate_range(20170105, 20170115), (4, 16000))
+        self.assertIsNone(calendar.get(20170107))
+
+    def test_empty(self):
+        calendar = CalendarByDate()
+        self.assertEqual(list(calendar.get_range()), [])
+        self.assertEqual(calendar.aggregate_range(0, 99999999), (0, 0))
+        self.assertIsNone(calendar.get(20170102))
+        calendar.build([])
+        self.assertEqual(list(calendar.output_TreeByDate()), [])
+
+    def test_build(self):
+        dates = self.random_dates(random.Random(3))
+        infos = self.fill([CalendarByDate()], dates, random.Random(3))
+        nodes = sorted(NodeByDate(date, info) for date, info in infos.items())
+        calendar = CalendarByDate()
+        calendar.build(nodes)
+        tree = AVLTreeByDate()
+        tree.build(nodes)
+        self.assertEqual(list(calendar.get_range()), list(tree.get_range()))
+
+    def test_recipients(self):
+        # the recipients give the same output with both date indexes
+        date_index = NodeByID.get_date_index()
+        outputs = []
+        try:
+            for name in sorted(DATE_INDEXES):
+                NodeByID.set_date_index(name)
+                tree = AVLTreeByID(track_changes=True)
+                info = InfoByDate(6050)
+                tree.insert('C00629618', '01022017', InfoByDate(4000))
+                tree.insert('C00629618', '10312000', info)
+                tree.insert('C00177436', '01022017', InfoByDate(1000))
+                info.update(10050)
+                tree.update_tree(NodeByID('C00629618', '01032017', InfoByDate(2000)))
+                tree.update_tree(NodeByID('C00177436', '01022017', InfoByDate(2000)))
+                self.assertIsInstance(tree.find(629618).val, DATE_INDEXES[name])
+                outputs.append((list(tree.output()), list(tree.flush_changes())))
+        finally:
+            NodeByID.set_date_index(date_index)
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0][0], [
+            'C00177436|01022017|20|1|20\n',
+            'C00629618|10312000|81|2|161\n',
+            'C00629618|01022017|40|1|40\n',
+            'C00629618|01032017|20|1|20\n'])
+        self.assertRaises(ValueError, NodeByID.set_date_index, 'unknown')
+
+    def test_compact(self):
+        calendar = CalendarByDate()
+        calendar.insert('01022017', InfoByDate(4000))
+        self.assertFalse(hasattr(calendar, '__dict__'))
+
+
+class TestSortedIndexByID(unittest.TestCase):
+    def random_records(self, rng):
+        ids = ['C%08d' % rng.randrange(1, 100000) for _ in range(60)]
+        dates = ['%02d%02d2017' % (rng.randrange(1, 13), rng.randrange(1, 29))
+                 for _ in range(40)]
+        return [(rng.choice(ids), rng.choice(dates), rng.randrange(1, 50000))
+                for _ in range(1000)]
+
+    def fill(self, indexes, records):
+        infos = dict()
+        for id, date, amount in records:
+            if (id, date) in infos:
+                infos[(id, date)].update(amount)
+            else:
+                infos[(id, date)] = InfoByDate(amount)
+            for index in indexes:
+                index.insert(id, date, infos[(id, date)])
+        return infos
+
+    def test_same_as_tree(self):
+        records = self.random_records(random.Random(2017))
+        index = SortedIndexByID(track_changes=True)
+        tree = AVLTreeByID(track_changes=True)
+        self.fill([index, tree], records)
+
+        self.assertEqual(list(index.output()), list(tree.output()))
+        self.assertEqual(list(index.flush_changes()), list(tree.flush_changes()))
+        self.assertFalse(index.has_changes())
+        self.assertEqual(index._keys, sorted(index._nodes))
+        self.assertEqual(len(index), len(index._nodes))
+        for id, _, _ in records:
+            self.assertEqual(index.find(int(id[1:])).key, id)
+        self.assertIsNone(index.find(0))
+
+        # new recipients and dates of existing recipients
+        for id, date, amount in [('C00000001', '01022017', 1000),
+                                 (records[0][0], '10312000', 2000),
+                                 ('C99999999', '01022017', 3000)]:
+            info = InfoByDate(amount)
+            tree.update_tree(NodeByID(id, date, info))
+            index.update_tree(NodeByID(id, date, info))
+        self.assertEqual(list(index.output()), list(tree.output()))
+        self.assertEqual(list(index.output_changes()), list(tree.output_changes()))
+        self.assertEqual(len(list(index.output_changes())), 3)
+
+    def test_build(self):
+        infos = self.fill([], self.random_records(random.Random(3)))
+        ids = dict()
+        for (id, date), info in infos.items():
+            ids.setdefault(id, []).append(NodeByDate(date, info))
+        nodes = []
+        for id, date_nodes in ids.items():
+            date_nodes.sort()
+            node = NodeByID(id, date_nodes[0].key, date_nodes[0].val)
+            node.val.build(date_nodes)
+            nodes.append(node)
+        nodes.sort()
+
+        index = SortedIndexByID()
+        index.build(nodes)
+        tree = AVLTreeByID()
+        tree.build(nodes)
+        self.assertEqual(list(index.output()), list(tree.output()))
+        self.assertIs(index.find(nodes[5].key_idx), nodes[5])
+
+        # inserting after the build keeps the order
+        index.insert('C00000001', '01022017', InfoByDate(1000))
+        self.assertEqual(next(index.output()), 'C00000001|01022017|10|1|10\n')
+        self.assertEqual(index._keys, sorted(index._nodes))
+
+    def test_compact(self):
+        index = SortedIndexByID()
+        index.insert('C00629618', '01022017', InfoByDate(4000))
+        self.assertFalse(hasattr(index, '__dict__'))
+        self.assertEqual(sorted(ID_INDEXES), ['sorted', 'tree'])
@@ -0,0 +1,65 @@
+import unittest
+from src.DateCache import *
+from src import validate_date, NodeByDate, InfoByDate
+
+
+class TestDateCache(unittest.TestCase):
+    def test_lookup(self):
+        cache = DateCache()
+        self.assertEqual(cache.lookup('01032017'), (True, 20170103))
+        self.assertEqual(cache.lookup('02292016'), (True, 20160229))
+        # Invalid date, still ordered
+        self.assertEqual(cache.lookup('02312017'), (False, 20170231))
+        # Not 8 digits
+        self.assertEqual(cache.lookup('2017'), (False, None))
+        self.assertEqual(cache.lookup('0103201A'), (False, None))
+        self.assertEqual(cache.lookup('01010000'), (False, 101))
+
+        self.assertTrue(cache.is_valid('01032017'))
+        self.assertFalse(cache.is_valid('02312017'))
+        self.assertEqual(cache.get_key_idx('10312000'), 20001031)
+        self.assertRaises(ValueError, cache.get_key_idx, '2017')
+
+    def test_counters(self):
+        cache = DateCache()
+        for _ in range(3):
+            cache.is_valid('01032017')
+        cache.get_key_idx('01032017')
+        cache.is_valid('01312017')
+
+        self.assertEqual(cache.get_hits(), 3)
+        self.assertEqual(cache.get_misses(), 2)
+        self.assertEqual(len(cache), 2)
+
+        cache.clear()
+        self.assertEqual(cache.get_hits(), 0)
+        self.assertEqual(cache.get_misses(), 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_bounded_size(self):
+        cache = DateCache(maxsize=2)
+        for date in ['01012017', '01022017', '01032017']:
+            cache.lookup(date)
+        self.assertLessEqual(len(cache), 2)
+        self.assertTrue(cache.is_valid('01012017'))
+
+    def test_day_numbers(self):
+        cache = DateCache(maxsize=2)
+        first = cache.get_day_number(20170101)
+        self.assertEqual(cache.get_day_number(20170301) - first, 59)
+        self.assertIsNone(cache.get_day_number(20170230))
+        self.assertEqual(cache.get_first_day_number(20170230), first + 59)
+        self.assertEqual(cache.get_first_day_number(20171232), first + 365)
+        # days evicted from the bounded maps are recomputed
+        cache.get_day_number(20170102)
+        self.assertEqual(cache.get_day_date(first), ('01012017', 20170101))
+        self.assertEqual(cache.get_day_date(first + 59), ('03012017', 20170301))
+
+    def test_shared_cache(self):
+        DATE_CACHE.clear()
+        self.assertTrue(validate_date('01032017'))
+        self.assertFalse(validate_date(None))
+        node = NodeByDate('01032017', InfoByDate(4000))
+        self.assertEqual(node.key_idx, 20170103)
+        self.assertEqual(DATE_CACHE.get_misses(), 1)
+        self.assertEqual(DATE_CACHE.get_hits(), 1)
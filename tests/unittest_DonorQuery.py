@@ -0,0 +1,111 @@
+import io
+import sys
+from src import *
+from src.DonorQuery import main
+from .fixtures import FolderTestCase, write_random_input
+
+
+class TestDonorQuery(FolderTestCase):
+
+    def setUp(self):
+        super(TestDonorQuery, self).setUp()
+        write_random_input(self.input, 500)
+        self.infoDB, self.infoAVLTree = self.run_sequential()
+        self.query = DonorQuery(self.infoDB, self.infoAVLTree)
+
+    def test_point_lookups(self):
+        # the last entry of each recipient/zip code in medianvals_by_zip
+        last = dict()
+        with open(self.path('zip_ref.txt')) as filein:
+            for line in filein:
+                id, zipcode = line.split('|')[:2]
+                last[(id, zipcode)] = line
+        for (id, zipcode), line in last.items():
+            self.assertEqual(self.query.output_by_zip(id, zipcode), line)
+            self.assertEqual(self.query.get_by_zip(id, zipcode),
+                             self.infoDB[id].get_zip_dict_entry(zipcode))
+
+        for line in self.infoAVLTree.output():
+            id, date = line.split('|')[:2]
+            self.assertEqual(self.query.output_by_date(id, date), line)
+            self.assertIs(self.query.get_by_date(id, date),
+                          self.infoDB[id].get_date_dict_entry(date))
+
+        self.assertIsNone(self.query.get_by_zip('C99999999', '90017'))
+        self.assertIsNone(self.query.get_by_date('C00000000', '12312099'))
+        self.assertEqual(self.query.output_by_zip('C99999999', '90017'), '')
+        self.assertEqual(self.query.output_by_date('C00000000', '12312099'), '')
+
+    def test_date_range(self):
+        output = list(self.infoAVLTree.output())
+        for id in self.infoDB:
+            entries = [line for line in output if line.startswith(id + '|')]
+            self.assertEqual(list(self.query.output_date_range(id)), entries)
+            self.assertEqual(list(self.query.output_date_range(id, '01042017', '01312017')),
+                             [line for line in entries if line.split('|')[1] in
+                              ['01122017', '01312017']])
+            # 02302017 is not a valid date
+            self.assertEqual(list(self.query.output_date_range(id, '02012017')), [])
+        self.assertEqual(list(self.query.get_date_range('C99999999')), [])
+
+    def test_date_range_summary(self):
+        for id, info in self.infoDB.items():
+            dates = [date for date in info.get_date_dict()
+                     if DATE_CACHE.get_key_idx(date) <= 20170131]
+            summary = self.query.get_date_range_summary(id, None, '01312017')
+            if not dates:
+                self.assertIsNone(summary)
+                continue
+
+            values = sorted(value for date in dates
+                            for value in info.get_date_dict_entry(date).get_values())
+            reference = InfoByDate(values[0])
+            for value in values[1:]:
+                reference.update(value)
+            self.assertEqual(summary.get_values(), values)
+            self.assertEqual(summary.output(), reference.output())
+            self.assertEqual(self.query.output_date_range_summary(id, None, '01312017'),
+                             id + '||01312017|' + reference.output())
+
+        self.assertIsNone(self.query.get_date_range_summary('C99999999'))
+        self.assertEqual(self.query.output_date_range_summary('C99999999'), '')
+
+    def test_date_range_totals(self):
+        for id in self.infoDB:
+            for start, end in [(None, None), ('01042017', '01312017'), (None, '01122017'),
+                               ('01132017', None), ('02012017', None)]:
+                summary = self.query.get_date_range_summary(id, start, end)
+                count, total = self.query.get_date_range_totals(id, start, end)
+                if summary is None:
+                    self.assertEqual((count, total), (0, 0))
+                    continue
+                self.assertEqual(count, summary.get_count())
+                self.assertEqual(total, summary.get_total())
+        self.assertEqual(self.query.get_date_range_totals('C99999999'), (0, 0))
+        self.assertEqual(self.query.output_date_range_totals('C99999999', '01012017'),
+                         'C99999999|01012017||0|0\n')
+
+    def test_from_checkpoint(self):
+        save_checkpoint(self.path('state.ckpt'), self.infoDB, 0)
+        # or a state folder
+        save_state(self.path('state'), self.infoDB)
+        for path in [self.path('state.ckpt'), self.path('state')]:
+            query = DonorQuery.from_checkpoint(path)
+            for id in self.infoDB:
+                self.assertEqual(list(query.output_date_range(id)),
+                                 list(self.query.output_date_range(id)))
+                self.assertEqual(query.output_date_range_summary(id),
+                                 self.query.output_date_range_summary(id))
+
+    def test_main_invalid_date(self):
+        checkpoint = self.path('state.ckpt')
+        save_checkpoint(checkpoint, self.infoDB, 0)
+        stderr = sys.stderr
+        for option in ['--from', '--to']:
+            sys.stderr = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+            try:
+                with self.assertRaises(SystemExit):
+                    main([checkpoint, 'C00000001', option, '13012017'])
+                self.assertIn(option + ' must be a transaction date', sys.stderr.getvalue())
+            finally:
+                sys.stderr = stderr
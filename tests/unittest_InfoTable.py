@@ -1,105 +1,149 @@
+import random
 import unittest
+from decimal import Decimal, ROUND_HALF_UP
 from src import LinkedListNode
 from src.InfoTable import *
 
 
 class TestInfoByDomainBase(unittest.TestCase):
     def test_contructor(self):
-        info = InfoByDomainBase(4.7)
+        info = InfoByDomainBase(470)
 
         self.assertEqual(info.get_median(), 5)  # round-up
         self.assertEqual(info.get_count(), 1)
-        self.assertAlmostEqual(info.get_total(), 4.7)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 4.7)
+        self.assertEqual(info.get_total(), 470)
+        self.assertEqual(info.get_median_left().get_value(), 470)
         self.assertIs(info.get_median_left(), info.get_median_right())
 
     def test_update_from_empty_info(self):
         info = InfoByDomainBase(None)
-        info.update(4.7)
+        info.update(470)
 
         self.assertEqual(info.get_median(), 5)  # round-up
         self.assertEqual(info.get_count(), 1)
-        self.assertAlmostEqual(info.get_total(), 4.7)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 4.7)
+        self.assertEqual(info.get_total(), 470)
+        self.assertEqual(info.get_median_left().get_value(), 470)
         self.assertIs(info.get_median_left(), info.get_median_right())
 
     def test_update(self):
-        info = InfoByDomainBase(10)
+        info = InfoByDomainBase(1000)
 
         # Amount <= current median and amount <= median.left,
         # and median_left is median_right
-        info.update(5)
+        info.update(500)
         self.assertEqual(info.get_median(), 8)
         self.assertEqual(info.get_count(), 2)
-        self.assertAlmostEqual(info.get_total(), 15)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 5)
-        self.assertAlmostEqual(info.get_median_right().get_value(), 10)
+        self.assertEqual(info.get_total(), 1500)
+        self.assertEqual(info.get_median_left().get_value(), 500)
+        self.assertEqual(info.get_median_right().get_value(), 1000)
 
         # Amount > current median, and amount > median_right
         # and median_left is not median_right
-        info.update(30)
+        info.update(3000)
         self.assertEqual(info.get_median(), 10)
         self.assertEqual(info.get_count(), 3)
-        self.assertAlmostEqual(info.get_total(), 45)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 10)
-        self.assertAlmostEqual(info.get_median_right().get_value(), 10)
+        self.assertEqual(info.get_total(), 4500)
+        self.assertEqual(info.get_median_left().get_value(), 1000)
+        self.assertEqual(info.get_median_right().get_value(), 1000)
 
         # Amount > current median, and amount > median_right
         # and median_left is median_right
-        info.update(40)
+        info.update(4000)
         self.assertEqual(info.get_median(), 20)
         self.assertEqual(info.get_count(), 4)
-        self.assertAlmostEqual(info.get_total(), 85)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 10)
-        self.assertAlmostEqual(info.get_median_right().get_value(), 30)
+        self.assertEqual(info.get_total(), 8500)
+        self.assertEqual(info.get_median_left().get_value(), 1000)
+        self.assertEqual(info.get_median_right().get_value(), 3000)
 
         # Amount > current median, but amount <= median_right
         # and median_left is not median_right
-        info.update(25)
+        info.update(2500)
         self.assertEqual(info.get_median(), 25)  # round-up
         self.assertEqual(info.get_count(), 5)
-        self.assertAlmostEqual(info.get_total(), 110)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 25)
-        self.assertAlmostEqual(info.get_median_right().get_value(), 25)
+        self.assertEqual(info.get_total(), 11000)
+        self.assertEqual(info.get_median_left().get_value(), 2500)
+        self.assertEqual(info.get_median_right().get_value(), 2500)
 
         # Amount <= current median, but amount > median_left
         # and median_left is not median_right
-        info.update(10)
-        info.update(17)
+        info.update(1000)
+        info.update(1700)
         self.assertEqual(info.get_median(), 17)  # round-up
         self.assertEqual(info.get_count(), 7)
-        self.assertAlmostEqual(info.get_total(), 137)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 17)
-        self.assertAlmostEqual(info.get_median_right().get_value(), 17)
+        self.assertEqual(info.get_total(), 13700)
+        self.assertEqual(info.get_median_left().get_value(), 1700)
+        self.assertEqual(info.get_median_right().get_value(), 1700)
 
         # Amount <= current median, and amount <= median_left
         # and median_left is not median_right
-        info.update(1)
-        info.update(2)
+        info.update(100)
+        info.update(200)
         self.assertEqual(info.get_median(), 10)  # round-up
         self.assertEqual(info.get_count(), 9)
-        self.assertAlmostEqual(info.get_total(), 140)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 10)
-        self.assertAlmostEqual(info.get_median_right().get_value(), 10)
+        self.assertEqual(info.get_total(), 14000)
+        self.assertEqual(info.get_median_left().get_value(), 1000)
+        self.assertEqual(info.get_median_right().get_value(), 1000)
 
     def test_update_floats(self):
-        nodes = [1, 3.3, 2, 4.5, 1.8, 6]
+        nodes = [100, 330, 200, 450, 180, 600]
         info = InfoByDomainBase(nodes[0])
         for i in range(1, 6):
             info.update(nodes[i])
 
         self.assertEqual(info.get_median(), 3)  # round-up
         self.assertEqual(info.get_count(), 6)
-        self.assertAlmostEqual(info.get_total(), 18.6)
-        self.assertAlmostEqual(info.get_median_left().get_value(), 2)
-        self.assertAlmostEqual(info.get_median_right().get_value(), 3.3)
+        self.assertEqual(info.get_total(), 1860)
+        self.assertEqual(info.get_median_left().get_value(), 200)
+        self.assertEqual(info.get_median_right().get_value(), 330)
+
+    def test_compact_info(self):
+        for cls in [InfoByDomainBase, InfoByZip, InfoByDate]:
+            for engine in MEDIAN_ENGINES:
+                info = cls(470, engine)
+                self.assertFalse(hasattr(info, '__dict__'))
+                self.assertFalse(hasattr(info._engine, '__dict__'))
+
+    def test_lazy_median(self):
+        info = InfoByDomainBase(470)
+        info.update(1020)
+        self.assertIsNone(info._median)
+        self.assertEqual(info.output(), '7|2|15\n')
+        self.assertEqual(info._median, 7)
+
+    def test_round_half_up_mean(self):
+        # equivalence with the Decimal rounding on random amounts in cents
+        rng = random.Random(2017)
+        for _ in range(20000):
+            left = rng.choice([rng.randrange(-1000, 100000),
+                               rng.randrange(-100000, 10000000),
+                               rng.randrange(-10 ** 12, 10 ** 12)])
+            right = rng.choice([left, rng.randrange(100000) * 100 + 50,
+                                rng.randrange(-100000, 10000000)])
+            expected = int((Decimal(left + right) / 200).quantize(0, ROUND_HALF_UP))
+            self.assertEqual(round_half_up_mean(left, right), expected)
+
+        for left, right, expected in [(200, 300, 3), (-200, -300, -3), (50, 50, 1),
+                                      (-50, -50, -1), (30, 70, 1), (150, 140, 1)]:
+            self.assertEqual(round_half_up_mean(left, right), expected)
+
+    def test_round_half_even_cents(self):
+        # same as round() of the amount in dollars
+        rng = random.Random(2017)
+        for _ in range(20000):
+            amount = rng.choice([rng.randrange(-100000, 100000),
+                                 rng.randrange(-100000, 100000) * 100 + 50])
+            self.assertEqual(round_half_even_cents(amount), round(amount / 100.0))
+
+        for amount, expected in [(50, 0), (150, 2), (250, 2), (-150, -2), (-250, -2),
+                                 (149, 1), (151, 2), (-151, -2), (0, 0)]:
+            self.assertEqual(round_half_even_cents(amount), expected)
 
 
 class TestInfoIndividual(unittest.TestCase):
     def test_contructor(self):
         zip = '90017'
         date = '01032017'
-        record = {'CMTE_ID': 'C00629618', 'TRANSACTION_AMT': 40.0,
+        record = {'CMTE_ID': 'C00629618', 'TRANSACTION_AMT': 4000,
                'ZIP_CODE': zip, 'TRANSACTION_DT': date}
         id = InfoIndividual(record)
 
@@ -114,8 +158,8 @@ class TestInfoIndividual(unittest.TestCase):
     def test_same_zip_update(self):
         id = 'C00629618'
         zip = '90017'
-        amt1 = 40.0
-        amt2 = 60.5
+        amt1 = 4000
+        amt2 = 6050
         record1 = {'CMTE_ID': id, 'TRANSACTION_AMT': amt1, 'ZIP_CODE': zip}
         record2 = {'CMTE_ID': id, 'TRANSACTION_AMT': amt2, 'ZIP_CODE': zip}
 
@@ -125,14 +169,14 @@ class TestInfoIndividual(unittest.TestCase):
 
         self.assertEqual(info_zip.get_median(), 50)
         self.assertEqual(info_zip.get_count(), 2)
-        self.assertAlmostEqual(info_zip.get_total(), 100.5)
+        self.assertEqual(info_zip.get_total(), 10050)
 
     def test_different_zip_update(self):
         id = 'C00629618'
         zip1 = '90017'
         zip2 = '10021'
-        amt1 = 40.0
-        amt2 = 60.5
+        amt1 = 4000
+        amt2 = 6050
         record1 = {'CMTE_ID': id, 'TRANSACTION_AMT': amt1, 'ZIP_CODE': zip1}
         record2 = {'CMTE_ID': id, 'TRANSACTION_AMT': amt2, 'ZIP_CODE': zip2}
 
@@ -143,17 +187,17 @@ class TestInfoIndividual(unittest.TestCase):
 
         self.assertEqual(info_zip1.get_median(), 40)
         self.assertEqual(info_zip1.get_count(), 1)
-        self.assertAlmostEqual(info_zip1.get_total(), 40)
+        self.assertEqual(info_zip1.get_total(), 4000)
 
         self.assertEqual(info_zip2.get_median(), 61)
         self.assertEqual(info_zip2.get_count(), 1)
-        self.assertAlmostEqual(info_zip2.get_total(), 60.5)
+        self.assertEqual(info_zip2.get_total(), 6050)
 
     def test_same_date_update(self):
         id = 'C00629618'
         date = '01022017'
-        amt1 = 40.0
-        amt2 = 60.5
+        amt1 = 4000
+        amt2 = 6050
         record1 = {'CMTE_ID': id, 'TRANSACTION_AMT': amt1, 'ZIP_CODE': None,
                    'TRANSACTION_DT': date}
         record2 = {'CMTE_ID': id, 'TRANSACTION_AMT': amt2, 'ZIP_CODE': None,
@@ -165,14 +209,14 @@ class TestInfoIndividual(unittest.TestCase):
 
         self.assertEqual(info_date.get_median(), 50)
         self.assertEqual(info_date.get_count(), 2)
-        self.assertAlmostEqual(info_date.get_total(), 100.5)
+        self.assertEqual(info_date.get_total(), 10050)
 
     def test_different_date_update(self):
         id = 'C00629618'
         date1 = '01022017'
         date2 = '10212000'
-        amt1 = 40.0
-        amt2 = 60.5
+        amt1 = 4000
+        amt2 = 6050
         record1 = {'CMTE_ID': id, 'TRANSACTION_AMT': amt1, 'ZIP_CODE': None,
                    'TRANSACTION_DT': date1}
         record2 = {'CMTE_ID': id, 'TRANSACTION_AMT': amt2, 'ZIP_CODE': None,
@@ -185,8 +229,8 @@ class TestInfoIndividual(unittest.TestCase):
 
         self.assertEqual(info_date1.get_median(), 40)
         self.assertEqual(info_date1.get_count(), 1)
-        self.assertAlmostEqual(info_date1.get_total(), 40)
+        self.assertEqual(info_date1.get_total(), 4000)
 
         self.assertEqual(info_date2.get_median(), 61)
         self.assertEqual(info_date2.get_count(), 1)
-        self.assertAlmostEqual(info_date2.get_total(), 60.5)
+        self.assertEqual(info_date2.get_total(), 6050)
@@ -37,3 +37,7 @@ class TestLinkedListNode(unittest.TestCase):
         self.assertIs(new_node.right, node[5])
         self.assertIs(node[5].left, new_node)
         self.assertIs(node[4].right, new_node)
+
+    def test_compact_node(self):
+        # One node is kept per donation: no per-instance __dict__
+        self.assertFalse(hasattr(LinkedListNode(5), '__dict__'))
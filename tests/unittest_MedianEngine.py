@@ -0,0 +1,142 @@
+import random
+import unittest
+from src.MedianEngine import *
+from src.InfoTable import *
+
+
+class TestMedianEngine(unittest.TestCase):
+    def check_engine(self, engine_class, amounts):
+        engine = engine_class()
+        self.assertIsNone(engine.get_median_values())
+
+        inserted = []
+        for amount in amounts:
+            engine.insert(amount)
+            inserted.append(amount)
+            inserted.sort()
+            ref = (inserted[(len(inserted) - 1) // 2], inserted[len(inserted) // 2])
+            self.assertEqual(ref, engine.get_median_values())
+
+    def test_engines(self):
+        rng = random.Random(2017)
+        samples = [
+            [1000, 500, 3000, 4000, 2500, 1000, 1700, 100, 200],
+            [100, 330, 200, 450, 180, 600],
+            [1040, 1020, 1030, 1010],  # neighbouring amounts
+            [rng.choice([2500, 5000, 10000, 25000, 270000]) for _ in range(200)],
+            [rng.randrange(-10000, 300000) for _ in range(200)],
+        ]
+        for engine_class in MEDIAN_ENGINES.values():
+            for amounts in samples:
+                self.check_engine(engine_class, amounts)
+
+    def test_array_blocks(self):
+        # Small blocks, to check the split of blocks and the move of median block
+        rng = random.Random(7)
+        engine_class = type('SmallBlockMedian', (SortedArrayMedian,), {
+            '__slots__': (), 'BLOCK_SIZE': 2})
+        self.check_engine(engine_class, [rng.randrange(50) for _ in range(300)])
+        self.check_engine(engine_class, list(range(100)))
+        self.check_engine(engine_class, list(range(100, 0, -1)))
+
+    def test_multiset_counts(self):
+        rng = random.Random(11)
+        amounts = [rng.choice([2500, 5000, 10000, 25000, 270000]) for _ in range(500)]
+        self.check_engine(CountedMultisetMedian, amounts)
+        self.check_engine(CountedMultisetMedian, list(range(100)) + list(range(100)))
+        self.check_engine(CountedMultisetMedian, list(range(100, 0, -1)) * 2)
+
+        # one entry per distinct amount
+        engine = CountedMultisetMedian.from_sorted(sorted(amounts))
+        self.assertEqual(list(engine._amounts), [2500, 5000, 10000, 25000, 270000])
+        self.assertEqual(sum(engine._counts), 500)
+        self.assertEqual(engine.get_values(), sorted(amounts))
+
+    def test_from_sorted(self):
+        rng = random.Random(13)
+        small_blocks = type('SmallBlockMedian', (SortedArrayMedian,), {
+            '__slots__': (), 'BLOCK_SIZE': 2})
+        for engine_class in list(MEDIAN_ENGINES.values()) + [small_blocks]:
+            for size in [0, 1, 2, 5, 6, 40]:
+                values = sorted(rng.randrange(1, 30) for _ in range(size))
+                engine = engine_class.from_sorted(values)
+                self.assertEqual(engine.get_values(), values)
+                if values:
+                    self.assertEqual(engine.get_median_values(),
+                                     (values[(size - 1) // 2], values[size // 2]))
+
+                # inserting after the restore keeps the medians exact
+                for amount in [rng.randrange(1, 30) for _ in range(7)]:
+                    engine.insert(amount)
+                    values = sorted(values + [amount])
+                    self.assertEqual(engine.get_median_values(),
+                                     (values[(len(values) - 1) // 2],
+                                      values[len(values) // 2]))
+                self.assertEqual(engine.get_values(), values)
+
+    def test_from_counted(self):
+        rng = random.Random(17)
+        for engine_class in MEDIAN_ENGINES.values():
+            for size in [0, 1, 2, 5, 40]:
+                values = sorted(rng.randrange(1, 8) for _ in range(size))
+                amounts, counts = engine_class.from_sorted(values).get_counted_values()
+                self.assertEqual(list(amounts), sorted(set(values)))
+                self.assertEqual(list(counts), [values.count(amount) for amount in amounts])
+
+                engine = engine_class.from_counted(amounts, counts)
+                self.assertEqual(engine.get_values(), values)
+                if values:
+                    self.assertEqual(engine.get_median_values(),
+                                     (values[(size - 1) // 2], values[size // 2]))
+                engine.insert(4)
+                values = sorted(values + [4])
+                self.assertEqual(engine.get_median_values(),
+                                 (values[(len(values) - 1) // 2], values[len(values) // 2]))
+
+    def test_linkedlist_handles(self):
+        engine = LinkedListMedian()
+        self.assertIsNone(engine.get_median_left())
+        for amount in [5, 1, 9]:
+            engine.insert(amount)
+        self.assertEqual(engine.get_median_left().get_value(), 5)
+        self.assertIs(engine.get_median_left(), engine.get_median_right())
+
+        engine = HeapMedian()
+        engine.insert(5)
+        self.assertIsNone(engine.get_median_left())
+
+
+class TestMedianEngineSelection(unittest.TestCase):
+    def tearDown(self):
+        # restore the inherited default
+        for cls in [InfoByZip, InfoByDate]:
+            if '__median_engine__' in cls.__dict__:
+                delattr(cls, '__median_engine__')
+
+    def test_undefined_engine(self):
+        self.assertRaises(ValueError, InfoByDomainBase, 4000, 'unknown')
+        self.assertRaises(ValueError, InfoByZip.set_median_engine, 'unknown')
+
+    def test_constructor_engine(self):
+        info = InfoByZip(4000, 'heap')
+        self.assertIsInstance(info._engine, HeapMedian)
+        self.assertIsNone(info.get_median_left())
+
+    def test_class_engine(self):
+        InfoByZip.set_median_engine('heap')
+        self.assertEqual(InfoByZip.get_median_engine(), 'heap')
+        self.assertEqual(InfoByDate.get_median_engine(), 'linkedlist')
+        self.assertIsInstance(InfoByZip(4000)._engine, HeapMedian)
+        self.assertIsInstance(InfoByDate(4000)._engine, LinkedListMedian)
+
+    def test_same_output(self):
+        rng = random.Random(1)
+        amounts = [rng.choice([100, 250, 2500, 5000, 10050, 25000, 270000])
+                   for _ in range(300)]
+        infos = [InfoByDomainBase(amounts[0], engine) for engine in sorted(MEDIAN_ENGINES)]
+        for amount in amounts[1:]:
+            outputs = set()
+            for info in infos:
+                info.update(amount)
+                outputs.add(info.output())
+            self.assertEqual(1, len(outputs))
@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from src import *
+
+
+class TestMetrics(unittest.TestCase):
+    ProgressBar.set_progress_bar(False)
+
+    lines = [
+        # Complete entries
+        'C00629618||||||IND||||900170235|||01032017|40||||||',
+        'C00629618||||||IND||||900170235|||01032017|70||||||',
+        # Column check
+        'C00629618||||||IND||||900170235|||01032017|40',
+        # Missing or invalid ID
+        '||||||IND||||900170235|||01032017|40||||||',
+        'C0062961F||||||IND||||900170235|||01032017|40||||||',
+        # Missing or invalid amount
+        'C00629618||||||IND||||900170235|||01032017|||||||',
+        'C00629618||||||IND||||900170235|||01032017|40C||||||',
+        'C00629618||||||IND||||900170235|||01032017|0||||||',
+        # Other ID
+        'C00629618||||||IND||||900170235|||01032017|40|NOT_INDIVIDUAL|||||',
+        # Invalid zip code or transaction date only
+        'C00629618||||||IND||||90017|||01032017|40||||||',
+        'C00629618||||||IND||||900170235|||02312017|40||||||',
+        # Neither zip code nor transaction date
+        'C00384818||||||IND||||||||333||||||',
+    ]
+    expected = {'rows_valid': 4, 'reject_columns': 1, 'reject_cmte_id': 2,
+                'reject_amount': 3, 'reject_other_id': 1,
+                'reject_zip_and_date': 1, 'invalid_zip': 2, 'invalid_date': 2}
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.input = os.path.join(self.folder, 'itcont.txt')
+        with open(self.input, 'w') as fileout:
+            fileout.write('\n'.join(self.lines) + '\n')
+        METRICS.reset()
+        METRICS.set_enabled(True)
+
+    def tearDown(self):
+        METRICS.set_enabled(False)
+        METRICS.reset()
+        shutil.rmtree(self.folder)
+
+    def process(self, records):
+        zip_writer = ZipOutputWriter(os.path.join(self.folder, 'zip.txt'))
+        process_records(records, dict(), AVLTreeByID(), zip_writer)
+        zip_writer.close()
+
+    def check_counters(self):
+        for name, count in self.expected.items():
+            self.assertEqual(METRICS.get_counter(name), count, name)
+        self.assertEqual(METRICS.get_rows_read(), len(self.lines))
+
+    def test_stream_input(self):
+        self.process(stream_input(self.input))
+        self.check_counters()
+        for stage in Metrics.STAGES:
+            self.assertGreater(METRICS.get_seconds(stage), 0)
+
+    def test_stream_input_mmap(self):
+        self.process(stream_input_mmap(self.input))
+        self.check_counters()
+
+    def test_disabled(self):
+        METRICS.set_enabled(False)
+        self.process(stream_input(self.input))
+        self.assertEqual(METRICS.get_rows_read(), 0)
+        self.assertEqual(METRICS.get_seconds('parse'), 0)
+
+    def test_linkedlist_walks(self):
+        nodes = [LinkedListNode(i) for i in [1, 2, 3, 4]]
+        for left, right in zip(nodes, nodes[1:]):
+            left.right, right.left = right, left
+        LinkedListNode.insert_linkedlist_node(nodes[0], LinkedListNode(3.5), 'r')
+        LinkedListNode.insert_linkedlist_node(nodes[0], LinkedListNode(0.5), 'l')
+
+        walks = METRICS.to_dict()['linkedlist_walks']
+        self.assertEqual((walks['count'], walks['total'], walks['max']), (2, 5, 4))
+        self.assertEqual(walks['histogram'], {'1': 1, '4': 1})
+
+    def test_dump(self):
+        self.process(stream_input(self.input))
+        path = os.path.join(self.folder, 'metrics.json')
+        METRICS.dump(path)
+        with open(path) as filein:
+            metrics = json.load(filein)
+        self.assertEqual(metrics['rows_read'], len(self.lines))
+        self.assertEqual(metrics['counters']['reject_amount'], 3)
+        self.assertIn('rows read', METRICS.report())
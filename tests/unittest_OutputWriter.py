@@ -0,0 +1,245 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.OutputWriter import *
+
+
+class TestDateOutputWriter(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'medianvals_by_date.txt')
+        self.entries = []
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def source(self):
+        self.calls += 1
+        return iter(self.entries)
+
+    def read_output(self):
+        with open(self.path) as filein:
+            return filein.read()
+
+    def test_undefined_policy(self):
+        self.assertRaises(ValueError, DateOutputWriter, self.path,
+                          self.source, 'never')
+
+    def test_record_policy(self):
+        writer = DateOutputWriter(self.path, self.source, 'record')
+        self.entries.append('C00177436|01312017|384|1|384\n')
+        self.assertTrue(writer.notify())
+        self.assertEqual(self.read_output(), 'C00177436|01312017|384|1|384\n')
+
+        # nothing changed since the last snapshot
+        writer.close()
+        self.assertEqual(self.calls, 1)
+
+    def test_end_policy(self):
+        writer = DateOutputWriter(self.path, self.source, 'end')
+        for i in range(5):
+            self.entries.append('entry %d\n' % i)
+            self.assertFalse(writer.notify())
+        self.assertFalse(os.path.exists(self.path))
+
+        writer.close()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.read_output(), ''.join(self.entries))
+
+    def test_end_policy_without_dated_record(self):
+        writer = DateOutputWriter(self.path, self.source, 'end')
+        writer.close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_close_always(self):
+        # the empty output replaces the output of a previous run
+        with open(self.path, 'w') as fileout:
+            fileout.write('previous run\n')
+        writer = DateOutputWriter(self.path, self.source, 'end')
+        writer.close(always=True)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.read_output(), '')
+
+        # written once
+        writer = DateOutputWriter(self.path, self.source, 'record', mode='changes')
+        self.entries = ['C00177436|01312017|384|1|384\n']
+        writer.notify()
+        writer.close(always=True)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.read_output(), 'C00177436|01312017|384|1|384\n')
+
+    def test_every_policy(self):
+        writer = DateOutputWriter(self.path, self.source, 'every', every=3)
+        written = [writer.notify() for _ in range(7)]
+        self.assertEqual(written, [False, False, True, False, False, True, False])
+
+        writer.close()
+        self.assertEqual(self.calls, 3)
+
+    def test_interval_policy(self):
+        writer = DateOutputWriter(self.path, self.source, 'interval', interval=3600)
+        self.assertFalse(writer.notify())
+
+        writer = DateOutputWriter(self.path, self.source, 'interval', interval=0)
+        self.assertTrue(writer.notify())
+
+    @unittest.skipUnless(hasattr(os, 'kill') and hasattr(signal, 'SIGUSR1'),
+                         'SIGUSR1 is not available')
+    def test_signal_policy(self):
+        writer = DateOutputWriter(self.path, self.source, 'signal')
+        self.assertFalse(writer.notify())
+
+        os.kill(os.getpid(), signal.SIGUSR1)
+        self.assertTrue(writer.notify())
+        self.assertFalse(writer.notify())
+        writer.close()
+        self.assertEqual(self.calls, 2)
+
+    def test_atomic_write_replaces_file(self):
+        atomic_write(self.path, ['old\n'])
+        atomic_write(self.path, ['new\n'])
+        self.assertEqual(self.read_output(), 'new\n')
+        # no temporary file left behind
+        self.assertEqual(os.listdir(self.folder), ['medianvals_by_date.txt'])
+
+    def test_atomic_write_file_mode(self):
+        # a new file gets the default permissions, as a file opened by open()
+        other = os.path.join(self.folder, 'medianvals_by_zip.txt')
+        open(other, 'w').close()
+        atomic_write(self.path, ['new\n'])
+        self.assertEqual(os.stat(self.path).st_mode, os.stat(other).st_mode)
+
+        # a replaced file keeps its permissions
+        os.chmod(self.path, 0o640)
+        atomic_write(self.path, ['newer\n'])
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+
+    def test_atomic_write_keeps_file_on_failure(self):
+        atomic_write(self.path, ['old\n'])
+
+        def failing_source():
+            yield 'half\n'
+            raise RuntimeError('interrupted')
+
+        self.assertRaises(RuntimeError, atomic_write, self.path, failing_source())
+        self.assertEqual(self.read_output(), 'old\n')
+        self.assertEqual(os.listdir(self.folder), ['medianvals_by_date.txt'])
+
+    def test_undefined_mode(self):
+        self.assertRaises(ValueError, DateOutputWriter, self.path,
+                          self.source, 'end', mode='diff')
+
+    def test_changes_mode(self):
+        with open(self.path, 'w') as fileout:
+            fileout.write('previous run\n')
+        writer = DateOutputWriter(self.path, self.source, 'record', mode='changes')
+        self.entries = ['C00177436|01312017|384|1|384\n']
+        writer.notify()
+        self.entries = ['C00177436|01312017|392|2|784\n']
+        writer.notify()
+        self.assertEqual(self.read_output(), 'C00177436|01312017|384|1|384\n'
+                                             'C00177436|01312017|392|2|784\n')
+
+        # the log of an interrupted run is continued
+        writer = DateOutputWriter(self.path, self.source, 'record', mode='changes',
+                                  append_existing=True)
+        self.entries = ['C00177436|01312017|400|3|1184\n']
+        writer.notify()
+        self.assertEqual(self.read_output(), 'C00177436|01312017|384|1|384\n'
+                                             'C00177436|01312017|392|2|784\n'
+                                             'C00177436|01312017|400|3|1184\n')
+
+    def test_patch_mode(self):
+        writer = DateOutputWriter(self.path, self.source, 'record', mode='patch')
+        self.entries = ['C00000002|01312017|1|1|1\n', 'C00000002|02012017|2|1|2\n']
+        writer.notify()
+        self.entries = ['C00000001|01312017|3|1|3\n', 'C00000002|02012017|4|2|8\n']
+        writer.notify()
+        self.assertEqual(self.read_output(), 'C00000001|01312017|3|1|3\n'
+                                             'C00000002|01312017|1|1|1\n'
+                                             'C00000002|02012017|4|2|8\n')
+
+    def test_patch_mode_new_file(self):
+        previous = 'C00000001|01312017|9|1|9\nC99999999|01312017|9|1|9\n'
+        self.entries = ['C00000002|01312017|1|1|1\n']
+
+        # the file of a previous run is started over
+        with open(self.path, 'w') as fileout:
+            fileout.write(previous)
+        writer = DateOutputWriter(self.path, self.source, 'record', mode='patch')
+        writer.notify()
+        self.assertEqual(self.read_output(), 'C00000002|01312017|1|1|1\n')
+
+        # or continued
+        with open(self.path, 'w') as fileout:
+            fileout.write(previous)
+        writer = DateOutputWriter(self.path, self.source, 'record', mode='patch',
+                                  patch_existing=True)
+        writer.notify()
+        self.assertEqual(self.read_output(), 'C00000001|01312017|9|1|9\n'
+                                             'C00000002|01312017|1|1|1\n'
+                                             'C99999999|01312017|9|1|9\n')
+
+    def test_merge_date_entries(self):
+        entries = ['C00000001|01012017|1|1|1\n', 'C00000001|12312016|1|1|1\n',
+                   'C00000003|01012017|1|1|1\n']
+        # sorted by recipient, then by date (YYYYMMDD)
+        entries.sort(key=date_entry_key)
+        self.assertEqual(entries[0], 'C00000001|12312016|1|1|1\n')
+
+        changes = ['C00000001|01012017|2|2|2\n', 'C00000002|01012017|2|1|2\n',
+                   'C00000004|01012017|2|1|2\n']
+        self.assertEqual(list(merge_date_entries(entries, changes)), [
+            'C00000001|12312016|1|1|1\n', 'C00000001|01012017|2|2|2\n',
+            'C00000002|01012017|2|1|2\n', 'C00000003|01012017|1|1|1\n',
+            'C00000004|01012017|2|1|2\n'])
+        self.assertEqual(list(merge_date_entries(entries, [])), entries)
+        self.assertEqual(list(merge_date_entries([], changes)), changes)
+
+
+class TestZipOutputWriter(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'medianvals_by_zip.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read_output(self):
+        with open(self.path) as filein:
+            return filein.read()
+
+    def test_write_entry(self):
+        from src import InfoIndividual
+        info = InfoIndividual({'CMTE_ID': 'C00384818', 'TRANSACTION_AMT': 25000,
+                               'ZIP_CODE': '02895', 'TRANSACTION_DT': None})
+        writer = ZipOutputWriter(self.path)
+        writer.write_entry(info, '02895')
+        info.update_info({'CMTE_ID': 'C00384818', 'TRANSACTION_AMT': 33300,
+                          'ZIP_CODE': '02895', 'TRANSACTION_DT': None})
+        writer.write_entry(info, '02895')
+        # missing entry
+        writer.write_entry(info, '90017')
+        writer.close()
+        self.assertEqual(self.read_output(),
+                         'C00384818|02895|250|1|250\nC00384818|02895|292|2|583\n')
+
+    def test_buffer_size(self):
+        writer = ZipOutputWriter(self.path, buffer_size=10)
+        writer.write('12345\n')
+        self.assertEqual(self.read_output(), '')
+        writer.write('12345\n')
+        self.assertEqual(self.read_output(), '12345\n12345\n')
+        writer.close()
+
+    def test_flush_every(self):
+        writer = ZipOutputWriter(self.path, flush_every=2)
+        writer.write('a\n')
+        self.assertEqual(self.read_output(), '')
+        writer.write('b\n')
+        self.assertEqual(self.read_output(), 'a\nb\n')
+        writer.write('c\n')
+        writer.close()
+        self.assertEqual(self.read_output(), 'a\nb\nc\n')
@@ -0,0 +1,44 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from src import *
+
+
+class TestProgressReporter(unittest.TestCase):
+    def test_track(self):
+        output = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        reporter = ProgressReporter(100, interval=0, check_every=3, file=output)
+        offsets = iter(range(10, 1000, 10))
+        lines = list(reporter.track(iter(range(7)), lambda: next(offsets)))
+
+        self.assertEqual(lines, list(range(7)))
+        self.assertEqual(reporter.get_rows(), 7)
+        reports = output.getvalue().splitlines()
+        # two periodic reports, and the final report
+        self.assertEqual(len(reports), 3)
+        self.assertTrue(reports[0].startswith('PROGRESS:  10.0% 3 rows'))
+        self.assertTrue(reports[-1].startswith('PROGRESS:  30.0% 7 rows'))
+        self.assertIn('MB/s ETA ', reports[-1])
+
+    def test_stream_input(self):
+        fd = tempfile.NamedTemporaryFile(delete=False)
+        fd.write(b'C00629618||||||IND||||900170235|||01032017|40||||||\n' * 10)
+        fd.close()
+
+        stderr = sys.stderr
+        sys.stderr = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        try:
+            ProgressBar.set_progress_bar(True)
+            records = list(stream_input(fd.name))
+            mmap_records = list(stream_input_mmap(fd.name))
+            report = sys.stderr.getvalue()
+        finally:
+            ProgressBar.set_progress_bar(False)
+            sys.stderr = stderr
+            os.remove(fd.name)
+
+        self.assertEqual(len(records), 10)
+        self.assertEqual(records, mmap_records)
+        self.assertEqual(report.count('PROGRESS: 100.0% 10 rows'), 2)
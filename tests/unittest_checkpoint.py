@@ -0,0 +1,202 @@
+import itertools
+import os
+import struct
+from src import *
+from src import find_political_donors
+from .fixtures import FolderTestCase, write_random_input
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestCheckpoint(FolderTestCase):
+
+    def setUp(self):
+        super(TestCheckpoint, self).setUp()
+        self.checkpoint = self.path('state.ckpt')
+
+    def test_round_trip(self):
+        write_random_input(self.input, 300)
+        infoDB, _ = self.run_sequential()
+        save_checkpoint(self.checkpoint, infoDB, 1234, 567)
+
+        for engine, id_index in zip(sorted(MEDIAN_ENGINES), itertools.cycle(sorted(ID_INDEXES))):
+            restoredDB, infoAVLTree, offset, zip_size = \
+                load_checkpoint(self.checkpoint, engine, id_index)
+            self.assertIsInstance(infoAVLTree, ID_INDEXES[id_index])
+            self.assertEqual((offset, zip_size), (1234, 567))
+            self.assertEqual(sorted(restoredDB), sorted(infoDB))
+            for id, info in infoDB.items():
+                restored = restoredDB[id]
+                for zipcode, entry in info.get_zip_dict().items():
+                    self.assertEqual(restored.output_by_zip(zipcode),
+                                     info.output_by_zip(zipcode))
+                    self.assertEqual(restored.get_zip_dict_entry(zipcode).get_values(),
+                                     entry.get_values())
+                self.assertEqual(sorted(restored.get_date_dict()),
+                                 sorted(info.get_date_dict()))
+            self.assertEqual(''.join(infoAVLTree.output()), self.read('date_ref.txt'))
+
+    def test_invalid_checkpoint(self):
+        with open(self.checkpoint, 'wb') as fileout:
+            fileout.write(b'\0' * 64)
+        self.assertRaises(ValueError, load_checkpoint, self.checkpoint)
+
+        # other versions of the format
+        with open(self.checkpoint, 'wb') as fileout:
+            fileout.write(struct.pack('<4sHQQI', CHECKPOINT_MAGIC,
+                                      CHECKPOINT_VERSION - 1, 0, 0, 0))
+        self.assertRaises(ValueError, load_checkpoint, self.checkpoint)
+
+    def test_resume(self):
+        write_random_input(self.input, 300)
+        self.run_sequential()
+
+        def run(records, infoDB, infoAVLTree, zip_writer):
+            save = lambda offset: save_checkpoint(self.checkpoint, infoDB, offset,
+                                                  zip_writer.tell())
+            process_records(records(checkpoint_records(
+                stream_input_range(self.input, offset), 40, save)),
+                infoDB, infoAVLTree, zip_writer)
+            zip_writer.close()
+
+        # interrupted run: 100 lines are processed, the checkpoint
+        # is saved after 80 lines
+        offset = 0
+        run(lambda records: itertools.islice(records, 100), dict(), AVLTreeByID(),
+            ZipOutputWriter(self.path('zip.txt')))
+
+        infoDB, infoAVLTree, offset, zip_size = load_checkpoint(self.checkpoint)
+        self.assertGreater(offset, 0)
+        run(lambda records: records, infoDB, infoAVLTree,
+            ZipOutputWriter(self.path('zip.txt'), resume_size=zip_size))
+        atomic_write(self.path('date.txt'), infoAVLTree.output())
+
+        self.assertEqual(self.read('zip_ref.txt'), self.read('zip.txt'))
+        self.assertEqual(self.read('date_ref.txt'), self.read('date.txt'))
+
+
+    def run_interrupted(self, options, count):
+        """
+        Run the command line, killed after count records: the pending
+        medianvals_by_date changes are lost, medianvals_by_zip is written
+        past the last checkpoint
+        """
+        process_records = find_political_donors.process_records
+
+        def interrupted(records, infoDB, infoAVLTree, zip_writer, date_writer=None):
+            try:
+                process_records(itertools.islice(records, count), infoDB, infoAVLTree,
+                                zip_writer, date_writer)
+            finally:
+                zip_writer.close()
+            raise Interrupted()
+
+        find_political_donors.process_records = interrupted
+        try:
+            self.assertRaises(Interrupted, self.run_main, options)
+        finally:
+            find_political_donors.process_records = process_records
+
+    def replay(self, name):
+        """
+        :return: string, the medianvals_by_date entries of a change log,
+            the last change of each entry
+        """
+        entries = dict()
+        for entry in self.read(name).splitlines(True):
+            id, date = entry.split('|')[:2]
+            entries[(id, DATE_CACHE.get_key_idx(date))] = entry
+        return ''.join(entries[key] for key in sorted(entries))
+
+    def test_main_resume(self):
+        write_random_input(self.input, 300)
+        self.run_sequential()
+        for mode in DateOutputWriter.MODES:
+            for count in [50, 130, 290]:
+                options = ['--checkpoint', self.checkpoint, '--checkpoint-every', '40',
+                           '--date-output', 'every', '--date-every', '25',
+                           '--date-mode', mode]
+                self.run_interrupted(options, count)
+                self.run_main(options + ['--resume'])
+
+                self.assertEqual(self.read('zip_main.txt'), self.read('zip_ref.txt'))
+                date = self.replay('date_main.txt') if mode == 'changes' \
+                    else self.read('date_main.txt')
+                self.assertEqual(date, self.read('date_ref.txt'), (mode, count))
+
+
+class TestIncremental(FolderTestCase):
+
+    def setUp(self):
+        super(TestIncremental, self).setUp()
+        self.state = self.path('state')
+
+    def run_delta(self, input, name, options=()):
+        self.run_main(['--state', self.state] + list(options), input, name)
+        return set((line['CMTE_ID'], line['TRANSACTION_DT'])
+                   for line in stream_input(input) if line['TRANSACTION_DT'])
+
+    def split_days(self):
+        write_random_input(self.input, 400)
+        with open(self.input) as filein:
+            lines = filein.readlines()
+        with open(self.path('day1.txt'), 'w') as fileout:
+            fileout.writelines(lines[:300])
+        with open(self.path('day2.txt'), 'w') as fileout:
+            fileout.writelines(lines[300:])
+        self.run_sequential()
+
+    def test_delta(self):
+        self.split_days()
+        self.run_delta(self.path('day1.txt'), 'day1.txt')
+        changed = self.run_delta(self.path('day2.txt'), 'day2.txt')
+
+        # new medianvals_by_zip lines only
+        self.assertEqual(self.read('zip_day1.txt') + self.read('zip_day2.txt'),
+                         self.read('zip_ref.txt'))
+
+        # changed medianvals_by_date entries only, as in the full output
+        reference = self.read('date_ref.txt').splitlines(True)
+        expected = [entry for entry in reference
+                    if tuple(entry.split('|')[:2]) in changed]
+        self.assertTrue(0 < len(expected) < len(reference))
+        self.assertEqual(self.read('date_day2.txt'), ''.join(expected))
+
+    def test_delta_patch(self):
+        # the changed entries are merged into medianvals_by_date of the day before
+        self.split_days()
+        self.run_delta(self.path('day1.txt'), 'day.txt', ['--date-mode', 'patch'])
+        self.run_delta(self.path('day2.txt'), 'day.txt', ['--date-mode', 'patch'])
+        self.assertEqual(self.read('date_day.txt'), self.read('date_ref.txt'))
+
+    def test_touched_shards(self):
+        # a run only reads and rewrites the shards of the recipients of its input
+        self.split_days()
+        self.run_delta(self.path('day1.txt'), 'day1.txt')
+        with open(self.path('day2.txt')) as filein:
+            line = filein.readline()
+        with open(self.path('one.txt'), 'w') as fileout:
+            fileout.write(line)
+        shards = dict((name, os.stat(os.path.join(self.state, name)).st_ino)
+                      for name in os.listdir(self.state))
+        self.assertGreater(len(shards), 1)
+
+        self.run_delta(self.path('one.txt'), 'one.txt')
+        touched = os.path.basename(
+            state_shard_path(self.state, get_state_shard(line.split('|')[0])))
+        for name, inode in shards.items():
+            if name == touched:
+                self.assertNotEqual(os.stat(os.path.join(self.state, name)).st_ino, inode)
+            else:
+                self.assertEqual(os.stat(os.path.join(self.state, name)).st_ino, inode)
+
+        # the state holds all the records
+        with open(self.path('day1.txt')) as filein:
+            lines = filein.readlines()
+        with open(self.input, 'w') as fileout:
+            fileout.writelines(lines + [line])
+        self.run_sequential()
+        _, infoAVLTree = load_state(self.state)
+        self.assertEqual(''.join(infoAVLTree.output()), self.read('date_ref.txt'))
@@ -0,0 +1,74 @@
+import io
+import sys
+from src import *
+from .fixtures import FolderTestCase, write_random_input
+
+
+class TestParallelIngest(FolderTestCase):
+
+    def compare(self, workers, **kwargs):
+        self.run_sequential()
+        run_parallel(self.input, self.path('zip.txt'), self.path('date.txt'), workers,
+                     **kwargs)
+        self.assertEqual(self.read('zip_ref.txt'), self.read('zip.txt'))
+        self.assertEqual(self.read('date_ref.txt'), self.read('date.txt'))
+
+    def test_stream_input_range(self):
+        write_random_input(self.input, 300)
+        ref = list(stream_input(self.input))
+        for count in [1, 2, 7]:
+            res = []
+            for start, end in split_ranges(self.input, count):
+                res.extend(stream_input_range(self.input, start, end))
+            self.assertEqual(ref, [line for _, line in res])
+            offsets = [offset for offset, _ in res]
+            self.assertEqual(offsets, sorted(offsets))
+
+    def test_range_inside_line(self):
+        write_random_input(self.input, 3)
+        with open(self.input, 'rb') as filein:
+            first_line = len(filein.readline())
+        offsets = [offset for offset, _ in stream_input_range(self.input, 1)]
+        self.assertTrue(all(offset >= first_line for offset in offsets))
+
+    def test_shard(self):
+        self.assertEqual(get_shard('C00629618', 4), get_shard('C00629618', 4))
+        self.assertTrue(0 <= get_shard('C00629618', 4) < 4)
+
+    def test_parallel_output(self):
+        write_random_input(self.input, 500)
+        self.compare(3)
+
+    def test_parallel_stops_at_empty_line(self):
+        write_random_input(self.input, 500, empty_line_at=321)
+        self.compare(4)
+
+    def test_parallel_indexes(self):
+        write_random_input(self.input, 300)
+        self.compare(2, engine='multiset', date_index='calendar', id_index='sorted')
+
+    def test_parallel_tree_date_index(self):
+        # the workers select the date index which is not the default one
+        write_random_input(self.input, 300)
+        self.assertNotEqual(NodeByID.get_date_index(), 'tree')
+        self.compare(3, date_index='tree')
+
+    def test_main_rejects_ignored_options(self):
+        write_random_input(self.input, 10)
+        stderr = sys.stderr
+        for option in [['--date-mode', 'patch'], ['--mmap'], ['--zip-flush-every', '10']]:
+            sys.stderr = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+            try:
+                with self.assertRaises(SystemExit):
+                    self.run_main(['--workers', '2'] + option)
+                self.assertIn(option[0] + ' can not be used with --workers',
+                              sys.stderr.getvalue())
+            finally:
+                sys.stderr = stderr
+
+    def test_main_workers(self):
+        write_random_input(self.input, 300)
+        self.run_sequential()
+        self.run_main(['--workers', '2', '--date-output', 'end'])
+        self.assertEqual(self.read('zip_ref.txt'), self.read('zip_main.txt'))
+        self.assertEqual(self.read('date_ref.txt'), self.read('date_main.txt'))
@@ -0,0 +1,133 @@
+import asyncio
+import io
+import os
+import sys
+from src import *
+from .fixtures import FolderTestCase, write_random_input
+
+
+class TestService(FolderTestCase):
+
+    def setUp(self):
+        super(TestService, self).setUp()
+        self.socket = self.path('service.sock')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        super(TestService, self).tearDown()
+
+    def read_lines(self):
+        with open(self.input) as filein:
+            return filein.readlines()
+
+    def serve_and_feed(self, service, *feeds):
+        """
+        :param service: object DonorService
+        :param feeds: lists of records, one connection each
+        :return: list of lists of medianvals_by_zip entries, one per connection
+        """
+        async def run():
+            stop = asyncio.Event()
+            server = asyncio.ensure_future(serve(service, unix=self.socket, stop=stop))
+            while not os.path.exists(self.socket):
+                await asyncio.sleep(0.01)
+            try:
+                return await asyncio.gather(*[feed(lines, unix=self.socket)
+                                              for lines in feeds])
+            finally:
+                stop.set()
+                await server
+
+        return self.loop.run_until_complete(run())
+
+    def test_feed(self):
+        write_random_input(self.input, 500)
+        self.run_sequential()
+
+        service = DonorService()
+        entries, = self.serve_and_feed(service, self.read_lines())
+        self.assertEqual(''.join(entries), self.read('zip_ref.txt'))
+        self.assertEqual(''.join(service.get_tree().output()),
+                         self.read('date_ref.txt'))
+
+    def test_concurrent_feeds(self):
+        write_random_input(self.input, 500)
+        self.run_sequential()
+        lines = self.read_lines()
+
+        # both connections update the same state
+        service = DonorService()
+        first, second = self.serve_and_feed(service, lines[:250], lines[250:])
+        self.assertEqual(len(first) + len(second),
+                         len(self.read('zip_ref.txt').splitlines()))
+        self.assertEqual(''.join(service.get_tree().output()),
+                         self.read('date_ref.txt'))
+
+    def test_end_of_feed(self):
+        write_random_input(self.input, 100, empty_line_at=50)
+        lines = self.read_lines()
+        service = DonorService()
+        self.serve_and_feed(service, lines)
+
+        with open(self.input, 'w') as fileout:
+            fileout.writelines(lines[:50])
+        self.run_sequential()
+        self.assertEqual(''.join(service.get_tree().output()),
+                         self.read('date_ref.txt'))
+
+    def test_file_streams(self):
+        write_random_input(self.input, 200)
+        self.run_sequential()
+
+        fileout = io.BytesIO()
+        with open(self.input, 'rb') as filein:
+            self.loop.run_until_complete(DonorService().handle(
+                FileReader(filein), FileWriter(fileout)))
+        self.assertEqual(fileout.getvalue().decode('utf-8'), self.read('zip_ref.txt'))
+
+    def test_stdin_stop(self):
+        # the service on the stdin pipe stops before the end of the feed
+        stdin_read, stdin_write = os.pipe()
+        stdout_read, stdout_write = os.pipe()
+        stdin, stdout = sys.stdin, sys.stdout
+        sys.stdin = os.fdopen(stdin_read, 'r')
+        sys.stdout = os.fdopen(stdout_write, 'w')
+        service = DonorService()
+
+        async def run():
+            stop = asyncio.Event()
+            server = asyncio.ensure_future(serve(service, stop=stop))
+            os.write(stdin_write, b'C00629618||||||IND||||900170235|||01032017|40||||||\n')
+            while not service.get_info_database():
+                await asyncio.sleep(0.01)
+            stop.set()
+            await asyncio.wait_for(server, 2)
+
+        try:
+            self.loop.run_until_complete(run())
+        finally:
+            sys.stdin.close()
+            sys.stdout.close()
+            sys.stdin, sys.stdout = stdin, stdout
+            os.close(stdin_write)
+        with os.fdopen(stdout_read) as entries:
+            self.assertEqual(entries.read(), 'C00629618|90017|40|1|40\n')
+
+    def test_date_writer(self):
+        write_random_input(self.input, 300)
+        self.run_sequential()
+
+        infoAVLTree = AVLTreeByID()
+        date_writer = DateOutputWriter(self.path('date.txt'), infoAVLTree.output,
+                                       'every', 100)
+        service = DonorService(date_writer, dict(), infoAVLTree)
+        self.serve_and_feed(service, self.read_lines())
+        date_writer.close()
+        self.assertEqual(self.read('date.txt'), self.read('date_ref.txt'))
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('localhost:8765'), ('localhost', 8765))
+        self.assertEqual(parse_address(':8765'), ('127.0.0.1', 8765))
@@ -1,6 +1,6 @@
 import unittest
 import tempfile
-from src import stream_input, ProgressBar
+from src import stream_input, stream_input_mmap, parse_cents, ProgressBar
 
 
 class TestInputParser(unittest.TestCase):
@@ -87,7 +87,15 @@ class TestInputParser(unittest.TestCase):
         fd.close()
         for line in stream_input(fd.name):
             res = line
-        self.assertAlmostEqual(res['TRANSACTION_AMT'], 40)
+        self.assertEqual(res['TRANSACTION_AMT'], 4000)
+
+    def test_parse_cents(self):
+        self.assertEqual(parse_cents('40'), 4000)
+        self.assertEqual(parse_cents('250.5'), 25050)
+        self.assertEqual(parse_cents('0.29'), 29)
+        self.assertEqual(parse_cents('-12.10'), -1210)
+        self.assertEqual(parse_cents('1e3'), 100000)
+        self.assertRaises(ValueError, parse_cents, '40C')
 
     def test_zip_code(self):
         fd = tempfile.NamedTemporaryFile(delete=False)
@@ -153,9 +161,69 @@ class TestInputParser(unittest.TestCase):
             res.append(line)
 
         self.assertEqual(1, len(res))
-        ref = {'CMTE_ID': 'C00629618', 'TRANSACTION_AMT': 40.0, 'ZIP_CODE': '90017',
+        ref = {'CMTE_ID': 'C00629618', 'TRANSACTION_AMT': 4000, 'ZIP_CODE': '90017',
                'TRANSACTION_DT': '01032017'}
         self.assertEqual(ref['CMTE_ID'], res[0]['CMTE_ID'])
         self.assertEqual(ref['TRANSACTION_AMT'], res[0]['TRANSACTION_AMT'])
         self.assertEqual(ref['ZIP_CODE'], res[0]['ZIP_CODE'])
         self.assertEqual(ref['TRANSACTION_DT'], res[0]['TRANSACTION_DT'])
+
+
+class TestMmapInputParser(unittest.TestCase):
+    ProgressBar.set_progress_bar(False)
+
+    def compare(self, content):
+        fd = tempfile.NamedTemporaryFile(delete=False)
+        fd.write(content)
+        fd.close()
+
+        ref = list(stream_input(fd.name))
+        self.assertEqual(ref, list(stream_input_mmap(fd.name)))
+        return ref
+
+    def test_filter_rules(self):
+        res = self.compare(
+            # Valid entries
+            b'C00629618||||||IND||||900170235|||01032017|40||||||\n'
+            b'C00629618||||||IND||||90017023B|||01032017|40.5||||||\n'
+            b'C00629618||||||IND||||900170235|||02312017|-40||||||\n'
+            # Column check
+            b'C00629618||||||IND||||900170235|||01032017|40\n'
+            b'C00629618||||||IND||||900170235|||01032017|40|||||||\n'
+            # Missing ID, amount, other ID
+            b'||||||IND||||900170235|||01032017|40||||||\n'
+            b'C00629618||||||IND||||900170235|||01032017|||||||\n'
+            b'C00629618||||||IND||||900170235|||01032017|40|NOT_INDIVIDUAL|||||\n'
+            # Invalid ID and amount
+            b'C0062961F||||||IND||||900170235|||01032017|40||||||\n'
+            b'C00629618||||||IND||||900170235|||01032017|0||||||\n'
+            # Neither zip code nor transaction date
+            b'C00384818||||||IND||||||||333||||||\n'
+            # Last line without line break
+            b'C00177436||||||IND||||300047357|||01312017|384||||||')
+        self.assertEqual(4, len(res))
+
+    def test_non_ascii_columns(self):
+        res = self.compare(
+            u'C00629618||||||IND|P\u00c9REZ|||900170235|||01032017|40||||||\n'.encode('utf-8'))
+        self.assertEqual(1, len(res))
+
+    def test_stop_at_empty_line(self):
+        line = b'C00629618||||||IND||||900170235|||01032017|40||||||\n'
+        self.assertEqual(2, len(self.compare(line * 2 + b'\n' + line)))
+        self.assertEqual(0, len(self.compare(b'\n' + line)))
+        self.assertEqual(1, len(self.compare(line.replace(b'\n', b'\r\n') + b'\r\n' + line)))
+
+    def test_shared_keys(self):
+        # the zip code and date of different lines are the same string
+        fd = tempfile.NamedTemporaryFile(delete=False)
+        fd.write(b'C00629618||||||IND||||900170235|||01032017|40||||||\n'
+                 b'C00177436||||||IND||||900171234|||01032017|384||||||\n')
+        fd.close()
+        for reader in [stream_input, stream_input_mmap]:
+            first, second = reader(fd.name)
+            self.assertIs(first['ZIP_CODE'], second['ZIP_CODE'])
+            self.assertIs(first['TRANSACTION_DT'], second['TRANSACTION_DT'])
+
+    def test_empty_file(self):
+        self.assertEqual(0, len(self.compare(b'')))